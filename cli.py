@@ -0,0 +1,291 @@
+"""
+PRTS-SAM 命令行模式
+
+不加载PyQt5，直接构造与界面相同的配置字典并运行各处理器，适合在无显示器的服务器上使用：
+
+    python main.py resize --input-dir raw --output-dir out --dataset-name ds
+    python main.py embed --dataset-root out/ds/train --checkpoint sam_vit_h.pth
+    python main.py export --checkpoint sam_vit_h.pth --output sam.onnx
+    python main.py coco-stats annotations.json
+
+进度以JSON行的形式输出到标准输出，每行一个事件：
+    {"event": "progress", "progress": 35, "message": "..."}
+    {"event": "finished", "success": true, "message": "..."}
+处理器自身打印的警告信息重定向到标准错误，不会混入JSON输出
+
+退出码: 0 成功，1 处理失败，2 参数错误，130 被中断（Ctrl+C）
+"""
+
+import os
+import sys
+import json
+import signal
+import argparse
+import contextlib
+from collections import Counter
+from typing import Dict, List
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+COMMANDS = ["resize", "embed", "export", "coco-stats"]
+
+SCAN_MODES = {"flat": "传统模式", "grouped": "分组模式"}
+
+
+def emit(event: str, **fields):
+    """向标准输出写入一行JSON事件"""
+    fields = dict(event=event, **fields)
+    sys.__stdout__.write(json.dumps(fields, ensure_ascii=False) + "\n")
+    sys.__stdout__.flush()
+
+
+def run_processor(processor_class, config: Dict) -> int:
+    """
+    运行处理器并输出JSON进度
+
+    Ctrl+C 会调用处理器的 stop()，让其在安全位置退出（与界面中的停止按钮相同）
+    """
+    try:
+        processor = processor_class(config)
+    except ImportError as e:
+        emit("finished", success=False, message=str(e))
+        return EXIT_FAILED
+
+    interrupted = []
+
+    def on_sigint(signum, frame):
+        interrupted.append(signum)
+        processor.stop()
+
+    previous_handler = signal.signal(signal.SIGINT, on_sigint)
+    try:
+        processor.set_progress_callback(
+            lambda p, m: emit("progress", progress=p, message=m)
+        )
+        success, message = processor.process()
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+
+    emit("finished", success=success, message=message)
+    if interrupted:
+        return EXIT_INTERRUPTED
+    return EXIT_OK if success else EXIT_FAILED
+
+
+def cmd_resize(args) -> int:
+    """图片批量缩放并按训练集/验证集分组"""
+    from utils.image_resize.processor import ImageProcessor
+
+    config = {
+        'input_dir': args.input_dir,
+        'mode': args.mode,
+        'target_width': args.width,
+        'target_height': args.height,
+        'keep_original_format': args.output_format is None,
+        'output_format': args.output_format or 'png',
+        'quality': args.quality,
+        'resize_quality': args.resize_quality,
+        'output_dir': args.output_dir,
+        'dataset_name': args.dataset_name,
+        'train_count': args.train_count,
+        'group_size': args.group_size,
+        'start_number': args.start_number,
+        'number_digits': args.number_digits,
+        'overwrite': args.overwrite,
+        'open_dir_after': False,
+        'num_workers': args.num_workers,
+    }
+    return run_processor(ImageProcessor, config)
+
+
+def cmd_embed(args) -> int:
+    """生成SAM嵌入向量"""
+    from utils.sam_embeddings.processor import SAMEmbeddingsProcessor
+
+    config = {
+        'checkpoint_path': args.checkpoint or "",
+        'model_type': args.model_type,
+        'device': args.device,
+        'backend': args.backend,
+        'encoder_onnx_path': args.encoder or "",
+        'intra_op_threads': args.intra_op_threads,
+        'batch_size': args.batch_size,
+        'num_workers': args.num_workers,
+        'num_processes': args.num_processes,
+        'storage_format': args.storage_format,
+        'storage_backend': args.storage_backend,
+        'dataset_root': args.dataset_root,
+        'scan_mode': SCAN_MODES[args.scan_mode],
+        'incremental': not args.no_incremental,
+    }
+    return run_processor(SAMEmbeddingsProcessor, config)
+
+
+def cmd_export(args) -> int:
+    """导出ONNX模型"""
+    from utils.onnx_export.processor import ONNXExportProcessor
+
+    config = {
+        'checkpoint_path': args.checkpoint,
+        'model_type': args.model_type,
+        'onnx_model_path': args.output,
+        'orig_im_size': [args.orig_height, args.orig_width],
+        'opset_version': args.opset,
+        'quantize': not args.no_quantize,
+        'export_target': args.target,
+    }
+    return run_processor(ONNXExportProcessor, config)
+
+
+def coco_stats(instances: Dict, images_dir: str = None) -> Dict:
+    """统计COCO标注文件中的图片、标注和类别数量"""
+    images = instances.get("images", [])
+    annotations = instances.get("annotations", [])
+    categories = {c["id"]: c["name"] for c in instances.get("categories", [])}
+
+    per_image = Counter(ann["image_id"] for ann in annotations)
+    per_category = Counter(ann["category_id"] for ann in annotations)
+    counts = [per_image.get(img["id"], 0) for img in images]
+
+    stats = {
+        "images": len(images),
+        "annotations": len(annotations),
+        "categories": len(categories),
+        "images_without_annotations": sum(1 for c in counts if c == 0),
+        "max_annotations_per_image": max(counts) if counts else 0,
+        "mean_annotations_per_image": (sum(counts) / len(counts)) if counts else 0.0,
+        "annotations_with_masks": sum(1 for ann in annotations if ann.get("segmentation")),
+        "per_category": {
+            categories.get(cat_id, str(cat_id)): count
+            for cat_id, count in per_category.most_common()
+        },
+    }
+    if images_dir is not None:
+        stats["missing_image_files"] = [
+            img["file_name"] for img in images
+            if not os.path.exists(os.path.join(images_dir, img["file_name"]))
+        ]
+    return stats
+
+
+def cmd_coco_stats(args) -> int:
+    """输出COCO标注文件统计信息"""
+    try:
+        with open(args.annotations, "r", encoding="utf-8") as f:
+            instances = json.load(f)
+    except (OSError, ValueError) as e:
+        emit("finished", success=False, message=f"读取标注文件失败: {e}")
+        return EXIT_FAILED
+
+    emit("stats", **coco_stats(instances, args.images))
+    return EXIT_OK
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """构造命令行参数解析器"""
+    parser = argparse.ArgumentParser(prog="main.py", description="PRTS-SAM 命令行模式")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    # resize
+    resize = subparsers.add_parser("resize", help="图片批量缩放并划分数据集")
+    resize.add_argument("--input-dir", required=True, help="输入图片目录")
+    resize.add_argument("--output-dir", required=True, help="输出目录")
+    resize.add_argument("--dataset-name", default="dataset", help="数据集名称")
+    resize.add_argument("--mode", choices=["aspect", "stretch", "crop"], default="aspect",
+                        help="缩放模式: 等比例/拉伸/居中裁剪")
+    resize.add_argument("--width", type=int, default=1024, help="目标宽度")
+    resize.add_argument("--height", type=int, default=1024, help="目标高度")
+    resize.add_argument("--output-format", choices=["jpg", "png", "webp"], default=None,
+                        help="输出格式，默认保持原格式")
+    resize.add_argument("--quality", type=int, default=90, help="JPG/WEBP质量")
+    resize.add_argument("--resize-quality", choices=["high", "fast"], default="high",
+                        help="fast: JPEG降采样解码后再缩放")
+    resize.add_argument("--train-count", type=int, default=2000, help="训练集数量")
+    resize.add_argument("--group-size", type=int, default=100, help="每组图片数量")
+    resize.add_argument("--start-number", type=int, default=1, help="起始编号")
+    resize.add_argument("--number-digits", type=int, default=5, help="编号位数")
+    resize.add_argument("--overwrite", action="store_true", help="覆盖已存在的输出目录")
+    resize.add_argument("--num-workers", type=int, default=os.cpu_count() or 1,
+                        help="并行进程数，1表示串行处理")
+    resize.set_defaults(func=cmd_resize)
+
+    # embed
+    embed = subparsers.add_parser("embed", help="生成SAM嵌入向量")
+    embed.add_argument("--dataset-root", required=True, help="数据集根目录")
+    embed.add_argument("--scan-mode", choices=list(SCAN_MODES), default="grouped",
+                       help="flat: 只处理根目录下的images; grouped: 递归处理所有images")
+    embed.add_argument("--backend", choices=["pytorch", "onnxruntime"], default="pytorch",
+                       help="推理后端")
+    embed.add_argument("--checkpoint", help="SAM模型权重文件 (.pth)，pytorch后端使用")
+    embed.add_argument("--encoder", help="图像编码器ONNX模型，onnxruntime后端使用")
+    embed.add_argument("--model-type", choices=["default", "vit_h", "vit_l", "vit_b"],
+                       default="default", help="模型类型")
+    embed.add_argument("--device", default="cuda", help="运行设备，如 cuda / cuda:1 / cpu")
+    embed.add_argument("--intra-op-threads", type=int, default=0,
+                       help="onnxruntime算子线程数，0表示自动")
+    embed.add_argument("--batch-size", type=int, default=1, help="批大小")
+    embed.add_argument("--num-workers", type=int, default=min(4, os.cpu_count() or 1),
+                       help="预处理线程数")
+    embed.add_argument("--num-processes", type=int, default=1, help="工作进程数")
+    embed.add_argument("--storage-format", choices=["float32", "float16", "int8"],
+                       default="float32", help="存储格式")
+    embed.add_argument("--storage-backend", choices=["files", "shards"], default="files",
+                       help="存储方式")
+    embed.add_argument("--no-incremental", action="store_true", help="重新生成所有嵌入向量")
+    embed.set_defaults(func=cmd_embed)
+
+    # export
+    export = subparsers.add_parser("export", help="导出ONNX模型")
+    export.add_argument("--checkpoint", required=True, help="SAM模型权重文件 (.pth)")
+    export.add_argument("--output", required=True, help="输出ONNX模型路径")
+    export.add_argument("--model-type", choices=["default", "vit_h", "vit_l", "vit_b"],
+                        default="default", help="模型类型")
+    export.add_argument("--target", choices=["decoder", "encoder"], default="decoder",
+                        help="导出提示解码器或图像编码器")
+    export.add_argument("--orig-height", type=int, default=1080, help="原始图像高度")
+    export.add_argument("--orig-width", type=int, default=1920, help="原始图像宽度")
+    export.add_argument("--opset", type=int, default=15, help="ONNX opset版本")
+    export.add_argument("--no-quantize", action="store_true", help="不进行8位量化")
+    export.set_defaults(func=cmd_export)
+
+    # coco-stats
+    stats = subparsers.add_parser("coco-stats", help="统计COCO标注文件")
+    stats.add_argument("annotations", help="COCO标注文件 (.json)")
+    stats.add_argument("--images", default=None, help="图片目录，指定时检查缺失的图片文件")
+    stats.set_defaults(func=cmd_coco_stats)
+
+    return parser
+
+
+def validate_args(args) -> List[str]:
+    """检查界面中由 validate_config 负责的必填项"""
+    errors = []
+    if args.command == "embed":
+        if args.backend == "onnxruntime" and not args.encoder:
+            errors.append("onnxruntime后端需要指定 --encoder")
+        if args.backend == "pytorch" and not args.checkpoint:
+            errors.append("pytorch后端需要指定 --checkpoint")
+    return errors
+
+
+def main(argv: List[str] = None) -> int:
+    """命令行入口，返回退出码"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    errors = validate_args(args)
+    if errors:
+        for error in errors:
+            print(f"错误: {error}", file=sys.stderr)
+        return EXIT_USAGE
+
+    # 处理器及其依赖在导入和运行时打印的信息都转到标准错误
+    with contextlib.redirect_stdout(sys.stderr):
+        return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,7 +5,7 @@ View images with bboxes from the COCO dataset.
 """
 import argparse
 import colorsys
-import json
+import functools
 import logging
 import os
 import random
@@ -17,6 +17,8 @@ from turtle import __forwardmethods
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont, ImageTk
 
+from utils.coco_io import LazyCocoFile
+
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 
 parser = argparse.ArgumentParser(description="View images with bboxes from the COCO dataset")
@@ -51,7 +53,9 @@ class Data:
         full_path = os.path.join(self.image_dir, img_name)
 
         # Get objects and category ids
-        objects = [obj for obj in self.instances["annotations"] if obj["image_id"] == img_id]
+        # Image ids are looked up in the index shared with the annotator; annotations are
+        # parsed from the file the first time their image is shown and reused on redraws
+        objects = self.instances.annotations_for_image(img_id)
         obj_categories_ids = [obj["category_id"] for obj in objects]
 
         # List of category ids of all objects
@@ -94,24 +98,48 @@ def parse_coco(annotations_file: str) -> tuple:
     return instances, images, categories
 
 
-def load_annotations(fname: str) -> dict:
-    """Loads annotations file."""
-    logging.info(f"Parsing {fname}...")
+def load_annotations(fname: str) -> LazyCocoFile:
+    """Indexes annotations file.
 
-    with open(fname) as f:
-        instances = json.load(f)
-    return instances
+    The index is memory-mapped from the binary cache next to the file; the file
+    is streamed once only when the cache is missing or stale. Annotations are
+    parsed on first display.
+    """
+    logging.info(f"Parsing {fname}...")
+    return LazyCocoFile.open(fname)
 
 
-def get_images(instances: dict) -> list:
+def get_images(instances: LazyCocoFile) -> list:
     """Extracts all image ids and file names from annotations file."""
-    return [(image["id"], image["file_name"]) for image in instances["images"]]
+    return list(zip(instances.image_ids.tolist(), instances.image_file_names))
+
+
+@functools.lru_cache(maxsize=1)
+def load_image(full_img_path: str):
+    """Decodes image; the current one is kept so that redraws skip decoding."""
+    return Image.open(full_img_path).convert("RGBA")
+
+
+@functools.lru_cache(maxsize=None)
+def load_font(size: int):
+    """Loads label font of the given size once."""
+    try:
+        try:
+            # Should work for Linux
+            return ImageFont.truetype("DejaVuSans.ttf", size=size)
+        except OSError:
+            # Should work for Windows
+            return ImageFont.truetype("Arial.ttf", size=size)
+    except OSError:
+        # Load default, note no resize option
+        # TODO: Implement notification message as popup window
+        return ImageFont.load_default()
 
 
 def open_image(full_img_path: str):
     """Opens image, creates draw context."""
     # Open image
-    img_open = Image.open(full_img_path).convert("RGBA")
+    img_open = load_image(full_img_path)
     # Create layer for bboxes and masks
     draw_layer = Image.new("RGBA", img_open.size, (255, 255, 255, 0))
     draw = ImageDraw.Draw(draw_layer)
@@ -134,13 +162,13 @@ def prepare_colors(n_objects: int, shuffle: bool = True) -> list:
     return colors
 
 
-def get_categories(instances: dict) -> dict:
+def get_categories(instances: LazyCocoFile) -> dict:
     """Extracts categories from annotations file and prepares color for each one."""
     # Parse categories
     colors = prepare_colors(n_objects=80, shuffle=True)
     categories = list(
         zip(
-            [[category["id"], category["name"]] for category in instances["categories"]],
+            [[category["id"], category["name"]] for category in instances.categories],
             colors,
         )
     )
@@ -167,18 +195,7 @@ def draw_bboxes(draw, objects, labels, obj_categories, ignore, width, label_size
 
             if labels:
                 text = c[0]
-
-                try:
-                    try:
-                        # Should work for Linux
-                        font = ImageFont.truetype("DejaVuSans.ttf", size=label_size)
-                    except OSError:
-                        # Should work for Windows
-                        font = ImageFont.truetype("Arial.ttf", size=label_size)
-                except OSError:
-                    # Load default, note no resize option
-                    # TODO: Implement notification message as popup window
-                    font = ImageFont.load_default()
+                font = load_font(label_size)
 
                 tw, th = draw.textsize(text, font)
                 tx0 = b[0]
@@ -609,7 +626,7 @@ class Controller:
         alpha: int = 128,
         label_size: int = 15,
     ):
-        ignore = ignore or []  # list of objects to ignore
+        ignore = set(ignore or [])  # objects to ignore
         img_open, draw_layer, draw = open_image(full_path)
         # Draw masks
         if masks_on:
@@ -642,7 +659,8 @@ class Controller:
         if self.selected_objs is None:
             ignore = []
         else:
-            ignore = [i for i in range(len(self.current_img_obj_categories)) if i not in self.selected_objs]
+            selected = set(self.selected_objs)
+            ignore = [i for i in range(len(self.current_img_obj_categories)) if i not in selected]
 
         width = self.bbox_thickness.get() if width is None else width
         alpha = self.mask_alpha.get() if alpha is None else alpha
@@ -675,7 +693,7 @@ class Controller:
         # Update statusbar vars
         self.file_count_status.set(f"{str(self.data.images.n + 1)}/{self.data.images.max}")
         self.file_name_status.set(f"{self.data.current_image[-1]}")
-        self.description_status.set(f"{self.data.instances.get('info', {}).get('description', '')}")
+        self.description_status.set(f"{self.data.instances.header.get('info', {}).get('description', '')}")
         self.nobjects_status.set(f"objects: {len(self.current_img_obj_categories)}")
         self.ncategories_status.set(f"categories: {len(self.current_img_categories)}")
 
@@ -16,7 +16,10 @@ sys.path.insert(0, str(project_root))
 
 def parse_args():
     """解析命令行参数"""
-    parser = argparse.ArgumentParser(description='PRTS-SAM')
+    parser = argparse.ArgumentParser(
+        description='PRTS-SAM',
+        epilog='命令行模式: main.py {resize,embed,export,coco-stats} --help'
+    )
     parser.add_argument('--debug', action='store_true', help='启用调试模式')
     parser.add_argument('--config', type=str, default=None, help='配置文件路径')
     return parser.parse_args()
@@ -35,6 +38,12 @@ def check_dependencies():
 
 def main():
     """主函数"""
+    # 命令行模式：第一个参数为子命令时不启动界面，也不导入PyQt5
+    from cli import COMMANDS
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        import cli
+        sys.exit(cli.main(sys.argv[1:]))
+
     args = parse_args()
 
     if not check_dependencies():
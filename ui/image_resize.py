@@ -144,6 +144,17 @@ class ImageResizeTab(QtWidgets.QWidget):
         self.quality_label = QtWidgets.QLabel("90% (仅JPEG有效)")
         quality_layout.addWidget(self.quality_label)
 
+        quality_layout.addWidget(QtWidgets.QLabel("缩放质量:"))
+        self.resize_quality_combo = QtWidgets.QComboBox()
+        self.resize_quality_combo.addItem("高质量", "high")
+        self.resize_quality_combo.addItem("快速", "fast")
+        self.resize_quality_combo.setToolTip(
+            "高质量: 完整解码后缩放\n"
+            "快速: JPEG解码时直接按1/2、1/4、1/8缩小后再缩放，大图明显更快，画质略有差异\n"
+            "可用 python -m utils.image_resize.benchmark 对比耗时和PSNR"
+        )
+        quality_layout.addWidget(self.resize_quality_combo)
+
         quality_layout.addStretch()
         resize_layout.addLayout(quality_layout)
 
@@ -245,6 +256,13 @@ class ImageResizeTab(QtWidgets.QWidget):
         self.open_dir_checkbox.setChecked(True)
         options_layout.addWidget(self.open_dir_checkbox)
 
+        options_layout.addWidget(QtWidgets.QLabel("并行进程数:"))
+        self.num_workers_spin = QtWidgets.QSpinBox()
+        self.num_workers_spin.setRange(1, os.cpu_count() or 1)
+        self.num_workers_spin.setValue(1)
+        self.num_workers_spin.setToolTip("同时缩放图片的进程数，1表示在当前进程中依次处理\n输出文件的命名和分组与进程数无关")
+        options_layout.addWidget(self.num_workers_spin)
+
         options_layout.addStretch()
         output_layout.addLayout(options_layout)
 
@@ -370,20 +388,18 @@ class ImageResizeTab(QtWidgets.QWidget):
     def scan_input_directory(self, dir_path):
         """扫描输入目录并统计文件"""
         try:
-            from utils.image_resize.utils import scan_image_files
-
-            # 直接使用默认设置扫描所有常见图片格式
-            image_files = scan_image_files(dir_path)
-
-            # 更新总文件数
-            self.total_files = len(image_files)
-
-            # 计算总大小
-            total_size = sum(os.path.getsize(f) for f in image_files if os.path.exists(f))
+            from utils.image_resize.utils import iter_image_files
+
+            # 单次遍历同时统计文件数和总大小
+            self.total_files = 0
+            total_size = 0
+            for info in iter_image_files(dir_path):
+                self.total_files += 1
+                total_size += info.size
             size_mb = total_size / (1024 * 1024)
 
             # 更新文件信息
-            if image_files:
+            if self.total_files:
                 self.file_info_label.setText(
                     f"找到 {self.total_files} 张图片 (总计: {size_mb:.2f}MB)"
                 )
@@ -420,6 +436,7 @@ class ImageResizeTab(QtWidgets.QWidget):
             'keep_original_format': self.keep_original.isChecked(),
             'output_format': self.format_combo.currentText().lower(),
             'quality': self.quality_slider.value(),
+            'resize_quality': self.resize_quality_combo.currentData(),
 
             # 输出设置
             'output_dir': self.output_dir_edit.text(),
@@ -430,6 +447,7 @@ class ImageResizeTab(QtWidgets.QWidget):
             'number_digits': self.number_digits_spin.value(),
             'overwrite': self.overwrite_checkbox.isChecked(),
             'open_dir_after': self.open_dir_checkbox.isChecked(),
+            'num_workers': self.num_workers_spin.value(),
         }
         return config
 
@@ -492,7 +510,7 @@ class ImageResizeTab(QtWidgets.QWidget):
         self.progress_bar.setValue(0)
 
         # 创建工作线程
-        from utils.image_resize.processor import ImageProcessorThread
+        from utils.image_resize.thread import ImageProcessorThread
 
         self.worker_thread = ImageProcessorThread(config)
         self.worker_thread.progress_updated.connect(self.progress_updated)
@@ -75,6 +75,22 @@ class ONNXExportTab(QtWidgets.QWidget):
         output_group = QtWidgets.QGroupBox("输出设置")
         output_layout = QtWidgets.QVBoxLayout()
 
+        # 导出目标
+        target_layout = QtWidgets.QHBoxLayout()
+        target_layout.addWidget(QtWidgets.QLabel("导出目标:"))
+
+        self.export_target_combo = QtWidgets.QComboBox()
+        self.export_target_combo.addItem("提示解码器 (标注工具使用)", "decoder")
+        self.export_target_combo.addItem("图像编码器 (生成嵌入向量使用)", "encoder")
+        self.export_target_combo.setToolTip(
+            "图像编码器导出后可在嵌入向量生成工具中选择onnxruntime后端，无需安装PyTorch"
+        )
+        self.export_target_combo.currentIndexChanged.connect(self.on_export_target_changed)
+        target_layout.addWidget(self.export_target_combo)
+
+        target_layout.addStretch()
+        output_layout.addLayout(target_layout)
+
         # ONNX模型路径
         onnx_layout = QtWidgets.QHBoxLayout()
         onnx_layout.addWidget(QtWidgets.QLabel("ONNX模型路径:"))
@@ -201,6 +217,12 @@ class ONNXExportTab(QtWidgets.QWidget):
                 base_path = os.path.splitext(file_path)[0] + ".onnx"
                 self.onnx_path_edit.setText(base_path)
 
+    def on_export_target_changed(self):
+        """图像编码器的输入固定为1024x1024，原始图像尺寸只对解码器有效"""
+        is_decoder = self.export_target_combo.currentData() == "decoder"
+        self.height_spin.setEnabled(is_decoder)
+        self.width_spin.setEnabled(is_decoder)
+
     def browse_onnx_file(self):
         """浏览ONNX输出文件"""
         file_path, _ = QtWidgets.QFileDialog.getSaveFileName(
@@ -223,6 +245,7 @@ class ONNXExportTab(QtWidgets.QWidget):
             'orig_im_size': [self.height_spin.value(), self.width_spin.value()],
             'opset_version': self.opset_spin.value(),
             'quantize': self.quantize_checkbox.isChecked(),
+            'export_target': self.export_target_combo.currentData(),
         }
         return config
 
@@ -288,7 +311,7 @@ class ONNXExportTab(QtWidgets.QWidget):
         self.progress_bar.setValue(0)
 
         # 创建工作线程
-        from utils.onnx_export.processor import ONNXExportProcessorThread
+        from utils.onnx_export.thread import ONNXExportProcessorThread
 
         config = self.get_config()
         self.worker_thread = ONNXExportProcessorThread(config)
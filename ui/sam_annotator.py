@@ -275,13 +275,19 @@ class SAMAnnotatorTab(QtWidgets.QWidget):
         if not self.is_annotating:
             return
 
-        # 保存当前标注
+        # 停止后台推理线程
+        if self.annotation_interface:
+            self.annotation_interface.stop_inference()
+
+        # 保存当前标注：等待合并到COCO文件完成，写入失败时提示
         if self.editor:
             try:
-                self.editor.save()
+                self.editor.close()
                 self.status_label.setText("标注已保存")
             except Exception as e:
                 self.status_label.setText(f"保存失败: {str(e)}")
+                QtWidgets.QMessageBox.warning(self, "警告", f"保存失败: {str(e)}")
+        self.editor = None
 
         # 清理界面
         self.is_annotating = False
@@ -289,8 +295,6 @@ class SAMAnnotatorTab(QtWidgets.QWidget):
         self.stop_btn.setEnabled(False)
         self.annotation_container.setVisible(False)
 
-        # 清理资源
-        self.editor = None
         if self.annotation_interface:
             self.annotation_interface.deleteLater()
             self.annotation_interface = None
@@ -303,3 +307,13 @@ class SAMAnnotatorTab(QtWidgets.QWidget):
                 self.status_label.setText("标注已自动保存")
             except Exception as e:
                 self.status_label.setText(f"自动保存失败: {str(e)}")
+        # 主窗口关闭时停止后台推理线程，并等待标注合并到COCO文件
+        if self.annotation_interface:
+            self.annotation_interface.stop_inference()
+        if self.editor:
+            try:
+                self.editor.close()
+            except Exception as e:
+                QtWidgets.QMessageBox.warning(self, "警告", f"自动保存失败: {str(e)}")
+            self.editor = None
+        self.is_annotating = False
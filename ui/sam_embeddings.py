@@ -67,6 +67,48 @@ class SAMEmbeddingsTab(QtWidgets.QWidget):
 
         model_layout.addLayout(weight_layout)
 
+        # 推理后端选择
+        backend_layout = QtWidgets.QHBoxLayout()
+        backend_layout.addWidget(QtWidgets.QLabel("推理后端:"))
+
+        self.backend_combo = QtWidgets.QComboBox()
+        self.backend_combo.addItem("PyTorch", "pytorch")
+        self.backend_combo.addItem("ONNX Runtime", "onnxruntime")
+        self.backend_combo.setToolTip(
+            "PyTorch: 使用 .pth 权重，需要安装torch和segment_anything\n"
+            "ONNX Runtime: 使用ONNX导出工具导出的图像编码器，只需安装onnxruntime"
+        )
+        self.backend_combo.currentIndexChanged.connect(self.on_backend_changed)
+        backend_layout.addWidget(self.backend_combo)
+
+        backend_layout.addWidget(QtWidgets.QLabel("算子线程数:"))
+        self.intra_op_threads_spin = QtWidgets.QSpinBox()
+        self.intra_op_threads_spin.setRange(0, os.cpu_count() or 1)
+        self.intra_op_threads_spin.setValue(0)
+        self.intra_op_threads_spin.setSpecialValueText("自动")
+        self.intra_op_threads_spin.setToolTip("onnxruntime单个算子内部使用的线程数")
+        self.intra_op_threads_spin.setEnabled(False)
+        backend_layout.addWidget(self.intra_op_threads_spin)
+
+        backend_layout.addStretch()
+        model_layout.addLayout(backend_layout)
+
+        # 图像编码器ONNX模型选择
+        encoder_layout = QtWidgets.QHBoxLayout()
+        encoder_layout.addWidget(QtWidgets.QLabel("编码器模型:"))
+
+        self.encoder_path_edit = QtWidgets.QLineEdit()
+        self.encoder_path_edit.setPlaceholderText("选择导出的图像编码器 (.onnx)")
+        self.encoder_path_edit.setEnabled(False)
+        encoder_layout.addWidget(self.encoder_path_edit)
+
+        self.browse_encoder_btn = QtWidgets.QPushButton("浏览...")
+        self.browse_encoder_btn.clicked.connect(self.browse_encoder_file)
+        self.browse_encoder_btn.setEnabled(False)
+        encoder_layout.addWidget(self.browse_encoder_btn)
+
+        model_layout.addLayout(encoder_layout)
+
         # 设备选择
         device_layout = QtWidgets.QHBoxLayout()
         device_layout.addWidget(QtWidgets.QLabel("运行设备:"))
@@ -78,6 +120,65 @@ class SAMEmbeddingsTab(QtWidgets.QWidget):
         device_layout.addStretch()
         model_layout.addLayout(device_layout)
 
+        # 批大小设置
+        batch_layout = QtWidgets.QHBoxLayout()
+        batch_layout.addWidget(QtWidgets.QLabel("批大小:"))
+
+        self.batch_size_spin = QtWidgets.QSpinBox()
+        self.batch_size_spin.setRange(1, 64)
+        self.batch_size_spin.setValue(1)
+        self.batch_size_spin.setSuffix("张/批")
+        self.batch_size_spin.setToolTip("每次送入图像编码器的图片数量\n增大批大小可提高吞吐量，但会占用更多显存/内存")
+        batch_layout.addWidget(self.batch_size_spin)
+
+        batch_layout.addWidget(QtWidgets.QLabel("预处理线程:"))
+        self.num_workers_spin = QtWidgets.QSpinBox()
+        self.num_workers_spin.setRange(1, 32)
+        self.num_workers_spin.setValue(min(4, os.cpu_count() or 1))
+        self.num_workers_spin.setToolTip("后台解码和预处理图片的线程数")
+        batch_layout.addWidget(self.num_workers_spin)
+
+        batch_layout.addWidget(QtWidgets.QLabel("进程数:"))
+        self.num_processes_spin = QtWidgets.QSpinBox()
+        self.num_processes_spin.setRange(1, os.cpu_count() or 1)
+        self.num_processes_spin.setValue(1)
+        self.num_processes_spin.setToolTip(
+            "并行处理的工作进程数，每个进程加载一份模型\n"
+            "CPU模式下各进程平分CPU核心，多GPU时每个进程使用一张显卡\n"
+            "任务按images文件夹分配，仅对分组模式有效"
+        )
+        batch_layout.addWidget(self.num_processes_spin)
+
+        batch_layout.addStretch()
+        model_layout.addLayout(batch_layout)
+
+        # 存储格式选择
+        format_layout = QtWidgets.QHBoxLayout()
+        format_layout.addWidget(QtWidgets.QLabel("存储格式:"))
+
+        self.storage_format_combo = QtWidgets.QComboBox()
+        self.storage_format_combo.addItems(["float32", "float16", "int8"])
+        self.storage_format_combo.setToolTip(
+            "float32: 原始精度 (约4MB/张)\n"
+            "float16: 半精度 (约2MB/张)\n"
+            "int8: 按通道量化 (约1MB/张)\n"
+            "可用 python -m utils.sam_embeddings.storage_check 检查掩码精度损失"
+        )
+        format_layout.addWidget(self.storage_format_combo)
+
+        format_layout.addWidget(QtWidgets.QLabel("存储方式:"))
+        self.storage_backend_combo = QtWidgets.QComboBox()
+        self.storage_backend_combo.addItem("单文件", "files")
+        self.storage_backend_combo.addItem("分片", "shards")
+        self.storage_backend_combo.setToolTip(
+            "单文件: 每张图片保存一个嵌入向量文件\n"
+            "分片: 所有嵌入向量追加到少量大文件中，并通过shard_index.json索引"
+        )
+        format_layout.addWidget(self.storage_backend_combo)
+
+        format_layout.addStretch()
+        model_layout.addLayout(format_layout)
+
         model_group.setLayout(model_layout)
         content_layout.addWidget(model_group)
 
@@ -111,6 +212,12 @@ class SAMEmbeddingsTab(QtWidgets.QWidget):
         mode_layout.addStretch()
         dataset_layout.addLayout(mode_layout)
 
+        # 增量模式
+        self.incremental_checkbox = QtWidgets.QCheckBox("增量生成（跳过未变化的图片，支持中断后续跑）")
+        self.incremental_checkbox.setChecked(True)
+        self.incremental_checkbox.setToolTip("根据embeddings目录下的manifest.json判断图片和模型是否变化")
+        dataset_layout.addWidget(self.incremental_checkbox)
+
         # 目录结构说明
         dir_structure_label = QtWidgets.QLabel("目录结构说明:")
         dir_structure_label.setStyleSheet("font-weight: bold;")
@@ -224,6 +331,25 @@ class SAMEmbeddingsTab(QtWidgets.QWidget):
         if file_path:
             self.weight_path_edit.setText(file_path)
 
+    def browse_encoder_file(self):
+        """浏览图像编码器ONNX模型"""
+        file_path, _ = QtWidgets.QFileDialog.getOpenFileName(
+            self, "选择图像编码器ONNX模型",
+            str(Path.home()),
+            "ONNX模型文件 (*.onnx);;所有文件 (*.*)"
+        )
+        if file_path:
+            self.encoder_path_edit.setText(file_path)
+
+    def on_backend_changed(self):
+        """根据推理后端切换可用的模型选项"""
+        use_onnx = self.backend_combo.currentData() == "onnxruntime"
+        self.encoder_path_edit.setEnabled(use_onnx)
+        self.browse_encoder_btn.setEnabled(use_onnx)
+        self.intra_op_threads_spin.setEnabled(use_onnx)
+        self.weight_path_edit.setEnabled(not use_onnx)
+        self.browse_weight_btn.setEnabled(not use_onnx)
+
     def browse_dataset_dir(self):
         """浏览数据集目录"""
         dir_path = QtWidgets.QFileDialog.getExistingDirectory(
@@ -239,8 +365,17 @@ class SAMEmbeddingsTab(QtWidgets.QWidget):
             'checkpoint_path': self.weight_path_edit.text(),
             'model_type': self.model_type_combo.currentText(),
             'device': self.device_combo.currentText(),
+            'backend': self.backend_combo.currentData(),
+            'encoder_onnx_path': self.encoder_path_edit.text(),
+            'intra_op_threads': self.intra_op_threads_spin.value(),
+            'batch_size': self.batch_size_spin.value(),
+            'num_workers': self.num_workers_spin.value(),
+            'num_processes': self.num_processes_spin.value(),
+            'storage_format': self.storage_format_combo.currentText(),
+            'storage_backend': self.storage_backend_combo.currentData(),
             'dataset_root': self.dataset_dir_edit.text(),
             'scan_mode': self.scan_mode_combo.currentText(),  # "传统模式" 或 "分组模式"
+            'incremental': self.incremental_checkbox.isChecked(),
         }
         return config
 
@@ -249,13 +384,22 @@ class SAMEmbeddingsTab(QtWidgets.QWidget):
         config = self.get_config()
 
         # 检查权重文件
-        if not config['checkpoint_path']:
-            QtWidgets.QMessageBox.warning(self, "警告", "请选择SAM模型权重文件")
-            return False
+        if config['backend'] == "onnxruntime":
+            if not config['encoder_onnx_path']:
+                QtWidgets.QMessageBox.warning(self, "警告", "请选择图像编码器ONNX模型")
+                return False
+
+            if not os.path.exists(config['encoder_onnx_path']):
+                QtWidgets.QMessageBox.warning(self, "警告", "图像编码器ONNX模型不存在")
+                return False
+        else:
+            if not config['checkpoint_path']:
+                QtWidgets.QMessageBox.warning(self, "警告", "请选择SAM模型权重文件")
+                return False
 
-        if not os.path.exists(config['checkpoint_path']):
-            QtWidgets.QMessageBox.warning(self, "警告", "权重文件不存在")
-            return False
+            if not os.path.exists(config['checkpoint_path']):
+                QtWidgets.QMessageBox.warning(self, "警告", "权重文件不存在")
+                return False
 
         # 检查根目录
         if not config['dataset_root']:
@@ -286,7 +430,7 @@ class SAMEmbeddingsTab(QtWidgets.QWidget):
         self.progress_bar.setValue(0)
 
         # 创建工作线程
-        from utils.sam_embeddings.processor import SAMEmbeddingsProcessorThread
+        from utils.sam_embeddings.thread import SAMEmbeddingsProcessorThread
 
         config = self.get_config()
         self.worker_thread = SAMEmbeddingsProcessorThread(config)
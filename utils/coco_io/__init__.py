@@ -0,0 +1,21 @@
+"""
+COCO标注文件读写
+
+流式扫描大型标注文件并按需解析标注，扫描结果以列式二进制缓存保存在标注文件旁，
+再次打开时只需映射缓存文件
+"""
+
+from .stream import scan_coco, CocoScan
+from .cache import scan_coco_cached, load_cache, save_cache, cache_path
+from .lazy import LazyCocoFile, CocoSnapshot
+
+__all__ = [
+    'scan_coco',
+    'CocoScan',
+    'scan_coco_cached',
+    'load_cache',
+    'save_cache',
+    'cache_path',
+    'LazyCocoFile',
+    'CocoSnapshot',
+]
@@ -0,0 +1,160 @@
+"""
+标注文件的列式二进制缓存
+
+流式扫描的结果（图片表、标注的id/图片id/类别id/外接矩形列以及每个标注在标注文件中的字节范围）
+保存在标注文件旁的 <annotations.json>.cache 中：
+
+    8字节标识 | 8字节元数据长度 | 元数据(JSON) | 按64字节对齐的各列数据
+
+元数据记录标注文件的大小和修改时间（mtime_ns）、顶层字段以及每一列的类型、形状和
+（相对于数据区起点的）偏移。
+打开时通过 np.memmap 映射缓存文件，各列直接作为只读数组使用，不解析任何JSON文本；
+标注文件的大小或修改时间变化时重新扫描并重建缓存。
+标注的分割等完整内容不复制到缓存中，仍按记录的字节范围从标注文件中读取
+"""
+
+import os
+import json
+import struct
+import numpy as np
+from typing import Callable, Dict, Optional
+
+from .stream import CocoScan, scan_coco
+
+CACHE_MAGIC = b"COCOCOL\0"
+CACHE_VERSION = 1
+CACHE_ALIGNMENT = 64
+
+# 按顺序写入缓存的数组列
+ARRAY_COLUMNS = (
+    "image_ids", "image_widths", "image_heights",
+    "ann_ids", "ann_image_ids", "ann_category_ids", "ann_bboxes",
+    "ann_offsets", "ann_lengths", "ann_id_order", "ann_image_order",
+)
+
+
+def cache_path(coco_json_path: str) -> str:
+    """标注文件对应的缓存文件路径"""
+    return coco_json_path + ".cache"
+
+
+def _source_signature(stat: os.stat_result) -> Dict:
+    return {"source_size": stat.st_size, "source_mtime_ns": stat.st_mtime_ns}
+
+
+def _data_start(meta_length: int) -> int:
+    """数据区起点：元数据之后按 CACHE_ALIGNMENT 对齐"""
+    end = 16 + meta_length
+    return end + (-end) % CACHE_ALIGNMENT
+
+
+def save_cache(coco_json_path: str, scan: CocoScan, stat: os.stat_result) -> bool:
+    """
+    原子地写入缓存，返回是否成功（目录不可写时不保存）
+
+    Args:
+        stat: 生成 scan 时标注文件的状态，用于之后验证缓存
+    """
+    # 文件名用'\0'分隔存为一个字节块
+    names = "\0".join(scan.image_file_names).encode("utf-8")
+    blocks = [np.ascontiguousarray(getattr(scan, name)) for name in ARRAY_COLUMNS]
+    blocks.append(np.frombuffer(names, dtype=np.uint8))
+    column_names = list(ARRAY_COLUMNS) + ["image_file_names"]
+
+    columns = {}
+    offset = 0
+    for name, block in zip(column_names, blocks):
+        columns[name] = {"dtype": block.dtype.newbyteorder("<").str, "shape": list(block.shape),
+                         "offset": offset}
+        offset += block.nbytes
+        offset += (-offset) % CACHE_ALIGNMENT
+    meta = dict(
+        _source_signature(stat),
+        version=CACHE_VERSION,
+        keys=scan.keys,
+        header=scan.header,
+        images_range=scan.images_range,
+        num_images=len(scan.image_file_names),
+        columns=columns,
+    )
+    meta_bytes = json.dumps(meta).encode("utf-8")
+    data_start = _data_start(len(meta_bytes))
+
+    path = cache_path(coco_json_path)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(CACHE_MAGIC + struct.pack("<Q", len(meta_bytes)) + meta_bytes)
+            for name, block in zip(column_names, blocks):
+                f.write(b"\0" * (data_start + columns[name]["offset"] - f.tell()))
+                f.write(block.astype(columns[name]["dtype"], copy=False).tobytes())
+        os.replace(temp_path, path)
+    except OSError:
+        # 缓存目录不可写，或缓存文件仍被映射（Windows）时放弃本次保存
+        if os.path.exists(temp_path):
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+        return False
+    return True
+
+
+def load_cache(coco_json_path: str, stat: os.stat_result) -> Optional[CocoScan]:
+    """映射缓存文件，缓存不存在、版本不符或与标注文件不一致时返回None"""
+    try:
+        data = np.memmap(cache_path(coco_json_path), dtype=np.uint8, mode="r")
+    except (OSError, ValueError):
+        return None
+    try:
+        if len(data) < 16 or bytes(data[:8]) != CACHE_MAGIC:
+            return None
+        meta_length = struct.unpack("<Q", bytes(data[8:16]))[0]
+        meta = json.loads(bytes(data[16:16 + meta_length]).decode("utf-8"))
+        if meta.get("version") != CACHE_VERSION or any(
+                meta.get(key) != value for key, value in _source_signature(stat).items()):
+            return None
+
+        data_start = _data_start(meta_length)
+        arrays = {}
+        for name, column in meta["columns"].items():
+            dtype = np.dtype(column["dtype"])
+            shape = tuple(column["shape"])
+            start = data_start + column["offset"]
+            end = start + dtype.itemsize * int(np.prod(shape))
+            if end > len(data):
+                return None
+            arrays[name] = data[start:end].view(dtype).reshape(shape)
+    except (ValueError, KeyError, TypeError, struct.error):
+        return None
+
+    names = bytes(arrays.pop("image_file_names")).decode("utf-8")
+    image_file_names = names.split("\0") if meta["num_images"] else []
+    images_range = meta["images_range"]
+    return CocoScan(
+        keys=meta["keys"],
+        header=meta["header"],
+        images=None,
+        images_range=tuple(images_range) if images_range is not None else None,
+        image_file_names=image_file_names,
+        **arrays,
+    )
+
+
+def scan_coco_cached(coco_json_path: str,
+                     progress_callback: Callable[[int, int], None] = None) -> CocoScan:
+    """
+    读取标注文件的扫描结果，缓存有效时直接映射缓存，否则流式扫描并重建缓存
+
+    Args:
+        progress_callback: 重新扫描时传给 scan_coco
+    """
+    stat = os.stat(coco_json_path)
+    scan = load_cache(coco_json_path, stat)
+    if scan is not None:
+        return scan
+    scan = scan_coco(coco_json_path, progress_callback)
+    # 扫描期间文件被修改时不保存缓存
+    if _source_signature(os.stat(coco_json_path)) == _source_signature(stat):
+        save_cache(coco_json_path, scan, stat)
+    return scan
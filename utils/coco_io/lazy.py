@@ -0,0 +1,313 @@
+"""
+按需解析标注的COCO文件
+
+打开时读取列式缓存（见 cache.py，缓存失效时流式扫描一遍文件并重建），得到图片表、类别等顶层字段
+以及每个标注的id、图片id和在文件中的位置；标注在第一次被访问时才从文件中读取并解析，之后保留解析结果。
+打开后添加、覆盖和删除的标注单独记录，写入新文件后并入列数据。
+内存占用取决于列数据大小和已查看的图片数量，与文件大小无关
+"""
+
+import os
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from .stream import CocoScan, annotation_arrays, append_annotation, append_row, new_annotation_columns
+from .cache import save_cache, scan_coco_cached
+
+
+class CocoSnapshot(NamedTuple):
+    """写入时使用的快照，其中的列数据和标注与 LazyCocoFile 共享且不会被修改"""
+    keys: List[str]
+    header: Dict
+    images: Optional[List[Dict]]
+    base: CocoScan
+    changes: "OrderedDict[int, Optional[Dict]]"
+
+
+def _positions(base: CocoScan, ann_ids: np.ndarray) -> np.ndarray:
+    """一组标注id在列数据中的下标，不存在的为-1"""
+    if len(base.ann_ids) == 0:
+        return np.full(len(ann_ids), -1, dtype=np.int64)
+    order = base.ann_id_order
+    index = np.minimum(np.searchsorted(base.ann_ids, ann_ids, sorter=order), len(order) - 1)
+    positions = order[index]
+    return np.where(base.ann_ids[positions] == ann_ids, positions, -1)
+
+
+class LazyCocoFile:
+    """
+    按需解析标注的COCO数据
+
+    文件中的标注以列数据（base，只读，通常是缓存文件的内存映射）表示，
+    打开后添加或覆盖的标注按id记录在 changes 中，删除的记为None。
+    读取文件和替换文件都持有 lock，后台写入新文件后可以安全地替换列数据
+    """
+
+    def __init__(self, path: str, scan: CocoScan):
+        self.path = path
+        self.keys = list(scan.keys)
+        self.header = scan.header
+        self.base = scan
+        self._images = scan.images
+        # 已解析的文件中的标注 {id: 标注}
+        self.parsed: Dict[int, Dict] = {}
+        self.changes: "OrderedDict[int, Optional[Dict]]" = OrderedDict()
+        # 已访问过的图片的标注id，添加和删除时同步更新
+        self.by_image: Dict[int, List[int]] = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path: str, progress_callback: Callable[[int, int], None] = None) -> "LazyCocoFile":
+        """读取列式缓存，缓存失效时流式扫描文件并重建缓存"""
+        return cls(path, scan_coco_cached(path, progress_callback))
+
+    @property
+    def images(self) -> List[Dict]:
+        """完整的图片列表，从缓存打开时在第一次访问时从文件中读取"""
+        if self._images is None:
+            with self.lock:
+                images_range = self.base.images_range
+                if images_range is None:
+                    self._images = []
+                else:
+                    with open(self.path, "rb") as f:
+                        f.seek(images_range[0])
+                        self._images = json.loads(f.read(images_range[1]))
+        return self._images
+
+    @property
+    def image_ids(self) -> np.ndarray:
+        return self.base.image_ids
+
+    @property
+    def image_file_names(self) -> List[str]:
+        return self.base.image_file_names
+
+    @property
+    def categories(self) -> List[Dict]:
+        return self.header.get("categories", [])
+
+    def _base_position(self, ann_id: int) -> int:
+        """标注id在列数据中的下标，不存在时返回-1"""
+        return int(_positions(self.base, np.array([ann_id], dtype=np.int64))[0])
+
+    def _image_id_of(self, ann_id: int) -> Optional[int]:
+        """标注当前所属的图片id，不存在时返回None"""
+        if ann_id in self.changes:
+            annotation = self.changes[ann_id]
+            return None if annotation is None else annotation["image_id"]
+        position = self._base_position(ann_id)
+        return None if position < 0 else int(self.base.ann_image_ids[position])
+
+    def ids_for_image(self, image_id: int) -> List[int]:
+        """
+        图片的标注id（文件中的顺序，打开后添加的在后）
+
+        第一次访问时在列数据中二分查找，结果保留并随添加和删除更新，调用方不应修改返回的列表
+        """
+        ann_ids = self.by_image.get(image_id)
+        if ann_ids is None:
+            with self.lock:
+                base = self.base
+                order = base.ann_image_order
+                start, end = np.searchsorted(base.ann_image_ids, [image_id, image_id + 1], sorter=order)
+                base_ids = base.ann_ids[order[start:end]].tolist()
+                ann_ids = [ann_id for ann_id in base_ids if self._image_id_of(ann_id) == image_id]
+                in_base = set(base_ids)
+                ann_ids.extend(
+                    ann_id for ann_id, annotation in self.changes.items()
+                    if annotation is not None and annotation["image_id"] == image_id and ann_id not in in_base
+                )
+                self.by_image[image_id] = ann_ids
+        return ann_ids
+
+    def _load(self, ann_ids: List[int]):
+        """解析一批尚未解析的标注（调用方持有 lock；一次打开文件，按偏移顺序读取）"""
+        base = self.base
+        refs = []
+        for ann_id in ann_ids:
+            if ann_id in self.changes or ann_id in self.parsed:
+                continue
+            position = self._base_position(ann_id)
+            refs.append((int(base.ann_offsets[position]), int(base.ann_lengths[position]), ann_id))
+        if not refs:
+            return
+        refs.sort()
+        with open(self.path, "rb") as f:
+            for offset, length, ann_id in refs:
+                f.seek(offset)
+                self.parsed[ann_id] = json.loads(f.read(length))
+
+    def _current(self, ann_id: int) -> Dict:
+        if ann_id in self.changes:
+            return self.changes[ann_id]
+        return self.parsed[ann_id]
+
+    def annotation(self, ann_id: int) -> Dict:
+        """获取一个标注，第一次访问时解析，不存在时抛出KeyError"""
+        with self.lock:
+            if self._image_id_of(ann_id) is None:
+                raise KeyError(ann_id)
+            self._load([ann_id])
+            return self._current(ann_id)
+
+    def annotations_for_image(self, image_id: int) -> List[Dict]:
+        """获取一张图片的所有标注，第一次访问时解析"""
+        ann_ids = self.ids_for_image(image_id)
+        with self.lock:
+            self._load(ann_ids)
+            return [self._current(ann_id) for ann_id in ann_ids]
+
+    def upsert(self, annotation: Dict):
+        """添加标注，id已存在时覆盖"""
+        ann_id = annotation["id"]
+        image_id = annotation["image_id"]
+        with self.lock:
+            old_image_id = self._image_id_of(ann_id)
+            self.changes[ann_id] = annotation
+            if old_image_id == image_id:
+                return
+            if old_image_id in self.by_image:
+                self.by_image[old_image_id].remove(ann_id)
+            if image_id in self.by_image:
+                self.by_image[image_id].append(ann_id)
+
+    def delete(self, ann_id: int) -> bool:
+        """按id删除标注，返回是否存在"""
+        with self.lock:
+            image_id = self._image_id_of(ann_id)
+            if image_id is None:
+                return False
+            # 打开后添加的标注也记为删除，避免尚未写完的快照在替换列数据时把它带回来
+            self.changes[ann_id] = None
+            if image_id in self.by_image:
+                self.by_image[image_id].remove(ann_id)
+            return True
+
+    def max_annotation_id(self) -> int:
+        """最大的标注id，没有标注时返回-1"""
+        with self.lock:
+            candidates = [ann_id for ann_id, annotation in self.changes.items() if annotation is not None]
+            # 从最大的id开始找第一个未被修改的
+            for position in self.base.ann_id_order[::-1]:
+                ann_id = int(self.base.ann_ids[position])
+                if ann_id not in self.changes:
+                    candidates.append(ann_id)
+                    break
+            return max(candidates, default=-1)
+
+    def snapshot(self) -> CocoSnapshot:
+        """当前数据的快照，供后台写入"""
+        with self.lock:
+            return CocoSnapshot(list(self.keys), dict(self.header), self._images, self.base,
+                                OrderedDict(self.changes))
+
+    def write_snapshot(self, snapshot: CocoSnapshot, indent: Optional[int] = 2):
+        """
+        原子地写入快照并更新缓存（在后台写入线程中调用）
+
+        未修改的标注直接复制原文件中的字节，不经过解析。
+        写入临时文件并落盘后替换原文件，列数据换成新文件的，快照中的修改并入列数据
+        """
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            new_base = self._write_temp(snapshot, temp_path, indent)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        with self.lock:
+            os.replace(temp_path, self.path)
+            stat = os.stat(self.path)
+            self.base = new_base
+            for ann_id, annotation in snapshot.changes.items():
+                if annotation is None:
+                    self.parsed.pop(ann_id, None)
+                else:
+                    self.parsed[ann_id] = annotation
+                # 快照之后没有再修改的标注已包含在新文件中
+                if ann_id in self.changes and self.changes[ann_id] is annotation:
+                    del self.changes[ann_id]
+        save_cache(self.path, new_base, stat)
+
+    def _write_temp(self, snapshot: CocoSnapshot, temp_path: str, indent: Optional[int]) -> CocoScan:
+        """写入临时文件并落盘，返回新文件的列数据"""
+        base = snapshot.base
+        # 只有写入线程会替换文件，读取当前的列数据后不再需要持有锁
+        with self.lock:
+            current = self.base
+        # 快照之后前一次写入可能已经替换了文件，未修改的标注按id在当前列数据中查找位置
+        positions = np.arange(len(base.ann_ids)) if current is base else _positions(current, base.ann_ids)
+        offsets = current.ann_offsets[positions].tolist()
+        lengths = current.ann_lengths[positions].tolist()
+
+        changes = snapshot.changes
+        columns = new_annotation_columns()
+        images_range = None
+        with open(temp_path, "wb") as out, open(self.path, "rb") as source:
+            position = 0
+
+            def write(data: bytes):
+                nonlocal position
+                out.write(data)
+                position += len(data)
+
+            write(b"{")
+            for i, key in enumerate(snapshot.keys):
+                write((",\n" if i else "\n").encode("utf-8"))
+                write(json.dumps(key).encode("utf-8") + b": ")
+                if key == "images":
+                    if snapshot.images is not None:
+                        data = json.dumps(snapshot.images, indent=indent).encode("utf-8")
+                    elif current.images_range is not None:
+                        source.seek(current.images_range[0])
+                        data = source.read(current.images_range[1])
+                    else:
+                        data = b"[]"
+                    images_range = (position, len(data))
+                    write(data)
+                    continue
+                if key != "annotations":
+                    write(json.dumps(snapshot.header.get(key), indent=indent).encode("utf-8"))
+                    continue
+
+                write(b"[")
+                count = 0
+
+                def write_annotation(data: bytes) -> int:
+                    """写入一个标注，返回其起始偏移"""
+                    nonlocal count
+                    write(b",\n" if count else b"\n")
+                    count += 1
+                    offset = position
+                    write(data)
+                    return offset
+
+                # 文件中的标注按原顺序写入（被覆盖的写在原位置），之后是新添加的
+                rows = zip(base.ann_ids.tolist(), base.ann_image_ids.tolist(), base.ann_category_ids.tolist(),
+                           base.ann_bboxes.tolist(), offsets, lengths)
+                for ann_id, image_id, category_id, bbox, offset, length in rows:
+                    if ann_id not in changes:
+                        source.seek(offset)
+                        new_offset = write_annotation(source.read(length))
+                        append_row(columns, ann_id, image_id, category_id, bbox, new_offset, length)
+                    elif changes[ann_id] is not None:
+                        data = json.dumps(changes[ann_id]).encode("utf-8")
+                        append_annotation(columns, changes[ann_id], write_annotation(data), len(data))
+                added = np.array(list(changes), dtype=np.int64)
+                for ann_id in added[_positions(base, added) < 0].tolist():
+                    if changes[ann_id] is not None:
+                        data = json.dumps(changes[ann_id]).encode("utf-8")
+                        append_annotation(columns, changes[ann_id], write_annotation(data), len(data))
+                write(b"\n]")
+            write(b"\n}\n")
+            out.flush()
+            os.fsync(out.fileno())
+
+        return base._replace(keys=snapshot.keys, header=snapshot.header, images=snapshot.images,
+                             images_range=images_range, **annotation_arrays(columns))
@@ -0,0 +1,262 @@
+"""
+COCO标注文件的流式扫描
+
+按块读取JSON文本，逐个解析顶层字段和数组元素，内存中同时只保留一个元素。
+"annotations" 数组中的每个标注只记录id、image_id、category_id、bbox以及在文件中的字节偏移和长度，
+解析完即丢弃，标注的完整内容在需要显示时再按偏移读取。
+"images" 数组记录为图片表（id、宽高、文件名）和整个数组在文件中的字节范围
+"""
+
+import re
+import json
+import codecs
+from array import array
+from typing import BinaryIO, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class _JsonStreamReader:
+    """
+    基于 json.JSONDecoder.raw_decode 的增量读取器
+
+    缓冲区保存已解码的文本，解析失败（值在缓冲区末尾被截断）时继续读取下一块再重试，
+    同时记录当前位置对应的文件字节偏移
+    """
+
+    def __init__(self, f: BinaryIO, chunk_size: int = 1 << 20):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.json_decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.byte_pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        """读取下一块数据，丢弃已经处理过的部分，文件已读完时返回False"""
+        if self.eof:
+            return False
+        # 读取量不少于尚未处理的数据量，超大的值反复重试时缓冲区按倍数增长，总解析量保持线性
+        chunk = self.f.read(max(self.chunk_size, len(self.buf) - self.pos))
+        if not chunk:
+            self.eof = True
+            text = self.decoder.decode(b"", final=True)
+        else:
+            text = self.decoder.decode(chunk)
+        self.buf = self.buf[self.pos:] + text
+        self.pos = 0
+        return bool(chunk)
+
+    def _advance(self, end: int):
+        self.byte_pos += len(self.buf[self.pos:end].encode("utf-8"))
+        self.pos = end
+
+    def peek(self) -> str:
+        """跳过空白，返回下一个字符（文件结束时返回空字符串）"""
+        while True:
+            end = _WHITESPACE.match(self.buf, self.pos).end()
+            self._advance(end)
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"JSON格式错误: 字节 {self.byte_pos} 处应为 '{char}'")
+        self._advance(self.pos + 1)
+
+    def read_value(self) -> Tuple[object, int, int]:
+        """解析下一个值，返回 (值, 起始字节偏移, 字节长度)"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # 值在缓冲区末尾被截断时读取更多数据重试，文件已读完仍失败则为格式错误
+                if not self._fill():
+                    raise
+                continue
+            # 数字可能在缓冲区末尾被截断，读取更多数据后重新解析
+            if end == len(self.buf) and not self.eof:
+                self._fill()
+                continue
+            break
+        start = self.byte_pos
+        self._advance(end)
+        return value, start, self.byte_pos - start
+
+    def iter_array(self) -> Iterator[Tuple[object, int, int]]:
+        """逐个解析数组元素，产出 (元素, 起始字节偏移, 字节长度)"""
+        self.expect("[")
+        if self.peek() == "]":
+            self._advance(self.pos + 1)
+            return
+        while True:
+            yield self.read_value()
+            char = self.peek()
+            self._advance(self.pos + 1)
+            if char == "]":
+                return
+            if char != ",":
+                raise ValueError(f"JSON格式错误: 字节 {self.byte_pos} 处应为 ',' 或 ']'")
+
+
+class CocoScan(NamedTuple):
+    """
+    流式扫描的结果（列式存储，数组创建后不再修改）
+
+    Attributes:
+        keys: 顶层字段的顺序（含 "images" 和 "annotations"）
+        header: 除 "images" 和 "annotations" 外的顶层字段
+        images: 已解析的图片列表，从缓存读取时为None（按 images_range 从标注文件中读取）
+        images_range: "images" 数组在标注文件中的 (字节偏移, 字节长度)，没有该字段时为None
+        image_ids / image_widths / image_heights / image_file_names: 图片表
+        ann_ids / ann_image_ids / ann_category_ids / ann_bboxes: 每个标注的id、图片id、类别id和外接矩形
+        ann_offsets / ann_lengths: 每个标注在标注文件中的字节范围
+        ann_id_order: 按id排序的标注下标
+        ann_image_order: 按图片id排序的标注下标（同一图片内保持文件中的顺序）
+    """
+    keys: List[str]
+    header: Dict
+    images: Optional[List[Dict]]
+    images_range: Optional[Tuple[int, int]]
+    image_ids: np.ndarray
+    image_widths: np.ndarray
+    image_heights: np.ndarray
+    image_file_names: List[str]
+    ann_ids: np.ndarray
+    ann_image_ids: np.ndarray
+    ann_category_ids: np.ndarray
+    ann_bboxes: np.ndarray
+    ann_offsets: np.ndarray
+    ann_lengths: np.ndarray
+    ann_id_order: np.ndarray
+    ann_image_order: np.ndarray
+
+
+def build_scan(keys: List[str], header: Dict, images: Optional[List[Dict]],
+               images_range: Optional[Tuple[int, int]], annotations: Dict[str, array]) -> CocoScan:
+    """
+    由逐个收集的标注列构建 CocoScan
+
+    Args:
+        annotations: "id"、"image_id"、"category_id"、"offset"、"length"（array("q")）和
+            "bbox"（array("d")，每个标注4个值）
+    """
+    images = images or []
+    return CocoScan(
+        keys=keys,
+        header=header,
+        images=images,
+        images_range=images_range,
+        image_ids=np.array([image.get("id", -1) for image in images], dtype=np.int64),
+        image_widths=np.array([image.get("width", 0) for image in images], dtype=np.int64),
+        image_heights=np.array([image.get("height", 0) for image in images], dtype=np.int64),
+        image_file_names=[image.get("file_name", "") for image in images],
+        **annotation_arrays(annotations),
+    )
+
+
+def annotation_arrays(annotations: Dict[str, array]) -> Dict[str, np.ndarray]:
+    """由逐个收集的标注列生成 CocoScan 中以 "ann_" 开头的各个数组"""
+    ann_ids = np.array(annotations["id"], dtype=np.int64)
+    ann_image_ids = np.array(annotations["image_id"], dtype=np.int64)
+    return dict(
+        ann_ids=ann_ids,
+        ann_image_ids=ann_image_ids,
+        ann_category_ids=np.array(annotations["category_id"], dtype=np.int64),
+        ann_bboxes=np.array(annotations["bbox"], dtype=np.float64).reshape(-1, 4),
+        ann_offsets=np.array(annotations["offset"], dtype=np.int64),
+        ann_lengths=np.array(annotations["length"], dtype=np.int64),
+        ann_id_order=np.argsort(ann_ids, kind="stable"),
+        ann_image_order=np.argsort(ann_image_ids, kind="stable"),
+    )
+
+
+def new_annotation_columns() -> Dict[str, array]:
+    """build_scan 使用的空标注列"""
+    columns = {name: array("q") for name in ("id", "image_id", "category_id", "offset", "length")}
+    columns["bbox"] = array("d")
+    return columns
+
+
+def append_row(columns: Dict[str, array], ann_id: int, image_id: int, category_id: int,
+               bbox, offset: int, length: int):
+    """向标注列追加一行"""
+    columns["id"].append(ann_id)
+    columns["image_id"].append(image_id)
+    columns["category_id"].append(category_id)
+    columns["bbox"].extend(bbox)
+    columns["offset"].append(offset)
+    columns["length"].append(length)
+
+
+def append_annotation(columns: Dict[str, array], annotation: Dict, offset: int, length: int):
+    """向标注列追加一个标注，缺少的类别和外接矩形分别记为-1和0"""
+    bbox = annotation.get("bbox") or (0.0, 0.0, 0.0, 0.0)
+    append_row(columns, annotation["id"], annotation["image_id"], annotation.get("category_id", -1),
+               [float(v) for v in (list(bbox[:4]) + [0.0] * 4)[:4]], offset, length)
+
+
+def scan_coco(path: str, progress_callback: Callable[[int, int], None] = None) -> CocoScan:
+    """
+    流式扫描COCO标注文件
+
+    Args:
+        path: 标注文件路径
+        progress_callback: 每扫描一个标注后以 (已读取字节数, 文件总字节数) 调用，可为None
+    """
+    keys = []
+    header = {}
+    images = None
+    images_range = None
+    columns = new_annotation_columns()
+
+    with open(path, "rb") as f:
+        f.seek(0, 2)
+        total = f.tell()
+        f.seek(0)
+        # 跳过UTF-8 BOM
+        if f.read(3) != codecs.BOM_UTF8:
+            f.seek(0)
+        reader = _JsonStreamReader(f)
+        reader.byte_pos = f.tell()
+
+        reader.expect("{")
+        if reader.peek() == "}":
+            reader._advance(reader.pos + 1)
+        else:
+            while True:
+                key, _, _ = reader.read_value()
+                reader.expect(":")
+                keys.append(key)
+                if key == "annotations":
+                    for annotation, offset, length in reader.iter_array():
+                        append_annotation(columns, annotation, offset, length)
+                        if progress_callback is not None:
+                            progress_callback(offset + length, total)
+                elif key == "images":
+                    reader.peek()
+                    start = reader.byte_pos
+                    images = [value for value, _, _ in reader.iter_array()]
+                    images_range = (start, reader.byte_pos - start)
+                elif reader.peek() == "[":
+                    header[key] = [value for value, _, _ in reader.iter_array()]
+                else:
+                    header[key], _, _ = reader.read_value()
+                char = reader.peek()
+                reader._advance(reader.pos + 1)
+                if char == "}":
+                    break
+                if char != ",":
+                    raise ValueError(f"JSON格式错误: 字节 {reader.byte_pos} 处应为 ',' 或 '}}'")
+
+    for key in ("images", "annotations"):
+        if key not in keys:
+            keys.append(key)
+    return build_scan(keys, header, images, images_range, columns)
@@ -0,0 +1,17 @@
+"""
+目录索引工具包
+"""
+
+from .index import (
+    DatasetIndex, ImageFileInfo, IMAGE_EXTENSIONS,
+    default_cache_dir, probe_image_size, probe_image_sizes
+)
+
+__all__ = [
+    'DatasetIndex',
+    'ImageFileInfo',
+    'IMAGE_EXTENSIONS',
+    'default_cache_dir',
+    'probe_image_size',
+    'probe_image_sizes',
+]
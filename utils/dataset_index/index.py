@@ -0,0 +1,303 @@
+"""
+目录索引
+
+为每个目录缓存一份图片列表（文件名、大小、修改时间、宽高）和子目录列表，
+保存在用户缓存目录中（默认 ~/.cache/prts-sam/dataset_index，可通过环境变量
+PRTS_SAM_CACHE_DIR 修改），按目录的绝对路径区分：
+
+~/.cache/prts-sam/dataset_index/
+├── 3f2a...e1.json    # 某个images目录
+└── ...
+
+目录的修改时间（mtime）不变时直接使用缓存，否则重新扫描该目录，
+大小和修改时间未变化的文件沿用之前读取的宽高。
+图片处理工具的扫描、嵌入向量生成和标注工具共用同一份索引。
+注意：原地修改文件内容不会改变目录的mtime，这种情况不会被检测到
+"""
+
+import os
+import json
+import time
+import struct
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+try:
+    from PIL import Image
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+
+INDEX_VERSION = 1
+
+# 默认支持的图片格式（不区分大小写）
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp', '.gif'}
+
+# 在索引时间前这么短时间内修改过的目录，mtime可能还会在同一时间刻度内再次变化，不信任其缓存
+RACY_WINDOW_NS = 2 * 1000 * 1000 * 1000
+
+
+class ImageFileInfo(NamedTuple):
+    """索引中的图片文件信息，宽高未读取时为0"""
+    path: str
+    size: int
+    mtime: float
+    width: int = 0
+    height: int = 0
+
+
+def default_cache_dir() -> str:
+    """索引缓存目录"""
+    cache_dir = os.environ.get("PRTS_SAM_CACHE_DIR")
+    if not cache_dir:
+        cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "prts-sam")
+    return os.path.join(cache_dir, "dataset_index")
+
+
+# JPEG中记录图像尺寸的SOF段标记（排除DHT/JPG/DAC）
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def _exif_orientation(tiff: bytes) -> int:
+    """从EXIF的TIFF结构中读取IFD0的方向标签（0x0112），读取失败时返回1"""
+    endian = {b"II": "<", b"MM": ">"}.get(tiff[:2])
+    if endian is None or len(tiff) < 8:
+        return 1
+    ifd_offset = struct.unpack(endian + "I", tiff[4:8])[0]
+    if ifd_offset + 2 > len(tiff):
+        return 1
+    count = struct.unpack(endian + "H", tiff[ifd_offset:ifd_offset + 2])[0]
+    for i in range(count):
+        entry = ifd_offset + 2 + i * 12
+        if entry + 12 > len(tiff):
+            break
+        tag = struct.unpack(endian + "H", tiff[entry:entry + 2])[0]
+        if tag == 0x0112:
+            return struct.unpack(endian + "H", tiff[entry + 8:entry + 10])[0]
+    return 1
+
+
+def _probe_jpeg(f) -> Optional[Tuple[int, int]]:
+    """逐段跳过JPEG标记段直到SOF，不解码图像数据"""
+    orientation = 1
+    while True:
+        byte = f.read(1)
+        if not byte:
+            return None
+        if byte != b"\xff":
+            continue
+        marker = f.read(1)
+        while marker == b"\xff":
+            marker = f.read(1)
+        if not marker:
+            return None
+        code = marker[0]
+        # 无长度字段的独立标记
+        if code in (0x01, 0xD8) or 0xD0 <= code <= 0xD7:
+            continue
+        # 到达图像数据或文件结尾仍未找到SOF
+        if code in (0xD9, 0xDA):
+            return None
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0]
+        if code in JPEG_SOF_MARKERS:
+            segment = f.read(5)
+            if len(segment) < 5:
+                return None
+            _, height, width = struct.unpack(">BHH", segment)
+            # 与cv2.imread一致：按EXIF方向旋转90度的图片交换宽高
+            if orientation in (5, 6, 7, 8):
+                width, height = height, width
+            return width, height
+        if code == 0xE1 and orientation == 1:
+            segment = f.read(length - 2)
+            if segment[:6] == b"Exif\x00\x00":
+                orientation = _exif_orientation(segment[6:])
+        else:
+            f.seek(length - 2, os.SEEK_CUR)
+
+
+def probe_image_size(path: str) -> Optional[Tuple[int, int]]:
+    """
+    只读取文件头获取图片宽高 (width, height)，失败时返回None
+
+    JPEG直接解析SOF段（并按EXIF方向交换宽高，与cv2.imread的结果一致），
+    PNG直接读取IHDR，其他格式使用PIL的延迟加载只读取文件头
+    """
+    try:
+        with open(path, "rb") as f:
+            head = f.read(24)
+            if head[:2] == b"\xff\xd8":
+                f.seek(2)
+                size = _probe_jpeg(f)
+                if size is not None:
+                    return size
+            elif head[:8] == PNG_SIGNATURE and head[12:16] == b"IHDR":
+                return struct.unpack(">II", head[16:24])
+    except (OSError, struct.error):
+        pass
+
+    if not HAS_PIL:
+        return None
+    try:
+        with Image.open(path) as img:
+            return img.size
+    except Exception:
+        return None
+
+
+def probe_image_sizes(paths: List[str], num_workers: int = 8) -> List[Optional[Tuple[int, int]]]:
+    """
+    在线程池中并行读取多张图片的宽高，结果顺序与输入一致
+
+    只读取文件头，主要耗时在文件IO上，使用线程即可在网络文件系统上并行等待
+    """
+    if len(paths) <= 1 or num_workers <= 1:
+        return [probe_image_size(path) for path in paths]
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        return list(executor.map(probe_image_size, paths))
+
+
+def _scan_directory(directory: str) -> Tuple[List[str], Dict[str, List]]:
+    """
+    扫描单个目录，返回 (子目录名列表, {文件名: [大小, mtime_ns, 宽, 高]})
+
+    与 glob 的 '**' 行为一致：跳过以'.'开头的隐藏文件和目录，子目录的符号链接会被跟随
+    """
+    subdirs = []
+    files = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            try:
+                if entry.is_dir():
+                    subdirs.append(entry.name)
+                elif os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                    stat = entry.stat()
+                    files[entry.name] = [stat.st_size, stat.st_mtime_ns, 0, 0]
+            except OSError:
+                # 文件在扫描过程中被删除或无权限访问
+                continue
+    return sorted(subdirs), files
+
+
+class DatasetIndex:
+    """
+    目录索引
+
+    每个实例在内存中保留已验证过的目录，同一次处理中重复列目录只需一次stat
+    """
+
+    def __init__(self, cache_dir: str = None):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self._dirs: Dict[str, Dict] = {}
+
+    def _cache_path(self, directory: str) -> str:
+        key = hashlib.sha1(directory.encode("utf-8", "surrogateescape")).hexdigest()
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def _read_cache(self, directory: str) -> Optional[Dict]:
+        try:
+            with open(self._cache_path(directory), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != INDEX_VERSION or data.get("path") != directory:
+            return None
+        return data
+
+    def _write_cache(self, directory: str, data: Dict):
+        """原子地写入目录索引，缓存目录不可写时只保留在内存中"""
+        cache_path = self._cache_path(directory)
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, cache_path)
+        except OSError:
+            pass
+
+    def _directory(self, directory: str) -> Dict:
+        """获取目录的索引项，目录有变化时重新扫描"""
+        directory = os.path.abspath(directory)
+        mtime_ns = os.stat(directory).st_mtime_ns
+
+        data = self._dirs.get(directory)
+        if data is None:
+            data = self._read_cache(directory)
+        if (data is not None and data["mtime_ns"] == mtime_ns
+                and mtime_ns < data["indexed_ns"] - RACY_WINDOW_NS):
+            self._dirs[directory] = data
+            return data
+
+        indexed_ns = time.time_ns()
+        subdirs, files = _scan_directory(directory)
+        if data is not None:
+            # 大小和修改时间未变化的文件沿用之前读取的宽高
+            for name, entry in files.items():
+                previous = data["files"].get(name)
+                if previous is not None and previous[:2] == entry[:2]:
+                    entry[2:] = previous[2:]
+
+        data = {
+            "version": INDEX_VERSION,
+            "path": directory,
+            "mtime_ns": mtime_ns,
+            "indexed_ns": indexed_ns,
+            "subdirs": subdirs,
+            "files": files,
+        }
+        self._dirs[directory] = data
+        self._write_cache(directory, data)
+        return data
+
+    def _fill_sizes(self, data: Dict):
+        """读取尚未记录宽高的图片的文件头"""
+        missing = [name for name, entry in data["files"].items() if entry[2] == 0]
+        sizes = probe_image_sizes([os.path.join(data["path"], name) for name in missing])
+        updated = False
+        for name, size in zip(missing, sizes):
+            if size is not None:
+                data["files"][name][2:] = list(size)
+                updated = True
+        if updated:
+            self._write_cache(data["path"], data)
+
+    def list_dir(self, directory: str, with_sizes: bool = False) -> List[ImageFileInfo]:
+        """
+        列出目录中的图片（不递归）
+
+        Args:
+            directory: 目录路径
+            with_sizes: 是否读取图片宽高（只读取一次，之后保存在索引中）
+        """
+        data = self._directory(directory)
+        if with_sizes:
+            self._fill_sizes(data)
+        return [
+            ImageFileInfo(os.path.join(directory, name), entry[0], entry[1] / 1e9, entry[2], entry[3])
+            for name, entry in data["files"].items()
+        ]
+
+    def walk(self, root: str, with_sizes: bool = False) -> Iterator[ImageFileInfo]:
+        """递归列出目录树中的图片，按遍历顺序逐个产出"""
+        stack = [root]
+        while stack:
+            current = stack.pop()
+            try:
+                data = self._directory(current)
+            except OSError:
+                continue
+            if with_sizes:
+                self._fill_sizes(data)
+            for name, entry in data["files"].items():
+                yield ImageFileInfo(os.path.join(current, name), entry[0], entry[1] / 1e9,
+                                    entry[2], entry[3])
+            # 倒序入栈，使子目录按名称顺序出栈
+            stack.extend(os.path.join(current, name) for name in reversed(data["subdirs"]))
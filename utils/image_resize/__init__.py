@@ -2,11 +2,21 @@
 图片批量处理工具包
 """
 
-from .processor import ImageProcessor, ImageProcessorThread
-from .utils import scan_image_files
+from .processor import ImageProcessor
+from .utils import scan_image_files, iter_image_files, ImageFileInfo
 
 __all__ = [
     'ImageProcessor',
     'ImageProcessorThread',
     'scan_image_files',
+    'iter_image_files',
+    'ImageFileInfo',
 ]
+
+
+def __getattr__(name):
+    # 延迟导入处理线程，命令行模式下无需加载PyQt5
+    if name == 'ImageProcessorThread':
+        from .thread import ImageProcessorThread
+        return ImageProcessorThread
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
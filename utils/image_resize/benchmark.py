@@ -0,0 +1,111 @@
+"""
+图片缩放质量模式对比
+
+分别用高质量模式（完整解码）和快速模式（JPEG降采样解码）缩放同一批图片，
+统计每张图片的平均耗时，并以高质量模式的结果为基准计算快速模式的PSNR
+
+用法:
+    python -m utils.image_resize.benchmark --input-dir raw_images --width 1024 --height 1024
+"""
+
+import time
+import argparse
+import numpy as np
+from typing import Dict, List
+
+from PIL import Image
+
+from .processor import load_resized_image
+from .utils import scan_image_files
+
+
+def psnr(reference: np.ndarray, image: np.ndarray) -> float:
+    """计算两张同尺寸8位图片的PSNR（dB），完全相同时返回inf"""
+    mse = np.mean((reference.astype(np.float64) - image.astype(np.float64)) ** 2)
+    if mse == 0:
+        return float("inf")
+    return float(10 * np.log10(255.0 ** 2 / mse))
+
+
+def benchmark_resize(image_files: List[str], options: Dict, repeats: int = 1) -> Dict[str, Dict]:
+    """
+    对比两种缩放质量模式
+
+    Args:
+        image_files: 图片路径列表
+        options: target_width / target_height / mode（quality字段不影响结果）
+        repeats: 每种模式重复次数，取最短耗时
+
+    Returns:
+        {模式: {"ms_per_image", "images"}}，快速模式另含 "mean_psnr" 和 "min_psnr"
+    """
+    results = {}
+    outputs = {}
+    for resize_quality in ("high", "fast"):
+        mode_options = dict(options, resize_quality=resize_quality)
+        best = None
+        for _ in range(repeats):
+            images = []
+            start = time.perf_counter()
+            for image_file in image_files:
+                images.append(load_resized_image(image_file, mode_options))
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        outputs[resize_quality] = images
+        results[resize_quality] = {
+            "ms_per_image": best * 1000 / max(1, len(image_files)),
+            "images": len(image_files),
+        }
+
+    values = []
+    for reference, image in zip(outputs["high"], outputs["fast"]):
+        # 降采样解码的取整可能导致等比例模式下尺寸相差1像素，对齐后再比较
+        if image.size != reference.size:
+            image = image.resize(reference.size, Image.Resampling.LANCZOS)
+        if image.mode != reference.mode:
+            image = image.convert(reference.mode)
+        values.append(psnr(np.asarray(reference), np.asarray(image)))
+
+    finite = [v for v in values if np.isfinite(v)]
+    results["fast"].update(
+        mean_psnr=float(np.mean(finite)) if finite else float("inf"),
+        min_psnr=float(np.min(values)) if values else float("inf"),
+    )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="图片缩放质量模式对比")
+    parser.add_argument("--input-dir", required=True, help="图片目录（建议使用大尺寸JPEG）")
+    parser.add_argument("--width", type=int, default=1024, help="目标宽度")
+    parser.add_argument("--height", type=int, default=1024, help="目标高度")
+    parser.add_argument("--mode", choices=["aspect", "stretch", "crop"], default="aspect",
+                        help="缩放模式")
+    parser.add_argument("--num-images", type=int, default=50, help="最多使用的图片数量")
+    parser.add_argument("--repeats", type=int, default=3, help="重复次数，取最短耗时")
+    args = parser.parse_args()
+
+    image_files = scan_image_files(args.input_dir)[:args.num_images]
+    if not image_files:
+        print(f"未找到图片文件: {args.input_dir}")
+        return
+
+    options = {
+        'target_width': args.width,
+        'target_height': args.height,
+        'mode': args.mode,
+        'quality': 90,
+    }
+    results = benchmark_resize(image_files, options, args.repeats)
+
+    print(f"{'模式':<8}{'耗时/张':>12}{'平均PSNR':>12}{'最小PSNR':>12}")
+    high, fast = results["high"], results["fast"]
+    print(f"{'high':<8}{high['ms_per_image']:>10.1f}ms{'(基准)':>12}{'(基准)':>12}")
+    print(f"{'fast':<8}{fast['ms_per_image']:>10.1f}ms"
+          f"{fast['mean_psnr']:>10.2f}dB{fast['min_psnr']:>10.2f}dB")
+    speedup = high["ms_per_image"] / max(1e-9, fast["ms_per_image"])
+    print(f"快速模式加速比: {speedup:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,7 @@ import time
 import threading
 from pathlib import Path
 from typing import Dict, List, Tuple
-from PyQt5 import QtCore
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 
 try:
     from PIL import Image
@@ -19,10 +19,130 @@ except ImportError:
 
 from .utils import (
     scan_image_files, create_groups,
-    format_number
+    format_number, ProgressTracker
 )
 
 
+def _draft_size(width: int, height: int, options: Dict):
+    """计算缩放后的图片尺寸，作为JPEG降采样解码的下限；无需缩小时返回None"""
+    target_width = options['target_width']
+    target_height = options['target_height']
+    mode = options['mode']
+
+    if mode == 'aspect':
+        ratio = min(target_width / width, target_height / height)
+    elif mode == 'crop':
+        ratio = max(target_width / width, target_height / height)
+    else:
+        return (target_width, target_height)
+
+    if ratio >= 1:
+        return None
+    return (max(1, int(width * ratio)), max(1, int(height * ratio)))
+
+
+def load_resized_image(input_path: str, options: Dict) -> "Image.Image":
+    """
+    打开图片并按缩放模式缩放
+
+    快速模式下JPEG在解码阶段就按1/2、1/4、1/8缩小（DCT域降采样），
+    解码结果不小于目标尺寸，再用LANCZOS缩放到最终尺寸
+
+    Args:
+        input_path: 输入图片路径
+        options: target_width / target_height / mode / quality / resize_quality
+    """
+    with Image.open(input_path) as img:
+        if options.get('resize_quality', 'high') == 'fast' and img.format == 'JPEG':
+            draft_size = _draft_size(img.width, img.height, options)
+            if draft_size is not None:
+                img.draft(None, draft_size)
+
+        # 转换模式（如果需要）
+        if img.mode not in ['RGB', 'RGBA', 'L', 'P']:
+            img = img.convert('RGB')
+
+        # 获取目标尺寸
+        target_width = options['target_width']
+        target_height = options['target_height']
+        mode = options['mode']
+
+        # 应用缩放
+        if mode == 'aspect':
+            # 等比例缩放
+            img.thumbnail((target_width, target_height), Image.Resampling.LANCZOS)
+        elif mode == 'stretch':
+            # 拉伸缩放
+            img = img.resize((target_width, target_height), Image.Resampling.LANCZOS)
+        elif mode == 'crop':
+            # 裁剪填充（居中裁剪）
+            width_ratio = target_width / img.width
+            height_ratio = target_height / img.height
+            ratio = max(width_ratio, height_ratio)
+
+            new_size = (int(img.width * ratio), int(img.height * ratio))
+            img = img.resize(new_size, Image.Resampling.LANCZOS)
+
+            # 裁剪
+            left = (img.width - target_width) // 2
+            top = (img.height - target_height) // 2
+            right = left + target_width
+            bottom = top + target_height
+
+            img = img.crop((left, top, right, bottom))
+
+        img.load()
+        return img
+
+
+def resize_image(input_path: str, output_path: Path, options: Dict) -> Tuple[bool, str]:
+    """
+    处理单张图片
+
+    定义在模块级别，以便在进程池的工作进程中执行
+
+    Args:
+        input_path: 输入图片路径
+        output_path: 输出图片路径
+        options: target_width / target_height / mode / quality / resize_quality
+    """
+    try:
+        img = load_resized_image(input_path, options)
+
+        # 保存图片
+        save_kwargs = {}
+
+        # 确定保存格式
+        output_ext = output_path.suffix.lower()
+        if output_ext in ['.jpg', '.jpeg']:
+            save_format = 'JPEG'
+            save_kwargs['quality'] = options['quality']
+            # 如果图片有透明通道，转换为RGB
+            if img.mode in ['RGBA', 'LA', 'PA']:
+                img = img.convert('RGB')
+        elif output_ext == '.png':
+            save_format = 'PNG'
+            save_kwargs['compress_level'] = 6
+        elif output_ext == '.webp':
+            save_format = 'WEBP'
+            save_kwargs['quality'] = options['quality']
+        else:
+            # 默认保存为PNG
+            save_format = 'PNG'
+            output_path = output_path.with_suffix('.png')
+
+        # 确保输出目录存在
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # 保存图片
+        img.save(output_path, save_format, **save_kwargs)
+
+        return True, "成功"
+
+    except Exception as e:
+        return False, str(e)
+
+
 class ImageProcessor:
     """图片处理器"""
 
@@ -30,6 +150,8 @@ class ImageProcessor:
         self.config = config
         self.progress_callback = None
         self.should_stop = False
+        self.num_workers = max(1, int(config.get('num_workers', 1)))
+        self.executor = None
 
         # 验证Pillow
         if not HAS_PIL:
@@ -86,27 +208,36 @@ class ImageProcessor:
                 import shutil
                 shutil.rmtree(output_base)
 
-            # 4. 处理训练集
-            if train_files:
-                success, msg = self._process_file_set(
-                    train_files, train_root, "train", len(image_files), 15, 60
-                )
-                if not success:
-                    return False, msg
-
-                if self.should_stop:
-                    return False, "处理被用户中断"
-
-            # 5. 处理验证集
-            if val_files:
-                success, msg = self._process_file_set(
-                    val_files, val_root, "val", len(image_files), 75, 20
-                )
-                if not success:
-                    return False, msg
-
-                if self.should_stop:
-                    return False, "处理被用户中断"
+            # 多进程模式：训练集和验证集共用同一个进程池
+            if self.num_workers > 1:
+                self.executor = ProcessPoolExecutor(max_workers=self.num_workers)
+
+            try:
+                # 4. 处理训练集
+                if train_files:
+                    success, msg = self._process_file_set(
+                        train_files, train_root, "train", len(image_files), 15, 60
+                    )
+                    if not success:
+                        return False, msg
+
+                    if self.should_stop:
+                        return False, "处理被用户中断"
+
+                # 5. 处理验证集
+                if val_files:
+                    success, msg = self._process_file_set(
+                        val_files, val_root, "val", len(image_files), 75, 20
+                    )
+                    if not success:
+                        return False, msg
+
+                    if self.should_stop:
+                        return False, "处理被用户中断"
+            finally:
+                if self.executor is not None:
+                    self.executor.shutdown(wait=True)
+                    self.executor = None
 
             # 6. 完成
             self._update_progress(100, "处理完成")
@@ -128,35 +259,15 @@ class ImageProcessor:
         # 分组
         groups = create_groups(files, group_size)
 
-        # 处理每个组
+        # 预先确定每张图片的输出路径，并行处理时命名与串行处理完全一致
+        tasks = []
         file_counter = start_number
 
         for group_idx, file_group in enumerate(groups):
-            if self.should_stop:
-                return False, "处理被用户中断"
-
-            # 创建组目录
             group_dir_name = f"{prefix}_{group_idx + 1:03d}"
             group_dir = output_root / group_dir_name / "images"
-            group_dir.mkdir(parents=True, exist_ok=True)
-
-            # 处理组内的每张图片
-            for file_idx, input_file in enumerate(file_group):
-                if self.should_stop:
-                    return False, "处理被用户中断"
-
-                # 计算整体进度
-                processed_count = file_counter - start_number
-                total_count = len(files)
-                group_progress = (processed_count / total_count) * progress_range
-                overall_progress = start_progress + group_progress
-
-                # 更新进度
-                self._update_progress(
-                    int(overall_progress),
-                    f"正在处理 {prefix} 图片: {processed_count + 1}/{total_count}"
-                )
 
+            for input_file in file_group:
                 # 生成输出文件名
                 output_filename = f"{prefix}_{format_number(file_counter, number_digits)}"
 
@@ -167,122 +278,105 @@ class ImageProcessor:
                     output_format = self.config.get('output_format', 'png')
                     output_ext = f".{output_format}"
 
-                output_path = group_dir / f"{output_filename}{output_ext}"
-
-                # 处理图片
-                success, msg = self._process_single_image(input_file, output_path)
-                if not success:
-                    print(f"处理图片失败 {input_file}: {msg}")
-                    # 可以选择跳过失败的文件或停止处理
-                    # 这里选择跳过
-
+                tasks.append((input_file, group_dir / f"{output_filename}{output_ext}"))
                 file_counter += 1
 
-        return True, f"{prefix}处理完成"
+        if self.executor is not None:
+            return self._process_tasks_parallel(tasks, prefix, start_progress, progress_range)
 
-    def _process_single_image(self, input_path: str, output_path: Path) -> Tuple[bool, str]:
-        """处理单张图片"""
-        try:
-            # 打开图片
-            with Image.open(input_path) as img:
-                # 转换模式（如果需要）
-                if img.mode not in ['RGB', 'RGBA', 'L', 'P']:
-                    img = img.convert('RGB')
-
-                # 获取目标尺寸
-                target_width = self.config.get('target_width', 1024)
-                target_height = self.config.get('target_height', 1024)
-                mode = self.config.get('mode', 'aspect')
-
-                # 应用缩放
-                if mode == 'aspect':
-                    # 等比例缩放
-                    img.thumbnail((target_width, target_height), Image.Resampling.LANCZOS)
-                elif mode == 'stretch':
-                    # 拉伸缩放
-                    img = img.resize((target_width, target_height), Image.Resampling.LANCZOS)
-                elif mode == 'crop':
-                    # 裁剪填充（居中裁剪）
-                    width_ratio = target_width / img.width
-                    height_ratio = target_height / img.height
-                    ratio = max(width_ratio, height_ratio)
-
-                    new_size = (int(img.width * ratio), int(img.height * ratio))
-                    img = img.resize(new_size, Image.Resampling.LANCZOS)
-
-                    # 裁剪
-                    left = (img.width - target_width) // 2
-                    top = (img.height - target_height) // 2
-                    right = left + target_width
-                    bottom = top + target_height
-
-                    img = img.crop((left, top, right, bottom))
-
-                # 保存图片
-                save_kwargs = {}
-
-                # 确定保存格式
-                output_ext = output_path.suffix.lower()
-                if output_ext in ['.jpg', '.jpeg']:
-                    save_format = 'JPEG'
-                    save_kwargs['quality'] = self.config.get('quality', 90)
-                    # 如果图片有透明通道，转换为RGB
-                    if img.mode in ['RGBA', 'LA', 'PA']:
-                        img = img.convert('RGB')
-                elif output_ext == '.png':
-                    save_format = 'PNG'
-                    save_kwargs['compress_level'] = 6
-                elif output_ext == '.webp':
-                    save_format = 'WEBP'
-                    save_kwargs['quality'] = self.config.get('quality', 90)
-                else:
-                    # 默认保存为PNG
-                    save_format = 'PNG'
-                    output_path = output_path.with_suffix('.png')
-
-                # 确保输出目录存在
-                output_path.parent.mkdir(parents=True, exist_ok=True)
+        for processed_count, (input_file, output_path) in enumerate(tasks):
+            if self.should_stop:
+                return False, "处理被用户中断"
 
-                # 保存图片
-                img.save(output_path, save_format, **save_kwargs)
+            # 计算整体进度
+            total_count = len(tasks)
+            overall_progress = start_progress + (processed_count / total_count) * progress_range
 
-                return True, "成功"
+            # 更新进度
+            self._update_progress(
+                int(overall_progress),
+                f"正在处理 {prefix} 图片: {processed_count + 1}/{total_count}"
+            )
 
-        except Exception as e:
-            return False, str(e)
+            # 创建组目录
+            output_path.parent.mkdir(parents=True, exist_ok=True)
 
-    def _update_progress(self, progress: int, message: str):
-        """更新进度"""
-        if self.progress_callback:
-            self.progress_callback(progress, message)
+            # 处理图片
+            success, msg = self._process_single_image(input_file, output_path)
+            if not success:
+                print(f"处理图片失败 {input_file}: {msg}")
+                # 可以选择跳过失败的文件或停止处理
+                # 这里选择跳过
 
+        return True, f"{prefix}处理完成"
 
-class ImageProcessorThread(QtCore.QThread):
-    """图片处理线程（用于PyQt）"""
+    def _process_tasks_parallel(self, tasks: List[Tuple[str, Path]], prefix: str,
+                                start_progress: int, progress_range: int) -> Tuple[bool, str]:
+        """
+        在进程池中处理图片
+
+        最多只有 num_workers 的若干倍任务在途，停止时不再提交新任务，
+        等在途的图片处理完后返回，不会留下写了一半的文件
+        """
+        total_count = len(tasks)
+        tracker = ProgressTracker(total_count)
+        options = self._resize_options()
+        max_pending = self.num_workers * 4
+        task_iter = iter(tasks)
+        pending = {}
+
+        while True:
+            while not self.should_stop and len(pending) < max_pending:
+                task = next(task_iter, None)
+                if task is None:
+                    break
+                input_file, output_path = task
+                output_path.parent.mkdir(parents=True, exist_ok=True)
+                future = self.executor.submit(resize_image, input_file, output_path, options)
+                pending[future] = input_file
+
+            if not pending:
+                break
+
+            done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                input_file = pending.pop(future)
+                try:
+                    success, msg = future.result()
+                except Exception as e:
+                    success, msg = False, str(e)
+                if not success:
+                    print(f"处理图片失败 {input_file}: {msg}")
+                tracker.increment()
 
-    progress_updated = QtCore.pyqtSignal(int, str)
-    processing_finished = QtCore.pyqtSignal(bool, str)
+            if done:
+                processed_count = tracker.get_processed()
+                overall_progress = start_progress + (processed_count / total_count) * progress_range
+                self._update_progress(
+                    int(overall_progress),
+                    f"正在处理 {prefix} 图片: {processed_count}/{total_count}"
+                )
 
-    def __init__(self, config: Dict):
-        super().__init__()
-        self.config = config
-        self.processor = None
+        if self.should_stop:
+            return False, "处理被用户中断"
 
-    def run(self):
-        """线程运行函数"""
-        try:
-            self.processor = ImageProcessor(self.config)
-            self.processor.set_progress_callback(
-                lambda p, m: self.progress_updated.emit(p, m)
-            )
+        return True, f"{prefix}处理完成"
 
-            success, message = self.processor.process()
-            self.processing_finished.emit(success, message)
+    def _resize_options(self) -> Dict:
+        """单张图片处理所需的参数（需可在进程间传递）"""
+        return {
+            'target_width': self.config.get('target_width', 1024),
+            'target_height': self.config.get('target_height', 1024),
+            'mode': self.config.get('mode', 'aspect'),
+            'quality': self.config.get('quality', 90),
+            'resize_quality': self.config.get('resize_quality', 'high'),
+        }
 
-        except Exception as e:
-            self.processing_finished.emit(False, f"线程执行出错: {str(e)}")
+    def _process_single_image(self, input_path: str, output_path: Path) -> Tuple[bool, str]:
+        """处理单张图片"""
+        return resize_image(input_path, output_path, self._resize_options())
 
-    def stop(self):
-        """停止处理"""
-        if self.processor:
-            self.processor.stop()
+    def _update_progress(self, progress: int, message: str):
+        """更新进度"""
+        if self.progress_callback:
+            self.progress_callback(progress, message)
@@ -3,36 +3,37 @@
 """
 
 import os
-import glob
 from pathlib import Path
-from typing import List, Tuple
+from typing import Iterator, List, Tuple
 import threading
 
+from utils.dataset_index import DatasetIndex, ImageFileInfo, IMAGE_EXTENSIONS
 
-def scan_image_files(directory: str) -> List[str]:
+
+def iter_image_files(directory: str) -> Iterator[ImageFileInfo]:
     """
-    扫描目录中的图片文件
+    递归列出目录中的图片文件，逐个产出路径、大小和修改时间
+
+    通过目录索引遍历，只有mtime发生变化的目录才会被重新扫描。
+    与 glob 的 '**' 行为一致：跳过以'.'开头的隐藏文件和目录，结果按遍历顺序产出，不做排序
 
     Args:
         directory: 要扫描的目录
-
-    Returns:
-        图片文件路径列表
     """
-    # 默认支持的图片格式
-    extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp', '.gif']
+    return DatasetIndex().walk(directory)
 
-    image_files = []
 
-    # 总是递归扫描子目录
-    for ext in extensions:
-        pattern = os.path.join(directory, '**', f'*{ext}')
-        image_files.extend(glob.glob(pattern, recursive=True))
+def scan_image_files(directory: str) -> List[str]:
+    """
+    扫描目录中的图片文件
 
-    # 过滤掉可能重复的文件（某些扩展名可能有不同的大小写）
-    image_files = list(set(image_files))
+    Args:
+        directory: 要扫描的目录
 
-    return sorted(image_files)
+    Returns:
+        排序后的图片文件路径列表
+    """
+    return sorted(info.path for info in iter_image_files(directory))
 
 
 def create_groups(files: List[str], group_size: int) -> List[List[str]]:
@@ -2,8 +2,14 @@
 ONNX模型导出工具包
 """
 
-from .processor import ONNXExportProcessorThread
-
 __all__ = [
     'ONNXExportProcessorThread',
 ]
+
+
+def __getattr__(name):
+    # 延迟导入处理线程，命令行模式下无需加载PyQt5
+    if name == 'ONNXExportProcessorThread':
+        from .thread import ONNXExportProcessorThread
+        return ONNXExportProcessorThread
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
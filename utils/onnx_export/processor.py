@@ -5,9 +5,10 @@ ONNX模型导出核心逻辑
 import os
 import sys
 import time
+import shutil
+import tempfile
 from pathlib import Path
 from typing import Dict, Tuple
-from PyQt5 import QtCore
 
 # 尝试导入必要的库
 try:
@@ -67,6 +68,7 @@ class ONNXExportProcessor:
             orig_im_size = self.config['orig_im_size']
             opset_version = self.config['opset_version']
             quantize = self.config['quantize']
+            export_target = self.config.get('export_target', 'decoder')  # "decoder" 或 "encoder"
 
             # 1. 加载SAM模型
             self._update_progress(10, "正在加载SAM模型...")
@@ -84,7 +86,9 @@ class ONNXExportProcessor:
             self._update_progress(30, "正在准备ONNX模型...")
 
             try:
-                onnx_model = SamOnnxModel(sam, return_single_mask=True)
+                onnx_model, dummy_inputs, output_names, dynamic_axes = self._prepare_export(
+                    sam, export_target, orig_im_size
+                )
                 self._update_progress(40, "ONNX模型准备完成")
             except Exception as e:
                 return False, f"准备ONNX模型失败: {str(e)}"
@@ -92,40 +96,29 @@ class ONNXExportProcessor:
             if self.should_stop:
                 return False, "导出被用户中断"
 
-            # 3. 导出ONNX模型
-            self._update_progress(50, "正在导出ONNX模型...")
-
+            # 量化时先导出到输出目录下的临时目录：超过2GB的编码器会在模型旁写出大量外部数据文件，
+            # 量化结果写入目标路径后整个临时目录被删除，不会留下未量化的权重
+            temp_dir = None
+            export_path = onnx_model_path
+            if quantize and HAS_ONNXRUNTIME:
+                output_dir = os.path.dirname(os.path.abspath(onnx_model_path))
+                temp_dir = tempfile.mkdtemp(prefix=".onnx_export_", dir=output_dir)
+                export_path = os.path.join(temp_dir, os.path.basename(onnx_model_path))
             try:
-                # 定义动态轴
-                dynamic_axes = {
-                    "point_coords": {1: "num_points"},
-                    "point_labels": {1: "num_points"},
-                }
-
-                # 准备虚拟输入
-                embed_dim = sam.prompt_encoder.embed_dim
-                embed_size = sam.prompt_encoder.image_embedding_size
-                mask_input_size = [4 * x for x in embed_size]
-                dummy_inputs = {
-                    "image_embeddings": torch.randn(1, embed_dim, *embed_size, dtype=torch.float),
-                    "point_coords": torch.randint(low=0, high=1024, size=(1, 5, 2), dtype=torch.float),
-                    "point_labels": torch.randint(low=0, high=4, size=(1, 5), dtype=torch.float),
-                    "mask_input": torch.randn(1, 1, *mask_input_size, dtype=torch.float),
-                    "has_mask_input": torch.tensor([1], dtype=torch.float),
-                    "orig_im_size": torch.tensor(orig_im_size, dtype=torch.float),
-                }
-                output_names = ["masks", "iou_predictions", "low_res_masks"]
-
-                # 导出模型
-                import warnings
-                with warnings.catch_warnings():
-                    warnings.filterwarnings("ignore", category=torch.jit.TracerWarning)
-                    warnings.filterwarnings("ignore", category=UserWarning)
-                    with open(onnx_model_path, "wb") as f:
+                # 3. 导出ONNX模型
+                self._update_progress(50, "正在导出ONNX模型...")
+
+                try:
+                    # 导出模型
+                    import warnings
+                    with warnings.catch_warnings():
+                        warnings.filterwarnings("ignore", category=torch.jit.TracerWarning)
+                        warnings.filterwarnings("ignore", category=UserWarning)
+                        # 传入路径而不是文件对象，超过2GB的图像编码器（如vit_h）才能以外部数据格式保存
                         torch.onnx.export(
                             onnx_model,
                             tuple(dummy_inputs.values()),
-                            f,
+                            export_path,
                             export_params=True,
                             verbose=False,
                             opset_version=opset_version,
@@ -135,108 +128,150 @@ class ONNXExportProcessor:
                             dynamic_axes=dynamic_axes,
                         )
 
-                self._update_progress(80, "ONNX模型导出完成")
-            except Exception as e:
-                return False, f"导出ONNX模型失败: {str(e)}"
-
-            if self.should_stop:
-                return False, "导出被用户中断"
-
-            # 4. 量化（如果启用）
-            if quantize:
-                self._update_progress(85, "正在量化模型...")
-
-                try:
-                    # 检查onnxruntime是否可用
-                    if not HAS_ONNXRUNTIME:
-                        self._update_progress(90, "警告: onnxruntime库未安装，跳过量化步骤")
-                        quantize_str = "未量化（缺少onnxruntime库）"
-                    else:
-                        import shutil
-                        temp_model_path = os.path.join(os.path.split(onnx_model_path)[0], "temp.onnx")
-                        shutil.copy(onnx_model_path, temp_model_path)
-
-                        # 直接使用原CLI工具的代码，但使用最简单的参数
-                        try:
-                            # 尝试使用原CLI工具的完整参数
-                            quantize_dynamic(
-                                model_input=temp_model_path,
-                                model_output=onnx_model_path,
-                                optimize_model=True,
-                                per_channel=False,
-                                reduce_range=False,
-                                weight_type=QuantType.QUInt8,
-                            )
-                        except TypeError:
-                            # 如果参数错误，尝试不带optimize_model的版本
-                            quantize_dynamic(
-                                model_input=temp_model_path,
-                                model_output=onnx_model_path,
-                                per_channel=False,
-                                reduce_range=False,
-                                weight_type=QuantType.QUInt8,
-                            )
-
-                        os.remove(temp_model_path)
-                        quantize_str = "已量化"
-
-                        self._update_progress(95, "模型量化完成")
+                    self._update_progress(80, "ONNX模型导出完成")
                 except Exception as e:
-                    # 如果量化失败，但ONNX模型已经成功导出，我们仍然认为导出成功
-                    self._update_progress(95, f"警告: 量化失败，但ONNX模型已导出: {str(e)[:100]}...")
-                    quantize_str = "量化失败"
-            else:
-                self._update_progress(95, "跳过量化步骤")
-                quantize_str = "未量化"
-
-            if self.should_stop:
-                return False, "导出被用户中断"
-
-            # 5. 完成
-            self._update_progress(100, "导出完成")
-
-            # 获取文件大小
-            file_size_mb = 0
-            if os.path.exists(onnx_model_path):
-                file_size_mb = os.path.getsize(onnx_model_path) / (1024 * 1024)
-
-            return True, f"ONNX模型导出成功 ({quantize_str}, 大小: {file_size_mb:.2f}MB)"
+                    return False, f"导出ONNX模型失败: {str(e)}"
+
+                if self.should_stop:
+                    return False, "导出被用户中断"
+
+                # 4. 量化（如果启用）
+                if quantize:
+                    self._update_progress(85, "正在量化模型...")
+
+                    try:
+                        # 检查onnxruntime是否可用
+                        if not HAS_ONNXRUNTIME:
+                            self._update_progress(90, "警告: onnxruntime库未安装，跳过量化步骤")
+                            quantize_str = "未量化（缺少onnxruntime库）"
+                        else:
+                            # 图像编码器可能超过protobuf的2GB限制，需要读写外部数据
+                            quantize_kwargs = {}
+                            if export_target == "encoder":
+                                quantize_kwargs['use_external_data_format'] = True
+
+                            # 直接使用原CLI工具的代码，但使用最简单的参数
+                            try:
+                                # 尝试使用原CLI工具的完整参数
+                                quantize_dynamic(
+                                    model_input=export_path,
+                                    model_output=onnx_model_path,
+                                    optimize_model=True,
+                                    per_channel=False,
+                                    reduce_range=False,
+                                    weight_type=QuantType.QUInt8,
+                                    **quantize_kwargs,
+                                )
+                            except TypeError:
+                                # 如果参数错误，尝试不带optimize_model的版本
+                                quantize_dynamic(
+                                    model_input=export_path,
+                                    model_output=onnx_model_path,
+                                    per_channel=False,
+                                    reduce_range=False,
+                                    weight_type=QuantType.QUInt8,
+                                    **quantize_kwargs,
+                                )
+
+                            quantize_str = "已量化"
+
+                            self._update_progress(95, "模型量化完成")
+                    except Exception as e:
+                        # 如果量化失败，但ONNX模型已经成功导出，我们仍然认为导出成功
+                        try:
+                            self._move_exported_model(export_path, onnx_model_path)
+                        except Exception as move_error:
+                            return False, f"量化失败，且无法保留未量化的模型: {str(move_error)}"
+                        self._update_progress(95, f"警告: 量化失败，但ONNX模型已导出: {str(e)[:100]}...")
+                        quantize_str = "量化失败"
+                else:
+                    self._update_progress(95, "跳过量化步骤")
+                    quantize_str = "未量化"
+
+                if self.should_stop:
+                    return False, "导出被用户中断"
+
+                # 5. 完成
+                self._update_progress(100, "导出完成")
+
+                # 获取文件大小
+                file_size_mb = 0
+                if os.path.exists(onnx_model_path):
+                    file_size_mb = os.path.getsize(onnx_model_path) / (1024 * 1024)
+
+                target_str = "图像编码器" if export_target == "encoder" else "提示解码器"
+                return True, f"ONNX{target_str}导出成功 ({quantize_str}, 大小: {file_size_mb:.2f}MB)"
+            finally:
+                if temp_dir is not None:
+                    shutil.rmtree(temp_dir, ignore_errors=True)
 
         except Exception as e:
             return False, f"导出过程中出错: {str(e)}"
 
+    @staticmethod
+    def _move_exported_model(export_path: str, onnx_model_path: str):
+        """将临时目录中未量化的模型及其引用的外部数据文件移动到目标路径（量化失败时使用）"""
+        if export_path == onnx_model_path or not os.path.exists(export_path):
+            return
+        import onnx
+        model = onnx.load(export_path, load_external_data=False)
+        locations = {
+            entry.value
+            for tensor in model.graph.initializer
+            if tensor.data_location == onnx.TensorProto.EXTERNAL
+            for entry in tensor.external_data
+            if entry.key == "location"
+        }
+        source_dir = os.path.dirname(export_path)
+        output_dir = os.path.dirname(os.path.abspath(onnx_model_path))
+        for location in locations:
+            os.replace(os.path.join(source_dir, location), os.path.join(output_dir, location))
+        os.replace(export_path, onnx_model_path)
+
+    def _prepare_export(self, sam, export_target: str, orig_im_size):
+        """
+        准备待导出的模型和虚拟输入
+
+        Returns:
+            (模型, 虚拟输入字典, 输出名称列表, 动态轴)
+        """
+        if export_target == "encoder":
+            # 图像编码器：输入为预处理后的 Bx3x1024x1024 图片，输出 Bx256x64x64 嵌入向量
+            img_size = sam.image_encoder.img_size
+            dummy_inputs = {
+                "input_image": torch.randn(1, 3, img_size, img_size, dtype=torch.float),
+            }
+            output_names = ["image_embeddings"]
+            dynamic_axes = {
+                "input_image": {0: "batch_size"},
+                "image_embeddings": {0: "batch_size"},
+            }
+            return sam.image_encoder, dummy_inputs, output_names, dynamic_axes
+
+        onnx_model = SamOnnxModel(sam, return_single_mask=True)
+
+        # 定义动态轴
+        dynamic_axes = {
+            "point_coords": {1: "num_points"},
+            "point_labels": {1: "num_points"},
+        }
+
+        # 准备虚拟输入
+        embed_dim = sam.prompt_encoder.embed_dim
+        embed_size = sam.prompt_encoder.image_embedding_size
+        mask_input_size = [4 * x for x in embed_size]
+        dummy_inputs = {
+            "image_embeddings": torch.randn(1, embed_dim, *embed_size, dtype=torch.float),
+            "point_coords": torch.randint(low=0, high=1024, size=(1, 5, 2), dtype=torch.float),
+            "point_labels": torch.randint(low=0, high=4, size=(1, 5), dtype=torch.float),
+            "mask_input": torch.randn(1, 1, *mask_input_size, dtype=torch.float),
+            "has_mask_input": torch.tensor([1], dtype=torch.float),
+            "orig_im_size": torch.tensor(orig_im_size, dtype=torch.float),
+        }
+        output_names = ["masks", "iou_predictions", "low_res_masks"]
+        return onnx_model, dummy_inputs, output_names, dynamic_axes
+
     def _update_progress(self, progress: int, message: str):
         """更新进度"""
         if self.progress_callback:
             self.progress_callback(progress, message)
-
-
-class ONNXExportProcessorThread(QtCore.QThread):
-    """ONNX模型导出线程（用于PyQt）"""
-
-    progress_updated = QtCore.pyqtSignal(int, str)
-    processing_finished = QtCore.pyqtSignal(bool, str)
-
-    def __init__(self, config: Dict):
-        super().__init__()
-        self.config = config
-        self.processor = None
-
-    def run(self):
-        """线程运行函数"""
-        try:
-            self.processor = ONNXExportProcessor(self.config)
-            self.processor.set_progress_callback(
-                lambda p, m: self.progress_updated.emit(p, m)
-            )
-
-            success, message = self.processor.process()
-            self.processing_finished.emit(success, message)
-
-        except Exception as e:
-            self.processing_finished.emit(False, f"线程执行出错: {str(e)}")
-
-    def stop(self):
-        """停止处理"""
-        if self.processor:
-            self.processor.stop()
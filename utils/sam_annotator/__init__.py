@@ -2,21 +2,26 @@
 SAM标注核心模块
 """
 
-from .editor import Editor, CurrentCapturedInputs
+from .editor import Editor, CurrentCapturedInputs, InferenceRequest
 from .interface import ApplicationInterface, CustomGraphicsView
+from .inference import MaskInferenceWorker
 from .onnx_model import OnnxModel
 from .dataset_explorer import DatasetExplorer
 from .display_utils import DisplayUtils
+from .prefetch import ImagePrefetchCache
 from .utils import get_preprocess_shape, apply_coords
 
 __all__ = [
     'Editor',
     'CurrentCapturedInputs',
+    'InferenceRequest',
     'ApplicationInterface',
     'CustomGraphicsView',
+    'MaskInferenceWorker',
     'OnnxModel',
     'DatasetExplorer',
     'DisplayUtils',
+    'ImagePrefetchCache',
     'get_preprocess_shape',
     'apply_coords',
 ]
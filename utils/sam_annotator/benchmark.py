@@ -0,0 +1,101 @@
+"""
+掩码叠加性能对比
+
+对比整幅图像的掩码叠加（原实现）与只处理掩码外接矩形的就地叠加，
+在不同图像尺寸和掩码覆盖率下统计每次叠加的平均耗时，并检查两者结果是否一致
+
+用法:
+    python -m utils.sam_annotator.benchmark --sizes 1024 2048 4096 --coverages 0.01 0.1 0.5
+"""
+
+import time
+import argparse
+import numpy as np
+from typing import Dict, List
+
+import cv2
+
+from .display_utils import DisplayUtils
+
+
+def overlay_full_frame(image, mask, color, transparency):
+    """原有的整幅图像叠加实现，作为基准"""
+    gray_mask = mask.astype(np.uint8) * 255
+    gray_mask = cv2.merge([gray_mask, gray_mask, gray_mask])
+    color_mask = cv2.bitwise_and(gray_mask, color)
+    masked_image = cv2.bitwise_and(image.copy(), color_mask)
+    overlay_on_masked_image = cv2.addWeighted(
+        masked_image, transparency, color_mask, 1 - transparency, 0
+    )
+    background = cv2.bitwise_and(image.copy(), cv2.bitwise_not(color_mask))
+    return cv2.add(background, overlay_on_masked_image)
+
+
+def make_mask(size: int, coverage: float) -> np.ndarray:
+    """生成位于图像中央、面积占比为 coverage 的椭圆掩码"""
+    mask = np.zeros((size, size), dtype=np.uint8)
+    radius = max(1, int(size * np.sqrt(coverage / np.pi)))
+    cv2.ellipse(mask, (size // 2, size // 2), (radius, radius), 0, 0, 360, 1, -1)
+    return mask.astype(bool)
+
+
+def _best_time(func, repeats: int) -> float:
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def benchmark_overlay(sizes: List[int], coverages: List[float], repeats: int = 20) -> List[Dict]:
+    """
+    对比两种叠加实现
+
+    Returns:
+        每个 (尺寸, 覆盖率) 一项: {"size", "coverage", "full_ms", "roi_ms", "identical"}
+    """
+    rng = np.random.default_rng(0)
+    du = DisplayUtils()
+    color = (37, 180, 255)
+    results = []
+    for size in sizes:
+        image = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+        for coverage in coverages:
+            mask = make_mask(size, coverage)
+            expected = overlay_full_frame(image, mask, color, du.transparency)
+            actual = du.overlay_mask_on_image(image.copy(), mask, color)
+
+            full = _best_time(lambda: overlay_full_frame(image, mask, color, du.transparency), repeats)
+            # 就地叠加会修改图像，每次在同一份拷贝上执行，不计入拷贝时间
+            target = image.copy()
+            roi = _best_time(lambda: du.overlay_mask_on_image(target, mask, color), repeats)
+            results.append({
+                "size": size,
+                "coverage": coverage,
+                "full_ms": full * 1000,
+                "roi_ms": roi * 1000,
+                "identical": bool(np.array_equal(expected, actual)),
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="掩码叠加性能对比")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1024, 2048, 4096],
+                        help="图像边长")
+    parser.add_argument("--coverages", type=float, nargs="+", default=[0.01, 0.1, 0.5],
+                        help="掩码面积占比")
+    parser.add_argument("--repeats", type=int, default=20, help="重复次数，取最短耗时")
+    args = parser.parse_args()
+
+    print(f"{'尺寸':<8}{'覆盖率':>8}{'整幅':>12}{'外接矩形':>12}{'加速比':>10}{'结果一致':>10}")
+    for r in benchmark_overlay(args.sizes, args.coverages, args.repeats):
+        speedup = r["full_ms"] / max(1e-9, r["roi_ms"])
+        print(f"{r['size']:<8}{r['coverage']:>8.0%}{r['full_ms']:>10.2f}ms{r['roi_ms']:>10.2f}ms"
+              f"{speedup:>9.1f}x{str(r['identical']):>10}")
+
+
+if __name__ == "__main__":
+    main()
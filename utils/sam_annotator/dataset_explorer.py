@@ -1,13 +1,18 @@
 from pycocotools import mask
 from skimage import measure
-import json
 import shutil
 import itertools
 import numpy as np
 from simplification.cutil import simplify_coords_vwp
-import os, cv2, copy
+import os, cv2
 from distinctipy import distinctipy
 
+from utils.sam_embeddings.storage import open_embedding_store
+from utils.dataset_index import DatasetIndex, probe_image_sizes
+from utils.sam_annotator.journal import AnnotationJournal, replay_records, write_json_atomic
+from utils.sam_annotator.snapshot import SnapshotWriter
+from utils.coco_io import LazyCocoFile
+
 # 修复：移除未使用的导入或确保distinctipy可用
 # 如果distinctipy不可用，提供回退方案
 try:
@@ -37,18 +42,25 @@ def init_coco(dataset_folder, image_names, categories, coco_json_path):
         coco_json["categories"].append(
             {"id": i, "name": category, "supercategory": category}
         )
-    for i, image_name in enumerate(image_names):
-        im = cv2.imread(os.path.join(dataset_folder, image_name))
+    # 只读取文件头获取宽高，多线程并行，无需解码整张图片
+    image_paths = [os.path.join(dataset_folder, image_name) for image_name in image_names]
+    sizes = probe_image_sizes(image_paths, num_workers=min(32, (os.cpu_count() or 1) * 4))
+    for i, (image_name, size) in enumerate(zip(image_names, sizes)):
+        if size is None:
+            # 文件头无法识别时退回完整解码
+            im = cv2.imread(image_paths[i])
+            if im is None:
+                raise ValueError(f"无法读取图片: {image_paths[i]}")
+            size = (im.shape[1], im.shape[0])
         coco_json["images"].append(
             {
                 "id": i,
                 "file_name": image_name,
-                "width": im.shape[1],
-                "height": im.shape[0],
+                "width": size[0],
+                "height": size[1],
             }
         )
-    with open(coco_json_path, "w") as f:
-        json.dump(coco_json, f)
+    write_json_atomic(coco_json_path, coco_json)
 
 
 def bunch_coords(coords):
@@ -114,27 +126,34 @@ class DatasetExplorer:
         if not os.path.exists(images_path):
             raise ValueError(f"images目录不存在: {images_path}")
 
-        self.image_names = os.listdir(images_path)
+        # 通过目录索引列出图片，与嵌入向量生成工具共用缓存
+        self.dataset_index = DatasetIndex()
+        self.image_names = [
+            os.path.basename(info.path) for info in self.dataset_index.list_dir(images_path)
+        ]
         # 修复：过滤出图片文件
         self.image_names = [
             name for name in self.image_names
             if name.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'))
         ]
+        self.embeddings_folder = os.path.join(self.dataset_folder, "embeddings")
+        self.embedding_store = open_embedding_store(self.embeddings_folder)
         self.coco_json_path = coco_json_path
         if not os.path.exists(coco_json_path):
             self.__init_coco_json(categories)
-        with open(coco_json_path, "r") as f:
-            self.coco_json = json.load(f)
+        # 读取标注文件的列式缓存（失效时流式扫描并重建），标注在显示对应图片时才解析
+        self.coco = LazyCocoFile.open(coco_json_path)
 
-        self.categories = [category["name"] for category in self.coco_json["categories"]]
-        self.annotations_by_image_id = {}
-        for annotation in self.coco_json["annotations"]:
-            image_id = annotation["image_id"]
-            if image_id not in self.annotations_by_image_id:
-                self.annotations_by_image_id[image_id] = []
-            self.annotations_by_image_id[image_id].append(annotation)
+        # 重放上次未合并的修改（程序崩溃或未正常退出），并在后台合并到COCO文件
+        self.journal = AnnotationJournal(coco_json_path)
+        self.snapshot_writer = SnapshotWriter(
+            coco_json_path, write=lambda snapshot: self.coco.write_snapshot(snapshot, indent=2)
+        )
+        if replay_records(self.coco, self.journal.read_records()):
+            self.compact()
 
-        self.global_annotation_id = len(self.coco_json["annotations"])
+        self.categories = [category["name"] for category in self.coco.categories]
+        self.global_annotation_id = self.coco.max_annotation_id() + 1
 
         # 修复：生成类别颜色，如果distinctipy不可用则使用简单颜色
         if HAS_DISTINCTIPY:
@@ -169,46 +188,34 @@ class DatasetExplorer:
         return len(self.image_names)
 
     def get_image_data(self, image_id):
-        image_name = self.coco_json["images"][image_id]["file_name"]
+        image_name = self.coco.image_file_names[image_id]
         image_path = os.path.join(self.dataset_folder, image_name)
-        embedding_path = os.path.join(
-            self.dataset_folder,
-            "embeddings",
-            os.path.splitext(os.path.split(image_name)[1])[0] + ".npy",
-        )
-        image = cv2.imread(image_path)
-        if image is None:
+        embedding_stem = os.path.splitext(os.path.split(image_name)[1])[0]
+        image_bgr = cv2.imread(image_path)
+        if image_bgr is None:
             raise ValueError(f"无法读取图片: {image_path}")
-        image_bgr = copy.deepcopy(image)
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        # 解码后的缓冲区在预取缓存和编辑器之间共享，设为只读防止被就地绘制修改
+        image_bgr.flags.writeable = False
+        # RGB只是通道倒序的视图，不拷贝；OnnxModel只用到其shape
+        image = image_bgr[:, :, ::-1]
 
         # 修复：检查嵌入向量文件是否存在，不存在则返回None
-        if os.path.exists(embedding_path):
-            image_embedding = np.load(embedding_path)
-        else:
-            print(f"警告: 嵌入向量文件不存在，使用None: {embedding_path}")
-            image_embedding = None
+        # 支持单文件/分片存储以及float32/float16/int8存储格式，读取后统一为float32
+        image_embedding = self.embedding_store.load(embedding_stem)
+        if image_embedding is None:
+            print(f"警告: 嵌入向量不存在，使用None: {os.path.join(self.embeddings_folder, embedding_stem)}")
 
         return image, image_bgr, image_embedding
 
-    def __add_to_our_annotation_dict(self, annotation):
-        image_id = annotation["image_id"]
-        if image_id not in self.annotations_by_image_id:
-            self.annotations_by_image_id[image_id] = []
-        self.annotations_by_image_id[image_id].append(annotation)
-
-    def __delet_to_our_annotation_dict(self, image_id):
-        if image_id in self.annotations_by_image_id and len(self.annotations_by_image_id[image_id]) > 0:
-            self.annotations_by_image_id[image_id].pop(-1)
-
     def get_annotations(self, image_id, return_colors=False):
-        if image_id not in self.annotations_by_image_id:
+        annotations = self.coco.annotations_for_image(image_id)
+        if not annotations:
             return [], []
-        cats = [a["category_id"] for a in self.annotations_by_image_id[image_id]]
+        cats = [a["category_id"] for a in annotations]
         colors = [self.category_colors[c] for c in cats]
         if return_colors:
-            return self.annotations_by_image_id[image_id], colors
-        return self.annotations_by_image_id[image_id]
+            return annotations, colors
+        return annotations
 
     def add_annotation(self, image_id, category_id, mask, poly=True):
         if mask is None:
@@ -216,16 +223,51 @@ class DatasetExplorer:
         annotation = parse_mask_to_coco(
             image_id, self.global_annotation_id, mask, category_id, poly=poly
         )
-        self.__add_to_our_annotation_dict(annotation)
-        self.coco_json["annotations"].append(annotation)
+        self.coco.upsert(annotation)
         self.global_annotation_id += 1
+        self.journal.append({"op": "add", "annotation": annotation})
 
     def delet_annotation(self, image_id):
-        self.__delet_to_our_annotation_dict(image_id)
-        if len(self.coco_json["annotations"]) > 0:
-            self.coco_json["annotations"].pop(-1)
-        self.global_annotation_id = max(0, self.global_annotation_id - 1)
+        """删除该图片最后添加的标注"""
+        ann_ids = self.coco.ids_for_image(image_id)
+        if not ann_ids:
+            return
+        ann_id = ann_ids[-1]
+        self.coco.delete(ann_id)
+        # 删除的是最新的标注时复用其id
+        if ann_id == self.global_annotation_id - 1:
+            self.global_annotation_id -= 1
+        self.journal.append({"op": "delete", "id": ann_id})
 
     def save_annotation(self):
-        with open(self.coco_json_path, "w") as f:
-            json.dump(self.coco_json, f, indent=2)
+        """
+        保存标注：将修改日志落盘，并在后台合并到COCO文件
+
+        界面线程只做快照和日志切换，写入期间再次保存时后台只写入最新的一份
+        """
+        self.journal.sync()
+        if self.journal.num_records:
+            self.compact()
+
+    def compact(self):
+        """在后台将所有修改合并到COCO文件，写入完成后删除已合并的日志分段"""
+        segment = self.journal.rotate()
+        self.snapshot_writer.submit(
+            self.coco.snapshot(),
+            on_written=lambda: self.journal.remove_segments(segment),
+        )
+
+    def close(self):
+        """
+        合并修改，等待COCO文件写入完成并关闭日志
+
+        写入失败时抛出IOError，修改仍保留在日志分段中，下次打开时重放
+        """
+        # 先等待已提交的写入完成，写入成功时其分段已删除，不必再写一遍
+        self.snapshot_writer.flush()
+        if self.journal.num_records or self.journal.segments():
+            self.compact()
+        self.journal.close()
+        error = self.snapshot_writer.close()
+        if error is not None:
+            raise IOError(f"标注文件未更新: {self.coco_json_path}，修改已保留在日志中，下次打开时重放。错误: {error}")
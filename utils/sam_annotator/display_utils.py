@@ -1,13 +1,54 @@
 import cv2
 import numpy as np
+from collections import OrderedDict
 from pycocotools import mask as coco_mask
 
 
+class MaskCache:
+    """
+    已解码标注掩码的LRU缓存，按标注id索引
+
+    只保存掩码在其外接矩形内的部分，总大小超过 max_bytes 时淘汰最久未使用的项。
+    标注id在删除后可能被复用，因此同时记录segmentation对象本身，对象不同时视为未命中
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+
+    def get(self, ann, height, width):
+        entry = self.entries.get(ann["id"])
+        if entry is None:
+            return None
+        segmentation, shape, crop = entry
+        if segmentation is not ann["segmentation"] or shape != (height, width):
+            return None
+        self.entries.move_to_end(ann["id"])
+        return crop
+
+    def put(self, ann, height, width, crop):
+        old = self.entries.pop(ann["id"], None)
+        if old is not None:
+            self.total_bytes -= old[2][2].nbytes
+        self.entries[ann["id"]] = (ann["segmentation"], (height, width), crop)
+        self.total_bytes += crop[2].nbytes
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            _, (_, _, evicted) = self.entries.popitem(last=False)
+            self.total_bytes -= evicted[2].nbytes
+
+    def clear(self):
+        self.entries.clear()
+        self.total_bytes = 0
+
+
 class DisplayUtils:
     def __init__(self):
         self.transparency = 0.3
         self.box_width = 2
         self.text_size = 1.5  # 默认文字大小
+        # 调整透明度、文字大小或切换显示时直接使用已解码的掩码，不再重新栅格化多边形
+        self.mask_cache = MaskCache()
 
     def increase_transparency(self):
         self.transparency = min(1.0, self.transparency + 0.05)
@@ -22,27 +63,58 @@ class DisplayUtils:
         self.text_size = max(0.5, self.text_size - 0.1)  # 最小文字大小为 0.5
 
     def overlay_mask_on_image(self, image, mask, color=(0, 0, 255)):
-        gray_mask = mask.astype(np.uint8) * 255
-        gray_mask = cv2.merge([gray_mask, gray_mask, gray_mask])
-        color_mask = cv2.bitwise_and(gray_mask, color)
-        masked_image = cv2.bitwise_and(image.copy(), color_mask)
-        overlay_on_masked_image = cv2.addWeighted(
-            masked_image, self.transparency, color_mask, 1 - self.transparency, 0
+        """在图片上就地叠加掩码，只处理掩码外接矩形内的区域"""
+        mask = mask.astype(bool, copy=False)
+        rows = np.flatnonzero(mask.any(axis=1))
+        if len(rows) == 0:
+            return image
+        cols = np.flatnonzero(mask.any(axis=0))
+        y0, y1 = rows[0], rows[-1] + 1
+        x0, x1 = cols[0], cols[-1] + 1
+        return self.overlay_mask_crop(image, mask[y0:y1, x0:x1], y0, x0, color)
+
+    def overlay_mask_crop(self, image, mask, y0, x0, color=(0, 0, 255)):
+        """
+        在图片上就地叠加外接矩形内的掩码，(y0, x0) 为掩码左上角在图片中的位置
+
+        只在外接矩形内计算，掩码内像素的结果与整幅叠加一致：
+        (像素 & ~颜色) + (像素 & 颜色) * 透明度 + 颜色 * (1 - 透明度)，结果饱和到255
+        """
+        if mask.size == 0:
+            return image
+        roi = image[y0:y0 + mask.shape[0], x0:x0 + mask.shape[1]]
+        # OpenCV按通道处理标量，比numpy对最后一维广播快得多
+        color = tuple(int(c) for c in color)
+        inverse_color = tuple(255 - c for c in color)
+        color_roi = cv2.add(np.zeros_like(roi), color)
+        overlay = cv2.addWeighted(
+            cv2.bitwise_and(roi, color), self.transparency, color_roi, 1 - self.transparency, 0
         )
-        background = cv2.bitwise_and(image.copy(), cv2.bitwise_not(color_mask))
-        image = cv2.add(background, overlay_on_masked_image)
+        blended = cv2.add(cv2.bitwise_and(roi, inverse_color), overlay)
+        # 只把掩码内的像素写回原图（roi是原图的视图）
+        cv2.copyTo(blended, mask.view(np.uint8), roi)
         return image
 
-    def __convert_ann_to_mask(self, ann, height, width):
-        mask = np.zeros((height, width), dtype=np.uint8)
-        poly = ann["segmentation"]
-        rles = coco_mask.frPyObjects(poly, height, width)
+    def __decode_ann_mask(self, ann, height, width):
+        """栅格化标注的多边形，返回 (y0, x0, 外接矩形内的掩码)"""
+        rles = coco_mask.frPyObjects(ann["segmentation"], height, width)
         rle = coco_mask.merge(rles)
-        mask_instance = coco_mask.decode(rle)
-        mask_instance = np.logical_not(mask_instance)
-        mask = np.logical_or(mask, mask_instance)
-        mask = np.logical_not(mask)
-        return mask
+        mask = coco_mask.decode(rle).astype(bool)
+        rows = np.flatnonzero(mask.any(axis=1))
+        cols = np.flatnonzero(mask.any(axis=0))
+        if len(rows) == 0:
+            return 0, 0, np.zeros((0, 0), dtype=bool)
+        y0, y1 = rows[0], rows[-1] + 1
+        x0, x1 = cols[0], cols[-1] + 1
+        return y0, x0, mask[y0:y1, x0:x1].copy()
+
+    def __convert_ann_to_mask(self, ann, height, width):
+        """获取标注的掩码 (y0, x0, 外接矩形内的掩码)，优先从缓存读取"""
+        crop = self.mask_cache.get(ann, height, width)
+        if crop is None:
+            crop = self.__decode_ann_mask(ann, height, width)
+            self.mask_cache.put(ann, height, width, crop)
+        return crop
 
     def draw_box_on_image(self, image, categories, ann, color):
         x, y, w, h = ann["bbox"]
@@ -62,8 +134,8 @@ class DisplayUtils:
     def draw_annotations(self, image, categories, annotations, colors):
         for ann, color in zip(annotations, colors):
             image = self.draw_box_on_image(image, categories, ann, color)
-            mask = self.__convert_ann_to_mask(ann, image.shape[0], image.shape[1])
-            image = self.overlay_mask_on_image(image, mask, color)
+            y0, x0, mask = self.__convert_ann_to_mask(ann, image.shape[0], image.shape[1])
+            image = self.overlay_mask_crop(image, mask, y0, x0, color)
         return image
 
     def draw_points(
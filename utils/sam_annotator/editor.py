@@ -1,10 +1,12 @@
 import os, copy
 import numpy as np
+from typing import NamedTuple, Optional
 
 # 修复导入路径 - 从相对导入改为绝对导入
 from utils.sam_annotator.onnx_model import OnnxModel
 from utils.sam_annotator.dataset_explorer import DatasetExplorer
 from utils.sam_annotator.display_utils import DisplayUtils
+from utils.sam_annotator.prefetch import ImagePrefetchCache
 
 
 class CurrentCapturedInputs:
@@ -34,6 +36,18 @@ class CurrentCapturedInputs:
         self.low_res_logits = low_res_logits
 
 
+class InferenceRequest(NamedTuple):
+    """一次掩码推理的输入快照，version 用于丢弃过期的结果"""
+    version: int
+    image: np.ndarray
+    image_embedding: np.ndarray
+    input_point: np.ndarray
+    input_label: np.ndarray
+    low_res_logits: Optional[np.ndarray]
+    # 嵌入向量标识，指定时 OnnxModel 使用推理结果缓存（仅用于不带掩码输入的请求）
+    cache_key: Optional[int] = None
+
+
 class Editor:
     def __init__(self, onnx_model_path, dataset_path, categories=None, coco_json_path=None):
         self.dataset_path = dataset_path
@@ -52,45 +66,153 @@ class Editor:
         self.image_id = 0
         self.category_id = 0
         self.show_other_anns = True
+        self.hover_preview = False
         self.num_images = self.dataset_explorer.get_num_images()
+        # 后台预取前后各几张图片及其嵌入向量，切换图片时直接从缓存读取
+        self.image_cache = ImagePrefetchCache(
+            self.dataset_explorer.get_image_data, self.num_images
+        )
         (
             self.image,
             self.image_bgr,
             self.image_embedding,
-        ) = self.dataset_explorer.get_image_data(self.image_id)
-        self.display = self.image_bgr.copy()
+        ) = self.image_cache.get(self.image_id)
+        self._display_buffer = None
+        # 输入点每次变化（点击、重置、切换图片）时递增，推理结果版本不一致时丢弃
+        self.inputs_version = 0
+        # 当前掩码对应的输入点版本，与 inputs_version 不同时说明最新的掩码仍在推理
+        self.mask_version = 0
+        # 已有标注渲染后的图层，只在标注、图片或显示参数变化时重新绘制
+        self._annotations_layer = None
         self.du = DisplayUtils()
         self.reset()
 
     def add_click(self, new_pt, new_label):
-        self.curr_inputs.add_input_click(new_pt, new_label)
+        """添加一个点并同步推理掩码"""
+        self.add_point(new_pt, new_label)
+        request = self.inference_request()
         masks, low_res_logits = self.onnx_helper.call(
+            request.image,
+            request.image_embedding,
+            request.input_point,
+            request.input_label,
+            low_res_logits=request.low_res_logits,
+        )
+        self.apply_mask(request.version, masks, low_res_logits)
+
+    def add_point(self, new_pt, new_label):
+        """添加一个点并立即重绘（仍显示上一次的掩码），掩码由 apply_mask 更新"""
+        self.curr_inputs.add_input_click(new_pt, new_label)
+        self.inputs_version += 1
+        self.redraw_inputs()
+
+    def inference_request(self):
+        """当前输入点的推理请求"""
+        return InferenceRequest(
+            self.inputs_version,
+            self.image,
+            self.image_embedding,
+            self.curr_inputs.input_point.copy(),
+            self.curr_inputs.input_label.copy(),
+            self.curr_inputs.low_res_logits,
+        )
+
+    def apply_mask(self, version, masks, low_res_logits):
+        """应用推理结果，输入点已经变化的过期结果直接丢弃，返回是否已应用"""
+        if version != self.inputs_version:
+            return False
+        self.mask_version = version
+        self.curr_inputs.set_mask(masks[0, 0, :, :])
+        self.curr_inputs.set_low_res_logits(low_res_logits)
+        self.redraw_inputs()
+        return True
+
+    def mask_pending(self):
+        """当前输入点的掩码是否尚未返回"""
+        return self.mask_version != self.inputs_version
+
+    def preview_request(self, hover_pt):
+        """
+        悬停预览的推理请求：已有的点加上鼠标位置处的一个前景点，不使用掩码输入以便命中结果缓存
+
+        未开启悬停预览或鼠标不在图片内时返回None
+        """
+        x, y = hover_pt
+        height, width = self.image_bgr.shape[:2]
+        if not self.hover_preview or not (0 <= x < width and 0 <= y < height):
+            return None
+        if len(self.curr_inputs.input_point) == 0:
+            input_point = np.array([hover_pt])
+        else:
+            input_point = np.vstack([self.curr_inputs.input_point, np.array([hover_pt])])
+        input_label = np.append(self.curr_inputs.input_label, 1)
+        return InferenceRequest(
+            self.inputs_version,
             self.image,
             self.image_embedding,
-            self.curr_inputs.input_point,
-            self.curr_inputs.input_label,
-            low_res_logits=self.curr_inputs.low_res_logits,
+            input_point,
+            input_label,
+            None,
+            cache_key=self.image_id,
         )
-        self.display = self.image_bgr.copy()
-        self.draw_known_annotations()
+
+    def apply_preview(self, request, masks):
+        """显示悬停预览的掩码（不改变当前掩码），过期的预览直接丢弃，返回是否已显示"""
+        if not self.hover_preview or request.version != self.inputs_version:
+            return False
+        self.display = self._fresh_display()
+        self.display = self.du.draw_points(self.display, request.input_point, request.input_label)
+        self.display = self.du.overlay_mask_on_image(
+            self.display, masks[0, 0, :, :], color=(0, 255, 255)
+        )
+        return True
+
+    def toggle_hover_preview(self):
+        self.hover_preview = not self.hover_preview
+        self.redraw_inputs()
+
+    def redraw_inputs(self):
+        """在缓存的底图上叠加点和当前掩码，耗时与已有标注数量无关"""
+        self.display = self._fresh_display()
         self.display = self.du.draw_points(
             self.display, self.curr_inputs.input_point, self.curr_inputs.input_label
         )
-        self.display = self.du.overlay_mask_on_image(self.display, masks[0, 0, :, :])
-        self.curr_inputs.set_mask(masks[0, 0, :, :])
-        self.curr_inputs.set_low_res_logits(low_res_logits)
+        if self.curr_inputs.curr_mask is not None:
+            self.display = self.du.overlay_mask_on_image(self.display, self.curr_inputs.curr_mask)
 
     def draw_known_annotations(self):
+        """绘制当前图片的所有已有标注，返回新的图层"""
         anns, colors = self.dataset_explorer.get_annotations(
             self.image_id, return_colors=True
         )
-        self.display = self.du.draw_annotations(self.display, self.categories, anns, colors)
+        layer = self.image_bgr.copy()
+        return self.du.draw_annotations(layer, self.categories, anns, colors)
+
+    def invalidate_annotations_layer(self):
+        """标注、图片或显示参数变化后调用，下次显示时重新绘制已有标注图层"""
+        self._annotations_layer = None
+
+    def _base_layer(self):
+        """当前的底图：显示其他标注时为缓存的标注图层，否则为原图"""
+        if not self.show_other_anns:
+            return self.image_bgr
+        if self._annotations_layer is None:
+            self._annotations_layer = self.draw_known_annotations()
+        return self._annotations_layer
+
+    def _fresh_display(self):
+        """将底图复制到复用的显示缓冲区中，重绘时无需每次分配整幅图像"""
+        base = self._base_layer()
+        if self._display_buffer is None or self._display_buffer.shape != base.shape:
+            self._display_buffer = np.empty_like(base)
+        np.copyto(self._display_buffer, base)
+        return self._display_buffer
 
     def reset(self, hard=True):
         self.curr_inputs.reset_inputs()
-        self.display = self.image_bgr.copy()
-        if self.show_other_anns:
-            self.draw_known_annotations()
+        self.inputs_version += 1
+        self.mask_version = self.inputs_version
+        self.display = self._fresh_display()
 
     def toggle(self):
         self.show_other_anns = not self.show_other_anns
@@ -98,41 +220,52 @@ class Editor:
 
     def step_up_transparency(self):
         self.du.increase_transparency()
+        self.invalidate_annotations_layer()
         self.reset()
 
     def step_down_transparency(self):
         self.du.decrease_transparency()
+        self.invalidate_annotations_layer()
         self.reset()
 
     def increase_text_size(self):
         """增加文字大小"""
         self.du.increase_text_size()
+        self.invalidate_annotations_layer()
         self.reset()
 
     def decrease_text_size(self):
         """减小文字大小"""
         self.du.decrease_text_size()
+        self.invalidate_annotations_layer()
         self.reset()
 
     def save_ann(self):
         self.dataset_explorer.add_annotation(
             self.image_id, self.category_id, self.curr_inputs.curr_mask
         )
+        self.invalidate_annotations_layer()
 
     def delet_ann(self):
         self.dataset_explorer.delet_annotation(self.image_id)
+        self.invalidate_annotations_layer()
 
     def save(self):
         self.dataset_explorer.save_annotation()
 
+    def close(self):
+        """停止后台预取、释放缓存并将标注修改合并到COCO文件"""
+        self.image_cache.close()
+        self.dataset_explorer.close()
+
     def next_image(self):
         self.image_id = (self.image_id + 1) % self.num_images
         (
             self.image,
             self.image_bgr,
             self.image_embedding,
-        ) = self.dataset_explorer.get_image_data(self.image_id)
-        self.display = self.image_bgr.copy()
+        ) = self.image_cache.get(self.image_id)
+        self.invalidate_annotations_layer()
         self.reset()
 
     def prev_image(self):
@@ -141,8 +274,8 @@ class Editor:
             self.image,
             self.image_bgr,
             self.image_embedding,
-        ) = self.dataset_explorer.get_image_data(self.image_id)
-        self.display = self.image_bgr.copy()
+        ) = self.image_cache.get(self.image_id)
+        self.invalidate_annotations_layer()
         self.reset()
 
     def next_category(self):
@@ -0,0 +1,109 @@
+"""
+后台掩码推理线程
+
+点击后立即绘制输入点，解码器在后台线程中运行。推理期间的新点击会替换尚未开始的请求，
+连续快速点击时只对最新的一组输入点推理；结果返回时若输入点已变化则由 Editor 丢弃。
+保存标注前可用 wait_result 等待当前输入点的结果，避免保存上一组点的掩码。
+悬停预览请求同样只保留最新一个，并且只在没有待处理的点击请求时执行
+"""
+
+import threading
+
+from PyQt5 import QtCore
+
+
+class MaskInferenceWorker(QtCore.QThread):
+    """掩码推理线程，点击和悬停预览各只保留最新的一个待处理请求"""
+
+    # (请求版本, masks, low_res_logits)
+    mask_ready = QtCore.pyqtSignal(int, object, object)
+    # (请求, masks)
+    preview_ready = QtCore.pyqtSignal(object, object)
+    inference_failed = QtCore.pyqtSignal(int, str)
+
+    def __init__(self, onnx_model):
+        super().__init__()
+        self.onnx_model = onnx_model
+        self.pending = None
+        self.pending_preview = None
+        self.stopped = False
+        # 最近处理完的点击请求版本及其结果（失败时结果为None）
+        self.finished_version = 0
+        self.last_result = None
+        self.condition = threading.Condition()
+
+    def submit(self, request):
+        """提交推理请求（editor.InferenceRequest），覆盖尚未开始处理的旧请求"""
+        with self.condition:
+            self.pending = request
+            self.condition.notify_all()
+
+    def submit_preview(self, request):
+        """提交悬停预览请求，覆盖尚未开始处理的旧预览请求"""
+        with self.condition:
+            self.pending_preview = request
+            self.condition.notify_all()
+
+    def run(self):
+        """线程运行函数"""
+        while True:
+            with self.condition:
+                while self.pending is None and self.pending_preview is None and not self.stopped:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                # 点击请求优先于悬停预览
+                preview = self.pending is None
+                if preview:
+                    request, self.pending_preview = self.pending_preview, None
+                else:
+                    request, self.pending = self.pending, None
+
+            try:
+                masks, low_res_logits = self.onnx_model.call(
+                    request.image,
+                    request.image_embedding,
+                    request.input_point,
+                    request.input_label,
+                    low_res_logits=request.low_res_logits,
+                    cache_key=request.cache_key,
+                )
+            except Exception as e:
+                if not preview:
+                    self._finish(request.version, None)
+                self.inference_failed.emit(request.version, f"掩码推理出错: {str(e)}")
+                continue
+            if preview:
+                self.preview_ready.emit(request, masks)
+            else:
+                self._finish(request.version, (masks, low_res_logits))
+                self.mask_ready.emit(request.version, masks, low_res_logits)
+
+    def _finish(self, version, result):
+        with self.condition:
+            self.finished_version = version
+            self.last_result = result
+            self.condition.notify_all()
+
+    def wait_result(self, version, timeout=None):
+        """
+        等待指定版本的点击请求处理完成（在界面线程中调用）
+
+        Returns:
+            (masks, low_res_logits)；推理失败、请求已被更新的请求替换、线程已停止或超时时返回None
+        """
+        with self.condition:
+            finished = self.condition.wait_for(
+                lambda: self.finished_version >= version or self.stopped, timeout
+            )
+            if not finished or self.finished_version != version:
+                return None
+            return self.last_result
+
+    def stop(self):
+        """停止线程，正在进行的推理完成后退出"""
+        with self.condition:
+            self.stopped = True
+            self.pending = None
+            self.pending_preview = None
+            self.condition.notify_all()
@@ -1,9 +1,12 @@
 import cv2
+import numpy as np
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QGraphicsView, QGraphicsScene
 from PyQt5.QtGui import QImage, QPixmap, QPainter, QWheelEvent, QMouseEvent
-from PyQt5.QtCore import Qt, QRectF
+from PyQt5.QtCore import Qt, QRectF, QTimer
 from PyQt5.QtWidgets import QPushButton, QRadioButton, QVBoxLayout, QHBoxLayout, QWidget, QLabel
 
+from utils.sam_annotator.inference import MaskInferenceWorker
+
 
 class CustomGraphicsView(QGraphicsView):
     def __init__(self, editor):
@@ -30,6 +33,22 @@ class CustomGraphicsView(QGraphicsView):
 
         self.image_item = None
 
+        # 解码器在后台线程运行，点击时界面不再卡顿
+        self.inference_worker = MaskInferenceWorker(self.editor.onnx_helper)
+        self.inference_worker.mask_ready.connect(self.on_mask_ready)
+        self.inference_worker.preview_ready.connect(self.on_preview_ready)
+        self.inference_worker.inference_failed.connect(self.on_inference_failed)
+        self.inference_worker.start()
+
+        # 悬停预览：鼠标移动时最多每 hover_interval 毫秒提交一次最新位置
+        self.hover_interval = 50
+        self.hover_pos = None
+        self.hover_timer = QTimer(self)
+        self.hover_timer.setSingleShot(True)
+        self.hover_timer.setInterval(self.hover_interval)
+        self.hover_timer.timeout.connect(self.submit_hover)
+        self.viewport().setMouseTracking(True)
+
     def set_image(self, q_img):
         pixmap = QPixmap.fromImage(q_img)
         if self.image_item:
@@ -52,21 +71,86 @@ class CustomGraphicsView(QGraphicsView):
         self.translate(delta.x(), delta.y())
 
     def imshow(self, img):
+        img = np.ascontiguousarray(img)
         height, width, channel = img.shape
         bytes_per_line = 3 * width
-        q_img = QImage(img.data, width, height, bytes_per_line, QImage.Format_RGB888).rgbSwapped()
+        if hasattr(QImage, "Format_BGR888"):
+            # Qt 5.14+ 直接读取BGR数据，省去rgbSwapped的整幅拷贝；QPixmap.fromImage会复制像素
+            q_img = QImage(img.data, width, height, bytes_per_line, QImage.Format_BGR888)
+        else:
+            q_img = QImage(img.data, width, height, bytes_per_line, QImage.Format_RGB888).rgbSwapped()
         self.set_image(q_img)
 
-    def mousePressEvent(self, event: QMouseEvent) -> None:
-        pos = event.pos()
+    def image_point(self, pos):
+        """视图坐标转换为图片像素坐标"""
         pos_in_item = self.mapToScene(pos) - self.image_item.pos()
-        x, y = pos_in_item.x(), pos_in_item.y()
+        return [int(pos_in_item.x()), int(pos_in_item.y())]
+
+    def mouseMoveEvent(self, event: QMouseEvent) -> None:
+        super().mouseMoveEvent(event)
+        if not self.editor.hover_preview or self.image_item is None:
+            return
+        self.hover_pos = event.pos()
+        if not self.hover_timer.isActive():
+            self.hover_timer.start()
+
+    def leaveEvent(self, event) -> None:
+        super().leaveEvent(event)
+        self.hover_timer.stop()
+        self.hover_pos = None
+        if self.editor.hover_preview:
+            self.editor.redraw_inputs()
+            self.imshow(self.editor.display)
+
+    def submit_hover(self):
+        if self.hover_pos is None:
+            return
+        request = self.editor.preview_request(self.image_point(self.hover_pos))
+        if request is not None:
+            self.inference_worker.submit_preview(request)
+
+    def on_preview_ready(self, request, masks):
+        if self.hover_pos is not None and self.editor.apply_preview(request, masks):
+            self.imshow(self.editor.display)
+
+    def mousePressEvent(self, event: QMouseEvent) -> None:
+        x, y = self.image_point(event.pos())
         if event.button() == Qt.LeftButton:
             label = 1
         elif event.button() == Qt.RightButton:
             label = 0
-        self.editor.add_click([int(x), int(y)], label)
+        # 先显示新的点，掩码在后台推理完成后更新
+        self.editor.add_point([x, y], label)
         self.imshow(self.editor.display)
+        self.inference_worker.submit(self.editor.inference_request())
+
+    def on_mask_ready(self, version, masks, low_res_logits):
+        if self.editor.apply_mask(version, masks, low_res_logits):
+            self.imshow(self.editor.display)
+
+    def wait_for_mask(self, timeout=10.0):
+        """
+        等待当前输入点的掩码推理完成并应用，返回当前掩码是否对应最新的输入点
+
+        点击后立即保存时，后台推理可能尚未返回，直接保存会存下上一组点的掩码
+        """
+        if not self.editor.mask_pending():
+            return True
+        version = self.editor.inputs_version
+        result = self.inference_worker.wait_result(version, timeout)
+        if result is None:
+            return False
+        masks, low_res_logits = result
+        return self.editor.apply_mask(version, masks, low_res_logits)
+
+    def on_inference_failed(self, version, message):
+        print(f"警告: {message}")
+
+    def stop_inference(self):
+        """停止后台推理线程"""
+        self.hover_timer.stop()
+        self.inference_worker.stop()
+        self.inference_worker.wait()
 
 
 class ApplicationInterface(QWidget):
@@ -102,6 +186,9 @@ class ApplicationInterface(QWidget):
         self.graphics_view.imshow(self.editor.display)
 
     def add(self):
+        if not self.graphics_view.wait_for_mask():
+            print("警告: 当前输入点的掩码推理未完成，未添加对象")
+            return
         self.editor.save_ann()
         self.editor.reset()
         self.graphics_view.imshow(self.editor.display)
@@ -145,9 +232,17 @@ class ApplicationInterface(QWidget):
         self.editor.decrease_text_size()
         self.graphics_view.imshow(self.editor.display)
 
+    def toggle_hover_preview(self):
+        self.editor.toggle_hover_preview()
+        self.graphics_view.imshow(self.editor.display)
+
     def save_all(self):
         self.editor.save()
 
+    def stop_inference(self):
+        """停止后台推理线程"""
+        self.graphics_view.stop_inference()
+
     def get_top_bar(self):
         top_bar = QWidget()
         button_layout = QHBoxLayout(top_bar)
@@ -159,6 +254,7 @@ class ApplicationInterface(QWidget):
             ("前一张", lambda: self.prev_image()),
             ("下一张", lambda: self.next_image()),
             ("显示已标注信息", lambda: self.toggle()),
+            ("悬停预览", lambda: self.toggle_hover_preview()),
             ("调高透明度", lambda: self.transparency_up()),
             ("调低透明度", lambda: self.transparency_down()),
             ("文字调大", lambda: self.increase_text_size()),  # 新增按钮
@@ -196,6 +292,8 @@ class ApplicationInterface(QWidget):
             self.add()
         elif event.key() == Qt.Key_R:
             self.reset()
+        elif event.key() == Qt.Key_H:
+            self.toggle_hover_preview()
         elif event.modifiers() == Qt.ControlModifier and event.key() == Qt.Key_S:
             self.save_all()
         elif event.modifiers() == Qt.ControlModifier and event.key() == Qt.Key_Z:
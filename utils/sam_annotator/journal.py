@@ -0,0 +1,147 @@
+"""
+标注修改日志
+
+添加和删除标注时向 <annotations.json>.journal 追加一行JSON，界面线程中保存时只需刷新日志文件，
+耗时与修改数量成正比，整个COCO文件由后台线程重写：
+
+    {"op": "add", "annotation": {...}}
+    {"op": "delete", "id": 12}
+
+合并（compact）时先把当前日志改名为编号的分段（.journal.1、.journal.2 ...），之后的修改写入新的日志，
+COCO文件由后台线程写入完成后再删除已包含在其中的分段。启动时先读取COCO文件，再按顺序重放所有分段和日志，
+程序崩溃或未正常退出时未合并的修改不会丢失。
+添加按标注id覆盖、删除按id删除，每个标注的结果只取决于对它的最后一次修改，
+因此在已包含部分或全部修改的COCO文件上重放日志，结果不变
+"""
+
+import os
+import re
+import json
+from typing import Dict, List
+
+
+def write_json_atomic(path: str, data: Dict, indent: int = None):
+    """先写入临时文件并落盘，再替换目标文件，写入过程中崩溃不会损坏原文件"""
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(data, f, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def replay_records(coco, records: List[Dict]) -> int:
+    """
+    将日志记录应用到标注数据上，返回应用的记录数
+
+    Args:
+        coco: 提供 upsert(annotation) 和 delete(ann_id) 的标注数据（如 LazyCocoFile）
+        records: 日志记录
+    """
+    for record in records:
+        if record["op"] == "add":
+            coco.upsert(record["annotation"])
+        elif record["op"] == "delete":
+            coco.delete(record["id"])
+    return len(records)
+
+
+def _read_journal_file(path: str) -> List[Dict]:
+    """读取一个日志文件，末尾因崩溃而不完整的一行会被忽略"""
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.endswith("\n"):
+                break
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+    return records
+
+
+class AnnotationJournal:
+    """
+    标注修改日志（只追加写入）
+
+    每 fsync_every 条记录或调用 sync() 时落盘一次
+    """
+
+    def __init__(self, coco_json_path: str, fsync_every: int = 32):
+        self.path = coco_json_path + ".journal"
+        self.fsync_every = fsync_every
+        self.file = None
+        self.unsynced = 0
+        # 当前日志（不含分段）中的记录数
+        self.num_records = 0
+        # 分段编号只增不减，避免后台删除旧分段后新分段复用编号
+        segments = self.segments()
+        self.last_segment = segments[-1][0] if segments else 0
+
+    def segments(self) -> List:
+        """已改名的日志分段 [(编号, 路径)]，按编号排序"""
+        directory, name = os.path.split(self.path)
+        pattern = re.compile(re.escape(name) + r"\.(\d+)$")
+        result = []
+        for entry in os.listdir(directory or "."):
+            match = pattern.match(entry)
+            if match:
+                result.append((int(match.group(1)), os.path.join(directory, entry)))
+        return sorted(result)
+
+    def read_records(self) -> List[Dict]:
+        """按顺序读取所有分段和当前日志中的记录"""
+        records = []
+        for _, path in self.segments():
+            records.extend(_read_journal_file(path))
+        if os.path.exists(self.path):
+            current = _read_journal_file(self.path)
+            self.num_records = len(current)
+            records.extend(current)
+        return records
+
+    def append(self, record: Dict):
+        """追加一条记录"""
+        if self.file is None:
+            self.file = open(self.path, "a", encoding="utf-8")
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.num_records += 1
+        self.unsynced += 1
+        if self.unsynced >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        """将已追加的记录写入磁盘"""
+        if self.file is not None and self.unsynced:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        self.unsynced = 0
+
+    def rotate(self) -> int:
+        """
+        将当前日志改名为新的分段，之后的记录写入新日志
+
+        Returns:
+            到目前为止最后一个分段的编号，此刻的COCO数据包含该编号及之前所有分段中的修改
+        """
+        self.close()
+        if os.path.exists(self.path):
+            self.last_segment += 1
+            os.replace(self.path, f"{self.path}.{self.last_segment}")
+        self.num_records = 0
+        return self.last_segment
+
+    def remove_segments(self, upto: int):
+        """COCO文件写入完成后删除已包含在其中的分段（可在后台线程中调用）"""
+        for number, path in self.segments():
+            if number <= upto:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def close(self):
+        self.sync()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -1,4 +1,7 @@
 # onnx_model.py
+import threading
+from collections import OrderedDict
+
 import numpy as np
 import onnxruntime
 
@@ -7,11 +10,30 @@ from utils.sam_annotator.utils import apply_coords
 
 
 class OnnxModel:
-    def __init__(self, onnx_model_path, threshold=0.5):
+    def __init__(self, onnx_model_path, threshold=0.5, cache_max_bytes=256 * 1024 * 1024,
+                 cache_grid=4):
         self.ort_session = onnxruntime.InferenceSession(
             onnx_model_path, providers=["CPUExecutionProvider"]
         )
         self.threshold = threshold
+        # 不带掩码输入时的推理结果缓存（LRU，按内存大小淘汰），键为 (嵌入向量标识, 量化后的点, 标签)，
+        # 点坐标按 cache_grid 像素量化，同一格内的点视为相同，悬停预览回到已经过的区域时直接命中
+        self.cache_max_bytes = cache_max_bytes
+        self.cache_grid = cache_grid
+        self.result_cache = OrderedDict()
+        self.cache_bytes = 0
+        self.cache_lock = threading.Lock()
+
+    def _result_cache_key(self, cache_key, input_point, input_label):
+        points = np.floor_divide(np.asarray(input_point), self.cache_grid).astype(np.int64)
+        labels = np.asarray(input_label).astype(np.int64)
+        return cache_key, points.shape, points.tobytes(), labels.tobytes()
+
+    def clear_cache(self):
+        """清空推理结果缓存"""
+        with self.cache_lock:
+            self.result_cache.clear()
+            self.cache_bytes = 0
 
     def __translate_input(
         self,
@@ -63,7 +85,22 @@ class OnnxModel:
         input_label,
         selected_box=None,
         low_res_logits=None,
+        cache_key=None,
     ):
+        """
+        推理掩码，返回 (masks, low_res_logits)
+
+        cache_key 为当前嵌入向量的标识（如图片id），指定且没有掩码输入时使用结果缓存
+        """
+        result_key = None
+        if cache_key is not None and low_res_logits is None and self.cache_max_bytes > 0:
+            result_key = self._result_cache_key(cache_key, input_point, input_label)
+            with self.cache_lock:
+                cached = self.result_cache.get(result_key)
+                if cached is not None:
+                    self.result_cache.move_to_end(result_key)
+                    return cached
+
         onnx_mask_input = None
         input_box = None
         if low_res_logits is not None:
@@ -80,4 +117,13 @@ class OnnxModel:
         )
         masks, _, low_res_logits = self.ort_session.run(None, ort_inputs)
         masks = masks > self.threshold
+
+        if result_key is not None:
+            with self.cache_lock:
+                if result_key not in self.result_cache:
+                    self.result_cache[result_key] = (masks, low_res_logits)
+                    self.cache_bytes += masks.nbytes + low_res_logits.nbytes
+                while self.cache_bytes > self.cache_max_bytes and self.result_cache:
+                    _, (old_masks, old_logits) = self.result_cache.popitem(last=False)
+                    self.cache_bytes -= old_masks.nbytes + old_logits.nbytes
         return masks, low_res_logits
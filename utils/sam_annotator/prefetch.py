@@ -0,0 +1,137 @@
+"""
+标注工具的图片和嵌入向量预取
+
+切换图片时，后台线程预先读取当前图片前后各K张的图片和嵌入向量，
+结果保存在按内存大小淘汰的LRU缓存中，缓存命中时切换图片无需等待磁盘读取和解码
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+
+
+def data_nbytes(data) -> int:
+    """估算一项缓存数据占用的内存（其中所有numpy数组的大小之和，视图不重复计算）"""
+    if isinstance(data, np.ndarray):
+        return data.nbytes if data.base is None else 0
+    if isinstance(data, (tuple, list)):
+        return sum(data_nbytes(item) for item in data)
+    return 0
+
+
+class ImagePrefetchCache:
+    """
+    带后台预取的图片数据LRU缓存
+
+    loader(image_id) 在后台线程中执行（cv2解码和文件读取会释放GIL），
+    缓存总大小超过 max_bytes 时从最久未使用的一项开始淘汰，当前图片不会被淘汰
+    """
+
+    def __init__(self, loader: Callable[[int], Tuple], num_images: int, radius: int = 3,
+                 max_bytes: int = 1024 * 1024 * 1024, num_workers: int = 2):
+        """
+        Args:
+            loader: 读取一张图片数据的函数，返回 (image, image_bgr, image_embedding)
+            num_images: 图片总数，预取范围首尾相接（与切换图片的行为一致）
+            radius: 预取当前图片前后各多少张
+            max_bytes: 缓存占用内存上限
+            num_workers: 后台读取线程数
+        """
+        self.loader = loader
+        self.num_images = num_images
+        self.radius = radius
+        self.max_bytes = max_bytes
+        self.cache: "OrderedDict[int, Tuple]" = OrderedDict()
+        self.sizes: Dict[int, int] = {}
+        self.total_bytes = 0
+        self.pending: Dict[int, Future] = {}
+        self.current_id = None
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="prefetch")
+
+    def get(self, image_id: int) -> Tuple:
+        """获取图片数据，未缓存时等待后台读取或直接读取，然后预取相邻图片"""
+        with self.lock:
+            self.current_id = image_id
+            data = self.cache.get(image_id)
+            if data is not None:
+                self.cache.move_to_end(image_id)
+            future = self.pending.get(image_id)
+
+        if data is None:
+            if future is not None:
+                data = future.result()
+            else:
+                data = self.loader(image_id)
+                self._store(image_id, data)
+
+        self._schedule_neighbours(image_id)
+        return data
+
+    def _schedule_neighbours(self, image_id: int):
+        """按距离由近到远提交相邻图片的读取任务，先下一张后上一张"""
+        order = []
+        for offset in range(1, self.radius + 1):
+            for neighbour in (image_id + offset, image_id - offset):
+                neighbour %= self.num_images
+                if neighbour != image_id and neighbour not in order:
+                    order.append(neighbour)
+
+        with self.lock:
+            for neighbour in order:
+                if neighbour in self.cache or neighbour in self.pending:
+                    continue
+                self.pending[neighbour] = self.executor.submit(self._load, neighbour)
+
+    def _load(self, image_id: int):
+        """后台线程中读取一张图片，读取失败时不缓存，由 get() 同步读取时再报告错误"""
+        try:
+            data = self.loader(image_id)
+        except Exception:
+            with self.lock:
+                self.pending.pop(image_id, None)
+            raise
+        self._store(image_id, data)
+        return data
+
+    def _store(self, image_id: int, data: Tuple):
+        """加入缓存并按内存上限淘汰最久未使用的数据"""
+        nbytes = data_nbytes(data)
+        with self.lock:
+            self.pending.pop(image_id, None)
+            if image_id in self.cache:
+                return
+            self.cache[image_id] = data
+            self.sizes[image_id] = nbytes
+            self.total_bytes += nbytes
+            # 刚读取的是预取数据时不应排在当前图片之后
+            if self.current_id in self.cache:
+                self.cache.move_to_end(self.current_id)
+
+            for old_id in list(self.cache):
+                if self.total_bytes <= self.max_bytes:
+                    break
+                if old_id == self.current_id:
+                    continue
+                del self.cache[old_id]
+                self.total_bytes -= self.sizes.pop(old_id)
+
+    def clear(self):
+        """清空缓存"""
+        with self.lock:
+            self.cache.clear()
+            self.sizes.clear()
+            self.total_bytes = 0
+
+    def close(self):
+        """停止后台读取线程并清空缓存"""
+        with self.lock:
+            pending = list(self.pending.values())
+            self.pending.clear()
+        for future in pending:
+            future.cancel()
+        self.executor.shutdown(wait=False)
+        self.clear()
@@ -0,0 +1,84 @@
+"""
+COCO标注文件的后台写入
+
+在界面线程中只复制标注列表（标注本身创建后不再修改，可以直接共享，见 LazyCocoFile.snapshot），
+序列化和写盘在后台线程中进行：先写临时文件并落盘，再原子地替换目标文件，
+写入过程中程序崩溃也不会留下写了一半的annotations.json。
+前一次写入尚未开始时再次提交，只写入最新的一份
+"""
+
+import threading
+from typing import Callable, Optional
+
+from utils.sam_annotator.journal import write_json_atomic
+
+
+class SnapshotWriter:
+    """后台写入COCO文件，只保留最新的一个待写入快照"""
+
+    def __init__(self, path: str, write: Callable[[object], None] = None, indent: Optional[int] = 2):
+        """
+        Args:
+            path: 目标文件路径
+            write: 原子地写入一份快照的函数，默认将快照作为字典写成JSON
+            indent: 默认写入函数使用的缩进
+        """
+        self.path = path
+        self.write = write or (lambda snapshot: write_json_atomic(path, snapshot, indent=indent))
+        self.pending = None
+        self.writing = False
+        self.stopped = False
+        self.last_error = None
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._run, name="snapshot-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, snapshot, on_written: Callable[[], None] = None):
+        """
+        提交快照，覆盖尚未开始写入的旧快照
+
+        Args:
+            snapshot: 不再被修改的COCO数据
+            on_written: 写入成功后在后台线程中调用
+        """
+        with self.condition:
+            self.pending = (snapshot, on_written)
+            self.condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.pending is None and not self.stopped:
+                    self.condition.wait()
+                if self.pending is None:
+                    return
+                (snapshot, on_written), self.pending = self.pending, None
+                self.writing = True
+
+            try:
+                self.write(snapshot)
+                if on_written is not None:
+                    on_written()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = e
+                print(f"警告: 保存标注文件失败: {self.path}, 错误: {e}")
+            finally:
+                with self.condition:
+                    self.writing = False
+                    self.condition.notify_all()
+
+    def flush(self, timeout: float = None) -> bool:
+        """等待已提交的快照写入完成，返回是否在超时前完成"""
+        with self.condition:
+            return self.condition.wait_for(
+                lambda: self.pending is None and not self.writing, timeout
+            )
+
+    def close(self) -> Optional[Exception]:
+        """写完已提交的快照后停止后台线程，返回最后一次写入的错误（成功时为None）"""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        self.thread.join()
+        return self.last_error
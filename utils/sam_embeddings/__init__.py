@@ -2,8 +2,24 @@
 SAM嵌入向量生成工具包
 """
 
-from .processor import SAMEmbeddingsProcessorThread
+from .storage import (
+    STORAGE_FORMATS, STORAGE_BACKENDS,
+    save_embedding, load_embedding, open_embedding_store
+)
 
 __all__ = [
     'SAMEmbeddingsProcessorThread',
+    'STORAGE_FORMATS',
+    'STORAGE_BACKENDS',
+    'save_embedding',
+    'load_embedding',
+    'open_embedding_store',
 ]
+
+
+def __getattr__(name):
+    # 延迟导入处理线程，标注工具只读取嵌入向量时无需加载torch和segment_anything，命令行模式下无需加载PyQt5
+    if name == 'SAMEmbeddingsProcessorThread':
+        from .thread import SAMEmbeddingsProcessorThread
+        return SAMEmbeddingsProcessorThread
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,171 @@
+"""
+多进程嵌入向量生成
+
+将 find_images_folders 找到的文件夹按图片数量均衡地分配给N个工作进程，
+每个进程加载各自的模型副本（CPU模式下绑定各自的CPU核心，多GPU时每个进程一张卡），
+进度通过队列汇总回主进程，再由主进程统一回调 progress_callback
+"""
+
+import os
+import time
+import queue
+import multiprocessing as mp
+from typing import List, Tuple
+
+from .processor import SAMEmbeddingsProcessor
+
+
+class _WorkerProcessor(SAMEmbeddingsProcessor):
+    """工作进程中的处理器，将逐张图片的进度转发给主进程"""
+
+    def __init__(self, config, worker_id, progress_queue, stop_event):
+        super().__init__(config)
+        self.worker_id = worker_id
+        self.progress_queue = progress_queue
+        self.stop_event = stop_event
+
+    def _report_image_progress(self, processed_count, total_images, start_time,
+                               folder_name, image_name):
+        self.progress_queue.put(("progress", self.worker_id, processed_count, folder_name, image_name))
+        if self.stop_event.is_set():
+            self.stop()
+
+
+def _worker_main(worker_id, config, images_folders, total_images, checkpoint_hash,
+                 cpu_ids, progress_queue, stop_event):
+    """工作进程入口"""
+    processed_count = 0
+    try:
+        if cpu_ids:
+            if hasattr(os, "sched_setaffinity"):
+                os.sched_setaffinity(0, cpu_ids)
+            if config.get('backend', 'pytorch') == 'onnxruntime':
+                config = dict(config, intra_op_threads=len(cpu_ids))
+            else:
+                import torch
+                torch.set_num_threads(len(cpu_ids))
+
+        processor = _WorkerProcessor(config, worker_id, progress_queue, stop_event)
+        processor.checkpoint_hash = checkpoint_hash
+        encoder = processor.load_model()
+        processed_count, stopped = processor.process_folders(
+            images_folders, encoder, time.time(), total_images
+        )
+        progress_queue.put(("done", worker_id, processed_count, stopped, None))
+    except Exception as e:
+        progress_queue.put(("done", worker_id, processed_count, False, str(e)))
+
+
+def split_folders(images_folders: List[Tuple[str, str]], image_counts: List[int],
+                  num_workers: int) -> List[List[Tuple[str, str]]]:
+    """按图片数量从多到少依次分配给当前负载最小的进程（LPT贪心）"""
+    assignments = [[] for _ in range(num_workers)]
+    loads = [0] * num_workers
+    order = sorted(range(len(images_folders)), key=lambda i: image_counts[i], reverse=True)
+    for i in order:
+        worker = loads.index(min(loads))
+        assignments[worker].append(images_folders[i])
+        loads[worker] += image_counts[i]
+    return assignments
+
+
+def assign_devices(device: str, num_workers: int, backend: str = "pytorch") -> List[str]:
+    """为每个进程分配设备，有多张GPU时轮流分配"""
+    if device.startswith("cuda") and ":" not in device and backend == "pytorch":
+        import torch
+        gpu_count = torch.cuda.device_count()
+        if gpu_count > 1:
+            return [f"cuda:{i % gpu_count}" for i in range(num_workers)]
+    return [device] * num_workers
+
+
+def split_cpus(num_workers: int) -> List[List[int]]:
+    """将可用CPU核心平均划分给各个进程"""
+    if hasattr(os, "sched_getaffinity"):
+        cpus = sorted(os.sched_getaffinity(0))
+    else:
+        cpus = list(range(os.cpu_count() or 1))
+    per_worker = max(1, len(cpus) // num_workers)
+    return [cpus[i * per_worker:(i + 1) * per_worker] or cpus[-per_worker:]
+            for i in range(num_workers)]
+
+
+def run_distributed(processor: SAMEmbeddingsProcessor, images_folders: List[Tuple[str, str]],
+                    total_images: int, start_time: float) -> Tuple[int, bool, str]:
+    """
+    用多个工作进程处理所有images文件夹
+
+    Args:
+        processor: 主进程中的处理器，用于读取配置、回调进度和响应停止
+        images_folders: find_images_folders 的结果
+        total_images: 总图片数量
+        start_time: 开始时间
+
+    Returns:
+        (已处理图片数, 是否被中断, 错误信息或None)
+    """
+    config = processor.config
+    num_workers = min(int(config.get('num_processes', 1)), len(images_folders))
+    image_counts = [len(processor.list_image_files(folder)) for folder, _ in images_folders]
+    assignments = split_folders(images_folders, image_counts, num_workers)
+    folder_counts = dict(zip(images_folders, image_counts))
+    devices = assign_devices(config['device'], num_workers, config.get('backend', 'pytorch'))
+    cpu_groups = split_cpus(num_workers) if config['device'] == "cpu" else [None] * num_workers
+
+    # CUDA不支持fork，统一使用spawn
+    ctx = mp.get_context("spawn")
+    progress_queue = ctx.Queue()
+    stop_event = ctx.Event()
+    workers = []
+    for worker_id in range(num_workers):
+        worker_config = dict(config, device=devices[worker_id])
+        worker_total = sum(folder_counts[folder] for folder in assignments[worker_id])
+        worker = ctx.Process(
+            target=_worker_main,
+            args=(worker_id, worker_config, assignments[worker_id], worker_total,
+                  processor.checkpoint_hash, cpu_groups[worker_id], progress_queue, stop_event),
+            daemon=True,
+        )
+        worker.start()
+        workers.append(worker)
+    processor._update_progress(4, f"已启动 {num_workers} 个工作进程，正在加载模型...")
+
+    worker_counts = [0] * num_workers
+    finished = {}
+    errors = []
+    while len(finished) < num_workers:
+        if processor.should_stop:
+            stop_event.set()
+
+        try:
+            message = progress_queue.get(timeout=0.5)
+        except queue.Empty:
+            # 检查是否有进程未报告结果就异常退出
+            for worker_id, worker in enumerate(workers):
+                if worker_id not in finished and not worker.is_alive():
+                    finished[worker_id] = False
+                    errors.append(f"工作进程 {worker_id} 异常退出 (exitcode={worker.exitcode})")
+            continue
+
+        kind, worker_id = message[0], message[1]
+        if kind == "progress":
+            _, _, count, folder_name, image_name = message
+            worker_counts[worker_id] = count
+            processor._report_image_progress(
+                sum(worker_counts), total_images, start_time, folder_name, image_name
+            )
+        elif kind == "done" and worker_id not in finished:
+            _, _, count, stopped, error = message
+            worker_counts[worker_id] = count
+            finished[worker_id] = stopped
+            if error:
+                errors.append(f"工作进程 {worker_id} 出错: {error}")
+
+    for worker in workers:
+        worker.join()
+
+    processed_count = sum(worker_counts)
+    stopped = any(finished.values())
+    if errors:
+        return processed_count, stopped, "; ".join(errors)
+    return processed_count, stopped, None
@@ -0,0 +1,67 @@
+"""
+SAM图像编码器后端
+
+两种后端对外提供相同的接口：img_size 属性和 __call__(Bx3xHxW float32数组) -> Bx256x64x64 嵌入向量
+- pytorch: 通过 segment_anything 加载 .pth 权重，在 CPU/GPU 上运行
+- onnxruntime: 运行由ONNX导出工具导出的图像编码器，无需安装PyTorch
+"""
+
+import os
+import numpy as np
+
+try:
+    import onnxruntime
+    HAS_ONNXRUNTIME = True
+except ImportError:
+    HAS_ONNXRUNTIME = False
+
+ENCODER_BACKENDS = ["pytorch", "onnxruntime"]
+
+
+class TorchImageEncoder:
+    """PyTorch图像编码器"""
+
+    def __init__(self, sam):
+        self.sam = sam
+        self.img_size = sam.image_encoder.img_size
+
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        import torch
+
+        input_tensor = torch.from_numpy(batch).to(self.sam.device)
+        with torch.no_grad():
+            image_embeddings = self.sam.image_encoder(input_tensor)
+        return image_embeddings.cpu().numpy()
+
+
+class OnnxImageEncoder:
+    """onnxruntime图像编码器"""
+
+    def __init__(self, model_path: str, device: str = "cpu", intra_op_threads: int = 0):
+        """
+        Args:
+            model_path: 导出的图像编码器 .onnx 路径
+            device: "cpu" 或 "cuda"，CUDA执行器不可用时回退到CPU
+            intra_op_threads: 单个算子内部的线程数，0表示由onnxruntime决定
+        """
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"图像编码器ONNX模型不存在: {model_path}")
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads > 0:
+            options.intra_op_num_threads = intra_op_threads
+            options.inter_op_num_threads = 1
+
+        providers = ["CPUExecutionProvider"]
+        if device.startswith("cuda") and "CUDAExecutionProvider" in onnxruntime.get_available_providers():
+            device_id = int(device.split(":")[1]) if ":" in device else 0
+            providers.insert(0, ("CUDAExecutionProvider", {"device_id": device_id}))
+
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=providers)
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.img_size = int(model_input.shape[-1])
+
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: batch})[0]
@@ -0,0 +1,148 @@
+"""
+嵌入向量清单（manifest）
+
+每个embeddings文件夹下保存一个 manifest.json，记录每张图片生成嵌入向量时的
+源文件路径、大小、修改时间以及所用模型、存储格式和存储后端，用于增量生成和中断后续跑
+"""
+
+import os
+import json
+import hashlib
+import threading
+from typing import Dict, List, Optional
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def _update_file_digest(sha, path: str, chunk_size: int):
+    """将文件大小以及首尾各 chunk_size 字节加入sha256"""
+    size = os.path.getsize(path)
+    sha.update(str(size).encode("utf-8"))
+    with open(path, "rb") as f:
+        sha.update(f.read(chunk_size))
+        if size > chunk_size:
+            f.seek(max(chunk_size, size - chunk_size))
+            sha.update(f.read(chunk_size))
+
+
+def onnx_external_data_files(model_path: str) -> Optional[List[str]]:
+    """
+    ONNX模型引用的外部数据文件名（相对于模型所在目录，已排序）
+
+    超过2GB或以外部数据格式导出的模型，权重不在.onnx文件中，只在其中记录位置。
+    只读取模型结构，不加载权重；未安装onnx时返回None
+    """
+    try:
+        import onnx
+    except ImportError:
+        return None
+    model = onnx.load(model_path, load_external_data=False)
+    return sorted({
+        entry.value
+        for tensor in model.graph.initializer
+        if tensor.data_location == onnx.TensorProto.EXTERNAL
+        for entry in tensor.external_data
+        if entry.key == "location"
+    })
+
+
+def checkpoint_fingerprint(checkpoint_path: str, chunk_size: int = 16 * 1024 * 1024) -> str:
+    """
+    计算模型权重文件的指纹
+
+    权重文件动辄数GB，这里只对文件大小以及首尾各 chunk_size 字节做sha256，
+    足以区分不同的权重文件。
+    ONNX模型同时计算其引用的外部数据文件，否则重新导出同结构的不同权重时指纹不变
+    """
+    sha = hashlib.sha256()
+    _update_file_digest(sha, checkpoint_path, chunk_size)
+    if checkpoint_path.lower().endswith(".onnx"):
+        locations = onnx_external_data_files(checkpoint_path)
+        if locations is None:
+            print("警告: onnx库未安装，权重指纹不包含ONNX模型的外部数据文件")
+            locations = []
+        model_dir = os.path.dirname(checkpoint_path)
+        for location in locations:
+            sha.update(location.encode("utf-8"))
+            _update_file_digest(sha, os.path.join(model_dir, location), chunk_size)
+    return sha.hexdigest()
+
+
+class EmbeddingManifest:
+    """单个embeddings文件夹的清单"""
+
+    def __init__(self, embeddings_folder: str, model_type: str, checkpoint_hash: str,
+                 storage_format: str = "float32", storage_backend: str = "files"):
+        self.path = os.path.join(embeddings_folder, MANIFEST_NAME)
+        self.embeddings_folder = embeddings_folder
+        self.model_type = model_type
+        self.checkpoint_hash = checkpoint_hash
+        self.storage_format = storage_format
+        self.storage_backend = storage_backend
+        self.entries: Dict[str, Dict] = {}
+        self.lock = threading.Lock()
+        self.dirty = 0
+        self.load()
+
+    def load(self):
+        """读取清单，模型、存储格式或存储后端不一致时丢弃全部记录"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"警告: 无法读取清单文件 {self.path}: {e}")
+            return
+
+        if (data.get("version") != MANIFEST_VERSION
+                or data.get("model_type") != self.model_type
+                or data.get("checkpoint_hash") != self.checkpoint_hash
+                or data.get("storage_format", "float32") != self.storage_format
+                or data.get("storage_backend", "files") != self.storage_backend):
+            return
+        self.entries = data.get("entries", {})
+
+    def is_up_to_date(self, image_name: str, image_path: str, store) -> bool:
+        """判断图片的嵌入向量是否已是最新且仍存在于存储中"""
+        entry = self.entries.get(image_name)
+        if entry is None:
+            return False
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return False
+        if entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+            return False
+        return store.contains(entry["output"])
+
+    def record(self, image_name: str, image_path: str, output_name: str):
+        """记录一张已成功保存嵌入向量的图片（可在写入线程中调用）"""
+        stat = os.stat(image_path)
+        with self.lock:
+            self.entries[image_name] = {
+                "source": os.path.abspath(image_path),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "output": output_name,
+            }
+            self.dirty += 1
+
+    def save(self):
+        """原子地写入清单文件"""
+        with self.lock:
+            data = {
+                "version": MANIFEST_VERSION,
+                "model_type": self.model_type,
+                "checkpoint_hash": self.checkpoint_hash,
+                "storage_format": self.storage_format,
+                "storage_backend": self.storage_backend,
+                "entries": dict(self.entries),
+            }
+            self.dirty = 0
+
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
@@ -0,0 +1,115 @@
+"""
+嵌入向量生成的预取流水线
+
+解码线程池负责 读取 -> 转RGB -> 预处理，结果按原顺序放入有界队列；
+编码线程只从队列中取数据，后台写入线程负责保存嵌入向量，使图像编码器保持满载
+"""
+
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .preprocess import preprocess_image
+
+
+def load_and_preprocess(image_path: str, img_size: int) -> np.ndarray:
+    """读取图片并转换为编码器输入，读取失败时抛出异常"""
+    image = cv2.imread(image_path)
+    if image is None:
+        raise IOError(f"无法读取图片 {image_path}")
+    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    return preprocess_image(image, img_size)
+
+
+class ImagePrefetcher:
+    """
+    多线程图片预取器
+
+    最多同时有 queue_size 张图片处于解码中或已解码待取出的状态，
+    按 image_names 的顺序产出 (image_name, 编码器输入或None, 错误信息或None)
+    """
+
+    def __init__(self, images_folder: str, image_names: List[str], img_size: int,
+                 num_workers: int = 4, queue_size: int = 16):
+        self.images_folder = images_folder
+        self.image_names = image_names
+        self.img_size = img_size
+        self.num_workers = max(1, num_workers)
+        self.queue_size = max(1, queue_size)
+
+    def __iter__(self) -> Iterator[Tuple[str, Optional[np.ndarray], Optional[str]]]:
+        pending = deque()
+        names = iter(self.image_names)
+        executor = ThreadPoolExecutor(max_workers=self.num_workers)
+
+        def submit_next():
+            image_name = next(names, None)
+            if image_name is None:
+                return False
+            image_path = os.path.join(self.images_folder, image_name)
+            pending.append((image_name, executor.submit(load_and_preprocess, image_path, self.img_size)))
+            return True
+
+        try:
+            # 预先填满队列
+            while len(pending) < self.queue_size and submit_next():
+                pass
+
+            while pending:
+                image_name, future = pending.popleft()
+                submit_next()
+                try:
+                    yield image_name, future.result(), None
+                except Exception as e:
+                    yield image_name, None, str(e)
+        finally:
+            # 消费方提前退出（如用户中断）时取消尚未开始的任务
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+
+class EmbeddingWriter:
+    """后台嵌入向量写入线程"""
+
+    def __init__(self, queue_size: int = 64):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.errors = []
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, store, stem: str, embedding: np.ndarray, on_saved=None):
+        """
+        提交一个待保存的嵌入向量，队列满时阻塞
+
+        Args:
+            store: 嵌入向量存储（FileEmbeddingStore 或 ShardedEmbeddingStore）
+            stem: 图片名（不含扩展名）
+            on_saved: 保存成功后在写入线程中以输出名为参数调用的回调（可选）
+        """
+        self.queue.put((store, stem, embedding, on_saved))
+
+    def close(self):
+        """等待所有待写入的嵌入向量保存完毕"""
+        self.queue.put(None)
+        self.thread.join()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            store, stem, embedding, on_saved = item
+            try:
+                output_name = store.save(stem, embedding)
+                if on_saved is not None:
+                    on_saved(output_name)
+            except Exception as e:
+                self.errors.append(stem)
+                print(f"保存嵌入向量 {stem} 时出错: {str(e)}")
@@ -0,0 +1,52 @@
+"""
+SAM图像编码器输入预处理
+
+与 SamPredictor.set_image 的预处理保持一致：
+长边缩放到1024（PIL双线性插值）-> 按像素均值/方差归一化 -> 右下角补零到1024x1024
+"""
+
+import numpy as np
+from typing import Tuple
+
+try:
+    from PIL import Image
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+    print("警告: Pillow库未安装，嵌入向量预处理将不可用")
+
+# SAM默认的像素均值和标准差（RGB顺序）
+PIXEL_MEAN = np.array([123.675, 116.28, 103.53], dtype=np.float32)
+PIXEL_STD = np.array([58.395, 57.12, 57.375], dtype=np.float32)
+
+IMG_SIZE = 1024
+
+
+def get_preprocess_shape(oldh: int, oldw: int, long_side_length: int) -> Tuple[int, int]:
+    """计算长边缩放到long_side_length后的尺寸 (h, w)"""
+    scale = long_side_length * 1.0 / max(oldh, oldw)
+    newh, neww = oldh * scale, oldw * scale
+    neww = int(neww + 0.5)
+    newh = int(newh + 0.5)
+    return (newh, neww)
+
+
+def preprocess_image(image: np.ndarray, img_size: int = IMG_SIZE) -> np.ndarray:
+    """
+    将RGB图片转换为图像编码器的输入
+
+    Args:
+        image: HxWx3 的uint8 RGB图片
+        img_size: 编码器输入边长
+
+    Returns:
+        3 x img_size x img_size 的float32数组
+    """
+    newh, neww = get_preprocess_shape(image.shape[0], image.shape[1], img_size)
+    resized = np.asarray(Image.fromarray(image).resize((neww, newh), Image.BILINEAR))
+
+    # 归一化后直接写入补零的画布，避免额外的拷贝
+    output = np.zeros((3, img_size, img_size), dtype=np.float32)
+    normalized = (resized.astype(np.float32) - PIXEL_MEAN) / PIXEL_STD
+    output[:, :newh, :neww] = normalized.transpose(2, 0, 1)
+    return output
@@ -9,11 +9,17 @@ import numpy as np
 import time
 from pathlib import Path
 from typing import Dict, List, Tuple
-from PyQt5 import QtCore
 
-# 尝试导入SAM库
+# 尝试导入必要的库
 try:
-    from segment_anything import sam_model_registry, SamPredictor
+    import torch
+    HAS_TORCH = True
+except ImportError:
+    HAS_TORCH = False
+    print("警告: torch库未安装")
+
+try:
+    from segment_anything import sam_model_registry
     HAS_SAM = True
 except ImportError:
     HAS_SAM = False
@@ -27,6 +33,12 @@ except ImportError:
     HAS_TQDM = False
     print("警告: tqdm库未安装，进度显示功能将受限")
 
+from .pipeline import ImagePrefetcher, EmbeddingWriter
+from .manifest import EmbeddingManifest, checkpoint_fingerprint
+from .storage import open_embedding_store
+from .encoders import TorchImageEncoder, OnnxImageEncoder, HAS_ONNXRUNTIME
+from utils.dataset_index import DatasetIndex
+
 
 class SAMEmbeddingsProcessor:
     """SAM嵌入向量处理器"""
@@ -35,10 +47,22 @@ class SAMEmbeddingsProcessor:
         self.config = config
         self.progress_callback = None
         self.should_stop = False
+        self.writer = None
+        self.checkpoint_hash = None
+        self.manifests = []
+        self.stores = []
+        self.dataset_index = DatasetIndex()
 
         # 验证依赖
-        if not HAS_SAM:
-            raise ImportError("请安装segment_anything库: pip install git+https://github.com/facebookresearch/segment-anything.git")
+        if config.get('backend', 'pytorch') == 'onnxruntime':
+            if not HAS_ONNXRUNTIME:
+                raise ImportError("请安装onnxruntime库: pip install onnxruntime")
+        else:
+            if not HAS_TORCH:
+                raise ImportError("请安装torch库: pip install torch")
+
+            if not HAS_SAM:
+                raise ImportError("请安装segment_anything库: pip install git+https://github.com/facebookresearch/segment-anything.git")
 
         if not HAS_TQDM:
             print("注意: 未安装tqdm库，将使用简单进度显示")
@@ -83,106 +107,221 @@ class SAMEmbeddingsProcessor:
 
         return images_folders
 
+    def list_image_files(self, images_folder: str) -> List[str]:
+        """列出images文件夹中的图片文件名（通过目录索引，文件夹未变化时无需重新扫描）"""
+        image_files = []
+        for info in self.dataset_index.list_dir(images_folder):
+            image_name = os.path.basename(info.path)
+            ext = os.path.splitext(image_name)[1].lower()
+            if ext in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp']:
+                image_files.append(image_name)
+        return image_files
+
     def count_total_images(self, images_folders: List[Tuple[str, str]]) -> int:
         """统计总图片数量"""
-        total = 0
-        for images_folder, _ in images_folders:
-            for image_name in os.listdir(images_folder):
-                image_path = os.path.join(images_folder, image_name)
-                if os.path.isfile(image_path):
-                    ext = os.path.splitext(image_name)[1].lower()
-                    if ext in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp']:
-                        total += 1
-        return total
+        return sum(len(self.list_image_files(images_folder)) for images_folder, _ in images_folders)
 
     def process_images_folder(self, images_folder: str, embeddings_folder: str,
-                            predictor, start_time: float, processed_count: int,
+                            encoder, start_time: float, processed_count: int,
                             total_images: int) -> Tuple[int, bool]:
         """
         处理单个images文件夹
 
+        图片由解码线程池预取并预处理，每 batch_size 张堆叠为一个批次送入图像编码器，
+        再将输出按图片拆分，由后台写入线程按存储格式保存为各自的文件
+
         Returns:
             (新的processed_count, 是否被中断)
         """
+        batch_size = max(1, int(self.config.get('batch_size', 1)))
+        storage_format = self.config.get('storage_format', 'float32')
+        storage_backend = self.config.get('storage_backend', 'files')
+
         # 创建输出目录
         if not os.path.exists(embeddings_folder):
             os.makedirs(embeddings_folder)
 
         # 获取当前images文件夹中的图片
-        image_files = []
-        for image_name in os.listdir(images_folder):
-            image_path = os.path.join(images_folder, image_name)
-            if os.path.isfile(image_path):
-                ext = os.path.splitext(image_name)[1].lower()
-                if ext in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp']:
-                    image_files.append(image_name)
-
-        # 处理当前文件夹中的每张图片
+        image_files = self.list_image_files(images_folder)
+
+        store = open_embedding_store(embeddings_folder, storage_backend, storage_format)
+        self.stores.append(store)
+
+        # 增量模式：跳过清单中记录且源文件未变化的图片
         folder_name = os.path.basename(os.path.dirname(images_folder))
-        for image_name in image_files:
+        manifest = None
+        if self.config.get('incremental', True):
+            manifest = EmbeddingManifest(
+                embeddings_folder, self.config['model_type'], self.checkpoint_hash,
+                storage_format, storage_backend
+            )
+            self.manifests.append(manifest)
+            pending_files = [
+                name for name in image_files
+                if not manifest.is_up_to_date(name, os.path.join(images_folder, name), store)
+            ]
+            skipped = len(image_files) - len(pending_files)
+            if skipped > 0:
+                processed_count += skipped
+                self._report_image_progress(
+                    processed_count, total_images, start_time, folder_name,
+                    f"跳过 {skipped} 张未变化的图片"
+                )
+            image_files = pending_files
+
+        # 解码线程池按顺序预取图片，编码线程按批次消费
+        prefetcher = ImagePrefetcher(
+            images_folder, image_files, encoder.img_size,
+            num_workers=self.config.get('num_workers', 4),
+            queue_size=self.config.get('prefetch_size', batch_size * 4),
+        )
+        batch_names = []
+        batch_inputs = []
+        for index, (image_name, image_input, error) in enumerate(prefetcher):
             if self.should_stop:
                 return processed_count, True
 
+            if image_input is None:
+                print(f"警告: {error}")
+                processed_count += 1
+            else:
+                batch_inputs.append(image_input)
+                batch_names.append(image_name)
+
+            # 批次已满或已到最后一张图片时执行编码
+            if len(batch_inputs) < batch_size and index < len(image_files) - 1:
+                continue
+            if not batch_inputs:
+                continue
+
             try:
-                # 读取图片
-                image_path = os.path.join(images_folder, image_name)
-                image = cv2.imread(image_path)
+                image_embeddings = encoder(np.stack(batch_inputs))
+            except Exception as e:
+                print(f"编码批次 {batch_names} 时出错: {str(e)}")
+                image_embeddings = None
+
+            for i, name in enumerate(batch_names):
+                if image_embeddings is not None:
+                    # 交给后台线程保存嵌入向量（保持 1x256x64x64 的形状）
+                    on_saved = None
+                    if manifest is not None:
+                        image_path = os.path.join(images_folder, name)
+                        on_saved = (lambda o, m=manifest, n=name, p=image_path:
+                                    m.record(n, p, o))
+                    self.writer.submit(
+                        store, os.path.splitext(name)[0], image_embeddings[i:i + 1], on_saved
+                    )
 
-                if image is None:
-                    print(f"警告: 无法读取图片 {image_path}")
-                    processed_count += 1
-                    continue
+                processed_count += 1
+                self._report_image_progress(
+                    processed_count, total_images, start_time, folder_name, name
+                )
 
-                # 转换为RGB
-                image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            batch_names = []
+            batch_inputs = []
 
-                # 设置图片并获取嵌入向量
-                predictor.set_image(image)
-                image_embedding = predictor.get_image_embedding().cpu().numpy()
+            # 定期落盘存储索引和清单，保证中断后可以从断点继续
+            if manifest is not None and manifest.dirty >= 100:
+                store.flush()
+                manifest.save()
 
-                # 保存嵌入向量
-                out_name = os.path.splitext(image_name)[0] + ".npy"
-                out_path = os.path.join(embeddings_folder, out_name)
-                np.save(out_path, image_embedding)
+        return processed_count, False
 
-                processed_count += 1
+    def _report_image_progress(self, processed_count: int, total_images: int,
+                               start_time: float, folder_name: str, image_name: str):
+        """计算进度和剩余时间并更新进度"""
+        current_time = time.time()
+        elapsed_time = current_time - start_time
+        progress_percentage = int((processed_count / total_images) * 95) + 5
+        folder_display = folder_name if folder_name != "" else "根目录"
+
+        if processed_count > 0:
+            # 计算平均每张图片处理时间
+            avg_time_per_image = elapsed_time / processed_count
+            remaining_images = total_images - processed_count
+            remaining_time_seconds = avg_time_per_image * remaining_images
+
+            # 格式化剩余时间
+            if remaining_time_seconds < 60:
+                remaining_time_str = f"{int(remaining_time_seconds)}秒"
+            elif remaining_time_seconds < 3600:
+                minutes = int(remaining_time_seconds // 60)
+                seconds = int(remaining_time_seconds % 60)
+                remaining_time_str = f"{minutes}分{seconds}秒"
+            else:
+                hours = int(remaining_time_seconds // 3600)
+                minutes = int((remaining_time_seconds % 3600) // 60)
+                remaining_time_str = f"{hours}小时{minutes}分"
 
-                # 计算进度和剩余时间
-                current_time = time.time()
-                elapsed_time = current_time - start_time
-                progress_percentage = int((processed_count / total_images) * 95) + 5
-
-                if processed_count > 0:
-                    # 计算平均每张图片处理时间
-                    avg_time_per_image = elapsed_time / processed_count
-                    remaining_images = total_images - processed_count
-                    remaining_time_seconds = avg_time_per_image * remaining_images
-
-                    # 格式化剩余时间
-                    if remaining_time_seconds < 60:
-                        remaining_time_str = f"{int(remaining_time_seconds)}秒"
-                    elif remaining_time_seconds < 3600:
-                        minutes = int(remaining_time_seconds // 60)
-                        seconds = int(remaining_time_seconds % 60)
-                        remaining_time_str = f"{minutes}分{seconds}秒"
-                    else:
-                        hours = int(remaining_time_seconds // 3600)
-                        minutes = int((remaining_time_seconds % 3600) // 60)
-                        remaining_time_str = f"{hours}小时{minutes}分"
-
-                    # 更新进度
-                    folder_display = folder_name if folder_name != "" else "根目录"
-                    message = f"正在处理 [{folder_display}]: {image_name} ({processed_count}/{total_images}, 剩余约{remaining_time_str})"
-                else:
-                    folder_display = folder_name if folder_name != "" else "根目录"
-                    message = f"正在处理 [{folder_display}]: {image_name} ({processed_count}/{total_images})"
-
-                self._update_progress(progress_percentage, message)
+            message = f"正在处理 [{folder_display}]: {image_name} ({processed_count}/{total_images}, 剩余约{remaining_time_str})"
+        else:
+            message = f"正在处理 [{folder_display}]: {image_name} ({processed_count}/{total_images})"
 
-            except Exception as e:
-                print(f"处理图片 {image_name} 时出错: {str(e)}")
-                processed_count += 1
-                continue
+        self._update_progress(progress_percentage, message)
+
+    def load_model(self):
+        """按配置的后端加载图像编码器"""
+        if self.config.get('backend', 'pytorch') == 'onnxruntime':
+            return OnnxImageEncoder(
+                self.config['encoder_onnx_path'],
+                device=self.config['device'],
+                intra_op_threads=int(self.config.get('intra_op_threads', 0)),
+            )
+
+        sam = sam_model_registry[self.config['model_type']](checkpoint=self.config['checkpoint_path'])
+        sam.to(device=self.config['device'])
+        sam.eval()
+        return TorchImageEncoder(sam)
+
+    def model_path(self) -> str:
+        """当前后端实际使用的模型文件，用于计算清单中的权重指纹"""
+        if self.config.get('backend', 'pytorch') == 'onnxruntime':
+            return self.config['encoder_onnx_path']
+        return self.config['checkpoint_path']
+
+    def process_folders(self, images_folders: List[Tuple[str, str]], encoder,
+                        start_time: float, total_images: int) -> Tuple[int, bool]:
+        """
+        依次处理多个images文件夹
+
+        Returns:
+            (已处理图片数, 是否被中断)
+        """
+        processed_count = 0
+        folders_processed = 0
+
+        self.writer = EmbeddingWriter()
+        try:
+            for images_folder, embeddings_folder in images_folders:
+                if self.should_stop:
+                    return processed_count, True
+
+                folders_processed += 1
+                folder_name = os.path.basename(os.path.dirname(images_folder))
+                folder_name = folder_name if folder_name != "" else "根目录"
+                self._update_progress(
+                    5 + int((folders_processed / len(images_folders)) * 5),
+                    f"正在处理第 {folders_processed}/{len(images_folders)} 个文件夹: {folder_name}"
+                )
+
+                # 处理当前文件夹
+                processed_count, stopped = self.process_images_folder(
+                    images_folder, embeddings_folder, encoder,
+                    start_time, processed_count, total_images
+                )
+
+                if stopped:
+                    return processed_count, True
+        finally:
+            # 确保已计算出的嵌入向量全部写入磁盘，再保存存储索引和清单
+            self.writer.close()
+            self.writer = None
+            for store in self.stores:
+                store.close()
+            self.stores = []
+            for manifest in self.manifests:
+                manifest.save()
+            self.manifests = []
 
         return processed_count, False
 
@@ -190,9 +329,6 @@ class SAMEmbeddingsProcessor:
         """执行嵌入向量生成"""
         try:
             # 获取配置参数
-            checkpoint_path = self.config['checkpoint_path']
-            model_type = self.config['model_type']
-            device = self.config['device']
             dataset_root = self.config['dataset_root']
             scan_mode = self.config['scan_mode']  # "传统模式" 或 "分组模式"
 
@@ -212,41 +348,37 @@ class SAMEmbeddingsProcessor:
 
             self._update_progress(2, f"找到 {len(images_folders)} 个images文件夹，共 {total_images} 张图片")
 
-            # 3. 加载SAM模型
-            self._update_progress(3, "正在加载SAM模型...")
-
-            try:
-                sam = sam_model_registry[model_type](checkpoint=checkpoint_path)
-                sam.to(device=device)
-                predictor = SamPredictor(sam)
-            except Exception as e:
-                return False, f"加载SAM模型失败: {str(e)}"
-
-            # 4. 记录开始时间并处理每个images文件夹
-            start_time = time.time()
-            processed_count = 0
-            folders_processed = 0
-
-            for images_folder, embeddings_folder in images_folders:
-                if self.should_stop:
-                    return False, "处理被用户中断"
-
-                folders_processed += 1
-                folder_name = os.path.basename(os.path.dirname(images_folder))
-                folder_name = folder_name if folder_name != "" else "根目录"
-                self._update_progress(
-                    5 + int((folders_processed / len(images_folders)) * 5),
-                    f"正在处理第 {folders_processed}/{len(images_folders)} 个文件夹: {folder_name}"
+            if self.config.get('incremental', True):
+                self._update_progress(3, "正在计算模型权重指纹...")
+                self.checkpoint_hash = checkpoint_fingerprint(self.model_path())
+
+            num_processes = int(self.config.get('num_processes', 1))
+            if num_processes > 1 and len(images_folders) > 1:
+                # 3-4. 多进程模式：每个进程加载各自的模型并处理分配到的文件夹
+                from .distributed import run_distributed
+                start_time = time.time()
+                processed_count, stopped, error = run_distributed(
+                    self, images_folders, total_images, start_time
                 )
-
-                # 处理当前文件夹
-                processed_count, stopped = self.process_images_folder(
-                    images_folder, embeddings_folder, predictor,
-                    start_time, processed_count, total_images
+                if error:
+                    return False, error
+            else:
+                # 3. 加载SAM图像编码器
+                self._update_progress(4, "正在加载SAM模型...")
+
+                try:
+                    encoder = self.load_model()
+                except Exception as e:
+                    return False, f"加载SAM模型失败: {str(e)}"
+
+                # 4. 记录开始时间并处理每个images文件夹
+                start_time = time.time()
+                processed_count, stopped = self.process_folders(
+                    images_folders, encoder, start_time, total_images
                 )
 
-                if stopped:
-                    return False, "处理被用户中断"
+            if stopped:
+                return False, "处理被用户中断"
 
             # 5. 完成
             total_time = time.time() - start_time
@@ -272,34 +404,3 @@ class SAMEmbeddingsProcessor:
         """更新进度"""
         if self.progress_callback:
             self.progress_callback(progress, message)
-
-
-class SAMEmbeddingsProcessorThread(QtCore.QThread):
-    """SAM嵌入向量生成线程（用于PyQt）"""
-
-    progress_updated = QtCore.pyqtSignal(int, str)
-    processing_finished = QtCore.pyqtSignal(bool, str)
-
-    def __init__(self, config: Dict):
-        super().__init__()
-        self.config = config
-        self.processor = None
-
-    def run(self):
-        """线程运行函数"""
-        try:
-            self.processor = SAMEmbeddingsProcessor(self.config)
-            self.processor.set_progress_callback(
-                lambda p, m: self.progress_updated.emit(p, m)
-            )
-
-            success, message = self.processor.process()
-            self.processing_finished.emit(success, message)
-
-        except Exception as e:
-            self.processing_finished.emit(False, f"线程执行出错: {str(e)}")
-
-    def stop(self):
-        """停止处理"""
-        if self.processor:
-            self.processor.stop()
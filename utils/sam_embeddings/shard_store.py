@@ -0,0 +1,289 @@
+"""
+分片嵌入向量存储
+
+将一个embeddings文件夹中的所有嵌入向量顺序追加到少量大文件（分片）中，
+并用索引文件记录 图片名 -> (分片, 偏移, 数据类型, 形状)：
+
+embeddings/
+├── shard_index.json
+├── shard_00000.bin
+├── shard_00001.bin
+└── ...
+
+读取时通过 np.memmap 直接映射分片文件，float32格式无需任何拷贝。
+同名图片重新保存时旧数据留在分片中成为无用空间，写入结束（close）时无用空间超过
+compact_ratio 就调用 compact 把仍被索引引用的数据复制到新分片并删除旧分片
+"""
+
+import os
+import re
+import json
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from .storage import quantize_int8, dequantize_int8, remove_file_embeddings
+
+SHARD_INDEX_NAME = "shard_index.json"
+SHARD_INDEX_VERSION = 1
+SHARD_ALIGNMENT = 64
+SHARD_FILE_PATTERN = re.compile(r"shard_(\d{5})\.bin$")
+
+
+def has_shard_index(embeddings_folder: str) -> bool:
+    """判断文件夹是否使用分片存储"""
+    return os.path.exists(os.path.join(embeddings_folder, SHARD_INDEX_NAME))
+
+
+def remove_shards(embeddings_folder: str) -> int:
+    """删除文件夹中的分片存储（先删除索引，中断时不会留下指向缺失分片的索引），返回删除的分片数"""
+    index_path = os.path.join(embeddings_folder, SHARD_INDEX_NAME)
+    if os.path.exists(index_path):
+        os.remove(index_path)
+    if not os.path.isdir(embeddings_folder):
+        return 0
+    removed = 0
+    for name in os.listdir(embeddings_folder):
+        if SHARD_FILE_PATTERN.match(name):
+            os.remove(os.path.join(embeddings_folder, name))
+            removed += 1
+    return removed
+
+
+class ShardedEmbeddingStore:
+    """
+    分片嵌入向量存储
+
+    写入只在单个线程中进行（后台写入线程），flush 和 load 可在其他线程调用。
+    同名图片重新写入时追加新数据并更新索引，旧数据成为分片中的无用空间，由 compact 回收。
+    第一次写入时删除文件夹中已有的单文件嵌入向量，避免与分片中的数据不一致
+    """
+
+    backend = "shards"
+
+    def __init__(self, embeddings_folder: str, storage_format: str = "float32",
+                 max_shard_bytes: int = 1024 * 1024 * 1024, compact_ratio: Optional[float] = 0.25):
+        """
+        Args:
+            compact_ratio: 写入结束时无用空间占分片总大小的比例超过该值则整理分片，为None时不整理
+        """
+        self.embeddings_folder = embeddings_folder
+        self.storage_format = storage_format
+        self.max_shard_bytes = max_shard_bytes
+        self.compact_ratio = compact_ratio
+        # 本实例是否写入过数据，只读打开的存储关闭时不整理
+        self._written = False
+        self.index_path = os.path.join(embeddings_folder, SHARD_INDEX_NAME)
+        self.entries: Dict[str, Dict] = {}
+        self.lock = threading.Lock()
+        self._write_file = None
+        self._write_shard = None
+        self._maps: Dict[int, np.memmap] = {}
+        self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") == SHARD_INDEX_VERSION:
+            self.entries = data.get("entries", {})
+
+    def _shard_path(self, shard: int) -> str:
+        return os.path.join(self.embeddings_folder, f"shard_{shard:05d}.bin")
+
+    def _shard_numbers(self) -> List[int]:
+        """文件夹中已有的分片编号"""
+        if not os.path.isdir(self.embeddings_folder):
+            return []
+        numbers = []
+        for name in os.listdir(self.embeddings_folder):
+            match = SHARD_FILE_PATTERN.match(name)
+            if match:
+                numbers.append(int(match.group(1)))
+        return sorted(numbers)
+
+    @staticmethod
+    def _entry_nbytes(entry: Dict) -> int:
+        """索引项引用的数据字节数（含缩放系数）"""
+        nbytes = np.dtype(entry["dtype"]).itemsize * int(np.prod(entry["shape"]))
+        return nbytes + 4 * entry.get("scale_size", 0)
+
+    def _open_for_append(self, nbytes: int):
+        """打开当前可追加的分片，写满后切换到新分片"""
+        if self._write_file is None:
+            # 从编号最大的分片继续追加（整理后分片编号不一定从0开始）
+            shards = self._shard_numbers()
+            shard = shards[-1] if shards else 0
+            if (os.path.exists(self._shard_path(shard))
+                    and os.path.getsize(self._shard_path(shard)) >= self.max_shard_bytes):
+                shard += 1
+            self._write_shard = shard
+            self._write_file = open(self._shard_path(shard), "ab")
+
+        if self._write_file.tell() > 0 and self._write_file.tell() + nbytes > self.max_shard_bytes:
+            self._write_file.close()
+            self._write_shard += 1
+            self._write_file = open(self._shard_path(self._write_shard), "ab")
+
+    def _append(self, array: np.ndarray) -> int:
+        """按对齐要求追加数组数据，返回偏移"""
+        f = self._write_file
+        padding = (-f.tell()) % SHARD_ALIGNMENT
+        if padding:
+            f.write(b"\0" * padding)
+        offset = f.tell()
+        f.write(np.ascontiguousarray(array).tobytes())
+        return offset
+
+    def save(self, stem: str, embedding: np.ndarray) -> str:
+        """追加一个嵌入向量，返回在清单中记录的输出名"""
+        if self.storage_format == "int8":
+            data, scale = quantize_int8(embedding)
+        else:
+            data, scale = embedding.astype(self.storage_format), None
+
+        if not self._written:
+            remove_file_embeddings(self.embeddings_folder)
+
+        nbytes = data.nbytes + (scale.nbytes + SHARD_ALIGNMENT if scale is not None else 0)
+        with self.lock:
+            self._open_for_append(nbytes + SHARD_ALIGNMENT)
+            entry = {
+                "shard": self._write_shard,
+                "offset": self._append(data),
+                "dtype": str(data.dtype),
+                "shape": list(data.shape),
+            }
+            if scale is not None:
+                entry["scale_offset"] = self._append(scale)
+                entry["scale_size"] = int(scale.size)
+            self.entries[stem] = entry
+            self._written = True
+        return stem
+
+    def contains(self, output_name: str) -> bool:
+        return output_name in self.entries
+
+    def _map(self, shard: int, end: int) -> np.memmap:
+        """获取分片的内存映射，分片增长后重新映射"""
+        shard_map = self._maps.get(shard)
+        if shard_map is None or shard_map.shape[0] < end:
+            # 正在追加的分片中刚保存的数据可能还在写缓冲区里，映射前先刷入文件
+            with self.lock:
+                if self._write_file is not None and shard == self._write_shard:
+                    self._write_file.flush()
+            shard_map = np.memmap(self._shard_path(shard), dtype=np.uint8, mode="r")
+            self._maps[shard] = shard_map
+        return shard_map
+
+    def load(self, stem: str) -> Optional[np.ndarray]:
+        """
+        读取嵌入向量
+
+        float32格式返回分片上的只读视图（零拷贝），其他格式还原为float32
+        """
+        entry = self.entries.get(stem)
+        if entry is None:
+            return None
+        data, scale = self._entry_arrays(entry)
+        if scale is not None:
+            return dequantize_int8(data, scale)
+        if data.dtype != np.float32:
+            return data.astype(np.float32)
+        return data
+
+    def _entry_arrays(self, entry: Dict) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """索引项在分片上的只读视图 (数据, 缩放系数或None)"""
+        dtype = np.dtype(entry["dtype"])
+        shape = tuple(entry["shape"])
+        offset = entry["offset"]
+        end = offset + dtype.itemsize * int(np.prod(shape))
+        data = self._map(entry["shard"], end)[offset:end].view(dtype).reshape(shape)
+        scale = None
+        if "scale_offset" in entry:
+            scale_offset = entry["scale_offset"]
+            scale_end = scale_offset + 4 * entry["scale_size"]
+            scale = self._map(entry["shard"], scale_end)[scale_offset:scale_end].view(np.float32)
+        return data, scale
+
+    def flush(self):
+        """将分片数据刷入磁盘并原子地写入索引"""
+        with self.lock:
+            if self._write_file is not None:
+                self._write_file.flush()
+                os.fsync(self._write_file.fileno())
+            data = {
+                "version": SHARD_INDEX_VERSION,
+                "entries": dict(self.entries),
+            }
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(temp_path, self.index_path)
+
+    def _close_write_file(self):
+        if self._write_file is not None:
+            self.flush()
+            with self.lock:
+                self._write_file.close()
+                self._write_file = None
+
+    def reclaimable_bytes(self) -> int:
+        """分片中不再被索引引用的字节数（重新保存同名图片后留下的旧数据，以及对齐填充）"""
+        total = sum(os.path.getsize(self._shard_path(shard)) for shard in self._shard_numbers())
+        live = sum(self._entry_nbytes(entry) for entry in self.entries.values())
+        return max(0, total - live)
+
+    def compact(self) -> int:
+        """
+        整理分片：按索引顺序把仍被引用的数据复制到编号更大的新分片中，写入新索引后删除旧分片
+
+        新索引写入前中断时旧索引和旧分片仍然完整可用。
+
+        Returns:
+            回收的字节数
+        """
+        self._close_write_file()
+        old_shards = self._shard_numbers()
+        if not old_shards:
+            return 0
+        before = sum(os.path.getsize(self._shard_path(shard)) for shard in old_shards)
+
+        entries = {}
+        with self.lock:
+            self._write_shard = old_shards[-1] + 1
+            self._write_file = open(self._shard_path(self._write_shard), "ab")
+        for stem, entry in self.entries.items():
+            data, scale = self._entry_arrays(entry)
+            with self.lock:
+                self._open_for_append(self._entry_nbytes(entry) + 2 * SHARD_ALIGNMENT)
+                new_entry = dict(entry, shard=self._write_shard, offset=self._append(data))
+                if scale is not None:
+                    new_entry["scale_offset"] = self._append(scale)
+            entries[stem] = new_entry
+        with self.lock:
+            self.entries = entries
+        self._close_write_file()
+
+        self._maps = {}
+        for shard in old_shards:
+            try:
+                os.remove(self._shard_path(shard))
+            except OSError:
+                # 分片仍被其他映射占用（Windows），留待下次整理
+                pass
+        after = sum(os.path.getsize(self._shard_path(shard)) for shard in self._shard_numbers())
+        return max(0, before - after)
+
+    def close(self):
+        """结束写入，本次写入后无用空间超过 compact_ratio 时整理分片"""
+        self._close_write_file()
+        if self._written and self.compact_ratio is not None:
+            total = sum(os.path.getsize(self._shard_path(shard)) for shard in self._shard_numbers())
+            reclaimable = self.reclaimable_bytes()
+            if total and reclaimable > total * self.compact_ratio:
+                reclaimed = self.compact()
+                print(f"分片存储整理完成: {self.embeddings_folder}，回收 {reclaimed / (1024 * 1024):.1f}MB")
+        self._written = False
+        self._maps = {}
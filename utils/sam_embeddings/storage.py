@@ -0,0 +1,184 @@
+"""
+嵌入向量存储格式
+
+支持三种格式：
+    float32: 原始精度，保存为 .npy（约4MB/张）
+    float16: 半精度，保存为 .npy（约2MB/张）
+    int8:    按通道对称量化，保存为 .npz，包含量化值 q 和每通道缩放系数 scale（约1MB/张）
+
+读取时统一还原为float32，供ONNX解码器直接使用
+"""
+
+import os
+import numpy as np
+from typing import Optional
+
+STORAGE_FORMATS = ["float32", "float16", "int8"]
+
+# 各格式对应的文件扩展名，读取时按此顺序查找
+FORMAT_EXTENSIONS = {
+    "float32": ".npy",
+    "float16": ".npy",
+    "int8": ".npz",
+}
+
+
+def embedding_file_name(stem: str, storage_format: str = "float32") -> str:
+    """返回指定格式下嵌入向量的文件名"""
+    return stem + FORMAT_EXTENSIONS[storage_format]
+
+
+def quantize_int8(embedding: np.ndarray):
+    """
+    按通道（第1维）做对称int8量化
+
+    Returns:
+        (int8量化值, float32缩放系数)
+    """
+    channel_axis = 1
+    reduce_axes = tuple(i for i in range(embedding.ndim) if i != channel_axis)
+    scale = np.abs(embedding).max(axis=reduce_axes) / 127.0
+    scale = np.where(scale > 0, scale, 1.0).astype(np.float32)
+    shape = [1] * embedding.ndim
+    shape[channel_axis] = -1
+    q = np.clip(np.rint(embedding / scale.reshape(shape)), -127, 127).astype(np.int8)
+    return q, scale
+
+
+def dequantize_int8(q: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    """将int8量化值还原为float32"""
+    shape = [1] * q.ndim
+    shape[1] = -1
+    return q.astype(np.float32) * scale.reshape(shape)
+
+
+def encode_embedding(embedding: np.ndarray, storage_format: str = "float32") -> np.ndarray:
+    """按存储格式编码后再解码，得到读取时实际拿到的嵌入向量（用于评估精度损失）"""
+    if storage_format == "float16":
+        return embedding.astype(np.float16).astype(np.float32)
+    if storage_format == "int8":
+        return dequantize_int8(*quantize_int8(embedding))
+    return embedding.astype(np.float32)
+
+
+def save_embedding(out_path: str, embedding: np.ndarray, storage_format: str = "float32"):
+    """
+    按存储格式保存嵌入向量
+
+    Args:
+        out_path: 输出文件路径（扩展名需与 embedding_file_name 一致）
+        embedding: 1x256x64x64 的float32嵌入向量
+        storage_format: 存储格式
+    """
+    if storage_format == "float32":
+        np.save(out_path, embedding.astype(np.float32))
+    elif storage_format == "float16":
+        np.save(out_path, embedding.astype(np.float16))
+    elif storage_format == "int8":
+        q, scale = quantize_int8(embedding)
+        np.savez(out_path, q=q, scale=scale)
+    else:
+        raise ValueError(f"不支持的存储格式: {storage_format}")
+
+    # 删除同名的其他格式文件，避免读取到旧格式的嵌入向量
+    stem = os.path.splitext(out_path)[0]
+    for ext in set(FORMAT_EXTENSIONS.values()):
+        other_path = stem + ext
+        if other_path != out_path and os.path.exists(other_path):
+            os.remove(other_path)
+
+
+def load_embedding(embeddings_folder: str, stem: str) -> Optional[np.ndarray]:
+    """
+    读取嵌入向量并还原为float32
+
+    Returns:
+        1x256x64x64 的float32数组，文件不存在时返回None
+    """
+    npy_path = os.path.join(embeddings_folder, stem + ".npy")
+    if os.path.exists(npy_path):
+        embedding = np.load(npy_path)
+        if embedding.dtype != np.float32:
+            embedding = embedding.astype(np.float32)
+        return embedding
+
+    npz_path = os.path.join(embeddings_folder, stem + ".npz")
+    if os.path.exists(npz_path):
+        with np.load(npz_path) as data:
+            return dequantize_int8(data["q"], data["scale"])
+
+    return None
+
+
+def remove_file_embeddings(embeddings_folder: str) -> int:
+    """删除文件夹中每张图片一个文件的嵌入向量（.npy/.npz），返回删除的文件数"""
+    if not os.path.isdir(embeddings_folder):
+        return 0
+    extensions = set(FORMAT_EXTENSIONS.values())
+    removed = 0
+    for name in os.listdir(embeddings_folder):
+        if os.path.splitext(name)[1] in extensions:
+            os.remove(os.path.join(embeddings_folder, name))
+            removed += 1
+    return removed
+
+
+class FileEmbeddingStore:
+    """
+    每张图片一个文件的嵌入向量存储
+
+    第一次写入时删除文件夹中已有的分片存储，避免自动判断存储后端时读到旧的分片数据
+    """
+
+    backend = "files"
+
+    def __init__(self, embeddings_folder: str, storage_format: str = "float32"):
+        self.embeddings_folder = embeddings_folder
+        self.storage_format = storage_format
+        self._retired = False
+
+    def save(self, stem: str, embedding: np.ndarray) -> str:
+        """保存嵌入向量，返回在清单中记录的输出文件名"""
+        if not self._retired:
+            from .shard_store import remove_shards
+            remove_shards(self.embeddings_folder)
+            self._retired = True
+        out_name = embedding_file_name(stem, self.storage_format)
+        save_embedding(os.path.join(self.embeddings_folder, out_name), embedding, self.storage_format)
+        return out_name
+
+    def contains(self, output_name: str) -> bool:
+        return os.path.exists(os.path.join(self.embeddings_folder, output_name))
+
+    def load(self, stem: str) -> Optional[np.ndarray]:
+        return load_embedding(self.embeddings_folder, stem)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+STORAGE_BACKENDS = ["files", "shards"]
+
+
+def open_embedding_store(embeddings_folder: str, backend: Optional[str] = None,
+                         storage_format: str = "float32"):
+    """
+    打开embeddings文件夹对应的嵌入向量存储
+
+    Args:
+        embeddings_folder: embeddings文件夹
+        backend: "files" 或 "shards"，为None时根据文件夹内容自动判断（用于读取）
+        storage_format: 写入时使用的存储格式
+    """
+    from .shard_store import ShardedEmbeddingStore, has_shard_index
+
+    if backend is None:
+        backend = "shards" if has_shard_index(embeddings_folder) else "files"
+    if backend == "shards":
+        return ShardedEmbeddingStore(embeddings_folder, storage_format)
+    if backend == "files":
+        return FileEmbeddingStore(embeddings_folder, storage_format)
+    raise ValueError(f"不支持的存储后端: {backend}")
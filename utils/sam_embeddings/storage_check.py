@@ -0,0 +1,121 @@
+"""
+嵌入向量存储格式精度检查
+
+以float32嵌入向量为基准，分别按float16/int8编码后送入ONNX解码器，
+在随机前景点上比较两者预测掩码的IoU，用于评估压缩存储带来的掩码偏差
+
+用法:
+    python -m utils.sam_embeddings.storage_check --onnx sam.onnx --dataset dataset/train/train_001
+"""
+
+import os
+import argparse
+import numpy as np
+from typing import Dict, List
+
+import cv2
+
+from .storage import STORAGE_FORMATS, encode_embedding
+
+
+def mask_iou(mask_a: np.ndarray, mask_b: np.ndarray) -> float:
+    """计算两个二值掩码的IoU，两者均为空时视为1"""
+    union = np.logical_or(mask_a, mask_b).sum()
+    if union == 0:
+        return 1.0
+    return float(np.logical_and(mask_a, mask_b).sum() / union)
+
+
+def storage_bytes(storage_format: str, embedding_size: int, num_channels: int = 256) -> int:
+    """估算每张图片在指定格式下的存储大小（不含文件头）"""
+    if storage_format == "float16":
+        return embedding_size * 2
+    if storage_format == "int8":
+        return embedding_size + num_channels * 4
+    return embedding_size * 4
+
+
+def check_storage_drift(onnx_model_path: str, dataset_folder: str, num_images: int = 20,
+                        points_per_image: int = 5, seed: int = 0) -> Dict[str, Dict]:
+    """
+    测量不同存储格式相对float32的掩码IoU偏差
+
+    Args:
+        onnx_model_path: ONNX解码器模型路径
+        dataset_folder: 包含images和embeddings的数据集目录（嵌入向量需为单文件float32格式）
+        num_images: 抽样图片数量
+        points_per_image: 每张图片随机采样的前景点数量
+        seed: 随机种子
+
+    Returns:
+        {格式: {"mean_iou", "min_iou", "bytes_per_image", "samples"}}
+    """
+    from utils.sam_annotator.onnx_model import OnnxModel
+
+    images_folder = os.path.join(dataset_folder, "images")
+    embeddings_folder = os.path.join(dataset_folder, "embeddings")
+    model = OnnxModel(onnx_model_path)
+    rng = np.random.default_rng(seed)
+
+    # 只使用以float32保存的嵌入向量作为基准
+    candidates = []
+    for image_name in sorted(os.listdir(images_folder)):
+        stem = os.path.splitext(image_name)[0]
+        npy_path = os.path.join(embeddings_folder, stem + ".npy")
+        if os.path.exists(npy_path):
+            candidates.append((image_name, npy_path))
+    if len(candidates) > num_images:
+        indices = rng.choice(len(candidates), num_images, replace=False)
+        candidates = [candidates[i] for i in sorted(indices)]
+
+    ious: Dict[str, List[float]] = {fmt: [] for fmt in STORAGE_FORMATS if fmt != "float32"}
+    embedding_size = 0
+    for image_name, npy_path in candidates:
+        reference = np.load(npy_path)
+        if reference.dtype != np.float32:
+            continue
+        image = cv2.imread(os.path.join(images_folder, image_name))
+        if image is None:
+            continue
+        embedding_size = reference.size
+        height, width = image.shape[:2]
+
+        encoded = {fmt: encode_embedding(reference, fmt) for fmt in ious}
+        for _ in range(points_per_image):
+            point = np.array([[rng.integers(0, width), rng.integers(0, height)]])
+            label = np.array([1])
+            reference_masks, _ = model.call(image, reference, point, label)
+            for fmt, embedding in encoded.items():
+                masks, _ = model.call(image, embedding, point, label)
+                ious[fmt].append(mask_iou(reference_masks[0, 0], masks[0, 0]))
+
+    report = {}
+    for fmt in STORAGE_FORMATS:
+        values = ious.get(fmt, [])
+        report[fmt] = {
+            "mean_iou": float(np.mean(values)) if values else 1.0,
+            "min_iou": float(np.min(values)) if values else 1.0,
+            "bytes_per_image": storage_bytes(fmt, embedding_size),
+            "samples": len(values) if fmt != "float32" else 0,
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="嵌入向量存储格式精度检查")
+    parser.add_argument("--onnx", required=True, help="ONNX解码器模型路径")
+    parser.add_argument("--dataset", required=True, help="包含images和embeddings的数据集目录")
+    parser.add_argument("--num-images", type=int, default=20, help="抽样图片数量")
+    parser.add_argument("--points", type=int, default=5, help="每张图片的随机点数量")
+    args = parser.parse_args()
+
+    report = check_storage_drift(args.onnx, args.dataset, args.num_images, args.points)
+    print(f"{'格式':<10}{'平均IoU':>10}{'最小IoU':>10}{'大小/张':>12}{'样本数':>8}")
+    for fmt, result in report.items():
+        size_mb = result["bytes_per_image"] / (1024 * 1024)
+        print(f"{fmt:<10}{result['mean_iou']:>10.4f}{result['min_iou']:>10.4f}"
+              f"{size_mb:>10.2f}MB{result['samples']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+SAM嵌入向量生成线程（用于PyQt）
+
+与处理逻辑分开存放，命令行模式下导入处理器时无需加载PyQt5
+"""
+
+from typing import Dict
+from PyQt5 import QtCore
+
+from .processor import SAMEmbeddingsProcessor
+
+
+class SAMEmbeddingsProcessorThread(QtCore.QThread):
+    """SAM嵌入向量生成线程（用于PyQt）"""
+
+    progress_updated = QtCore.pyqtSignal(int, str)
+    processing_finished = QtCore.pyqtSignal(bool, str)
+
+    def __init__(self, config: Dict):
+        super().__init__()
+        self.config = config
+        self.processor = None
+
+    def run(self):
+        """线程运行函数"""
+        try:
+            self.processor = SAMEmbeddingsProcessor(self.config)
+            self.processor.set_progress_callback(
+                lambda p, m: self.progress_updated.emit(p, m)
+            )
+
+            success, message = self.processor.process()
+            self.processing_finished.emit(success, message)
+
+        except Exception as e:
+            self.processing_finished.emit(False, f"线程执行出错: {str(e)}")
+
+    def stop(self):
+        """停止处理"""
+        if self.processor:
+            self.processor.stop()